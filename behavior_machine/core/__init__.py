@@ -1,5 +1,19 @@
 from .state import State
 from .nested_state import NestedState
 from .machine import Machine
+from .tick_scheduler import TickScheduler
+from .machine_group import MachineGroup
 from .state_status import StateStatus
 from .board import Board
+from .shared_memory_board import SharedMemoryBoard
+from .clock import Clock, RealClock, SimulatedClock, ClockEvent, get_clock, set_clock
+from .executor import Executor, ThreadExecutor, PooledExecutor, EventLoopExecutor
+from .executor import get_default_executor, set_default_executor, get_default_event_loop_executor
+from .step_state import StepState
+from .async_state import AsyncState
+from .async_machine import AsyncMachine
+from .process_state import ProcessState, ProcessPool, get_default_process_pool
+from .state_monitor import StateMonitor
+from .profiler import Profiler
+from .tracer import Tracer
+from .flight_recorder import FlightRecorder, load_flight_record
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import typing
+
+from .async_state import AsyncState
+from .board import Board
+from .machine import Machine
+from .state_status import StateStatus
+
+
+class AsyncMachine(Machine, AsyncState):
+    """Machine whose tick loop is a coroutine on the same event loop as the `AsyncState` it runs.
+    Waiting between ticks does not occupy a thread and interrupting the machine cancels its task.
+    Transitions are still evaluated on a worker thread, because interrupting thread-based states
+    blocks until they finish, which would stall every task on the loop.
+    """
+
+    _tick_lock: threading.RLock
+    _loop: asyncio.AbstractEventLoop
+    _async_wake_event: asyncio.Event
+
+    def __init__(self, name, root, end_state_ids=None, rate=1.0, debug: bool = False, debug_cb=None, logger=None,
+                 event_driven: bool = False, busy_wait: float = 0.0, scoped: bool = False):
+        self._tick_lock = threading.RLock()
+        self._loop = None
+        self._async_wake_event = None
+        super(AsyncMachine, self).__init__(name, root, end_state_ids, rate, debug, debug_cb, logger, event_driven, busy_wait,
+                                           scoped)
+
+    async def _execute(self, board: Board):
+        try:
+            self.pre_execute()
+            self._status = await self.execute(board)
+            self.post_execute()
+        except asyncio.CancelledError:
+            self._status = StateStatus.INTERRUPTED
+        except Exception as e:
+            # stop the nested state without blocking the loop.
+            await asyncio.get_event_loop().run_in_executor(None, self._curr_state.interrupt)
+            self._internal_exception = e
+            self._status = StateStatus.EXCEPTION
+        # the values the children did not promote are dropped.
+        self._release_scopes()
+        if self._status is None:
+            self._status = StateStatus.NOT_SPECIFIED
+
+    async def execute(self, board: Board):
+        loop = asyncio.get_event_loop()
+        self._loop = loop
+        self._async_wake_event = asyncio.Event()
+        if self._event_driven and board is not None:
+            board.add_listener(self._wake)
+        self._scheduler.reset()
+        try:
+            # tick the internal states
+            while not self.is_interrupted():
+                self._scheduler.begin_tick()
+                # clear before checking, so changes during the tick wake up the next one.
+                self._async_wake_event.clear()
+                # check the internal states
+                status = await loop.run_in_executor(None, self._tick_once, board)
+                self._end_tick()
+                if status is not None:
+                    return status
+                # sleep until the next deadline, busy waiting would block the loop so it is not used.
+                if self._event_driven:
+                    try:
+                        await asyncio.wait_for(self._async_wake_event.wait(), self._scheduler.time_until_next_tick())
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(self._scheduler.time_until_next_tick())
+        finally:
+            if self._event_driven and board is not None:
+                board.remove_listener(self._wake)
+
+        return StateStatus.INTERRUPTED
+
+    def _wake(self) -> None:
+        super()._wake()
+        # listeners are called from other threads.
+        if self._loop is not None and self._async_wake_event is not None:
+            self._loop.call_soon_threadsafe(self._async_wake_event.set)
+
+    def _tick_once(self, board: Board) -> StateStatus:
+        with self._tick_lock:
+            # the task might be cancelled while this tick is queued.
+            if self.is_interrupted():
+                return StateStatus.INTERRUPTED
+            return super()._tick_once(board)
+
+    def interrupt(self, timeout: float = None) -> bool:
+        self.signal_interrupt()
+        # make sure no tick is in flight, otherwise it might start a new state after we interrupted.
+        with self._tick_lock:
+            pass
+        return super().interrupt(timeout)
+
+    async def run_async(self, board: Board = None, flow_in: typing.Any = None) -> StateStatus:
+        """Coroutine version of `run`, it can be awaited from any event loop.
+
+        Parameters
+        ----------
+        board : Board, optional
+            Board to track variables between states, by default None
+        flow_in : Any, optional
+            Data that is initially passed to the root state to help execution.
+
+        Returns
+        -------
+        StateStatus
+            Status of the machine once it finishes.
+        """
+        board = Board() if board is None else board
+        self.start(board, flow_in)
+        # the future of the task resolves as soon as it is cancelled, before the final status is set, so wait
+        # for the execution itself. The callback is added before checking, so it cannot be missed.
+        loop = asyncio.get_event_loop()
+        finished = asyncio.Event()
+        handle = self._run_thread
+        handle.add_done_callback(lambda: loop.call_soon_threadsafe(finished.set))
+        if handle.is_alive():
+            await finished.wait()
+        # the task was cancelled before it had a chance to run.
+        if self._status == StateStatus.RUNNING:
+            self._status = StateStatus.INTERRUPTED
+        return self._status
@@ -0,0 +1,75 @@
+import asyncio
+
+from .board import Board
+from .executor import Executor, get_default_event_loop_executor
+from .state import State
+from .state_status import StateStatus
+
+
+class AsyncState(State):
+    """State whose execute method is a coroutine. Instead of occupying a thread, the state runs as a task
+    on the event loop of an `EventLoopExecutor`, and interrupts cancel the task. It can be used anywhere
+    a `State` is used, e.g. as a child of `SequentialState` or `ParallelState`.
+    """
+
+    async def execute(self, board: Board) -> StateStatus:
+        """All derived class should overwrite this coroutine. It is run as a task on the event loop when
+        the state is running. Interrupts are delivered as `asyncio.CancelledError` at the next await.
+
+        Parameters
+        ----------
+        board : Board
+            Board object that is being passed between multiple states.
+
+        Returns
+        -------
+        StateStatus (Optional)
+            When the state completes, whether it is successful or not.
+        """
+        raise NotImplementedError("Default execute method is not overwritten")
+
+    async def _execute(self, board: Board):
+        try:
+            self.pre_execute()
+            self._status = await self.execute(board)
+            self.post_execute()
+        except asyncio.CancelledError:
+            self._status = StateStatus.INTERRUPTED
+        except Exception as e:
+            self._internal_exception = e
+            self._status = StateStatus.EXCEPTION
+        if self._status is None:
+            self._status = StateStatus.NOT_SPECIFIED
+
+    def _get_executor(self) -> Executor:
+        return self._executor if self._executor is not None else get_default_event_loop_executor()
+
+    def signal_interrupt(self):
+        super().signal_interrupt()
+        if self._run_thread is not None:
+            self._run_thread.cancel()
+
+    def interrupt(self, timeout: float = None) -> bool:
+        """Interrupts the current execution of the state by cancelling its task.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            timeout in seconds, by default None
+
+        Returns
+        -------
+        bool
+            True if the state is no longer running or interrupted. False if timeout.
+        """
+        self.signal_interrupt()
+        if self._run_thread is None:
+            return True
+        if self._run_thread.is_alive():
+            self._run_thread.join(timeout)
+        if self._run_thread.is_alive():
+            return False
+        # the task was cancelled before it had a chance to run.
+        if self._status == StateStatus.RUNNING:
+            self._status = StateStatus.INTERRUPTED
+        return True
@@ -1,13 +1,283 @@
+import bisect
+import collections
+import enum
+import heapq
+import itertools
+import sys
 import threading
+import time
+import types
 import typing
 import copy
+import weakref
 
+from .clock import ClockEvent, get_clock
 
-class Board():
+# types whose values never change, they are shared instead of copied.
+_IMMUTABLE_TYPES = frozenset([type(None), bool, int, float, complex, str, bytes])
+
+# number of least recently set keys compared to pick the one to evict.
+_EVICTION_SAMPLES = 5
+
+
+def _is_array(value: typing.Any) -> bool:
+    # numpy is optional, so arrays are recognized without importing it.
+    return type(value).__module__ == 'numpy' and hasattr(value, 'setflags') and hasattr(value, 'dtype')
+
+
+def _approximate_size(value: typing.Any) -> int:
+    # approximate number of bytes used by a value and the objects it references, counting shared objects once.
+    size = 0
+    seen = set()
+    pending = [value]
+    while len(pending) > 0:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+            continue
+        seen.add(id(item))
+        if _is_array(item):
+            # views do not count the memory of their base in getsizeof.
+            size += max(sys.getsizeof(item), item.nbytes)
+            continue
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, collections.deque)):
+            pending.extend(item)
+        elif hasattr(item, '__dict__'):
+            pending.append(item.__dict__)
+    return size
+
+
+def _sweep_periodically(board_reference: 'weakref.ref', interval: float) -> None:
+    # body of the sweeper thread of a board, it stops once the board is garbage collected. The interval is in
+    # real time, so the thread is not counted as a waiter of a simulated clock.
+    while True:
+        time.sleep(interval)
+        board = board_reference()
+        if board is None:
+            return
+        board.sweep()
+        del board
+
+
+def _freeze(value: typing.Any) -> bool:
+    # make the numpy arrays of a value that was just copied read-only. Returns whether the whole value is now
+    # immutable, i.e. made of immutable scalars, tuples, frozensets, frozen dataclasses and read-only arrays.
+    if type(value) in _IMMUTABLE_TYPES or isinstance(value, enum.Enum):
+        return True
+    if type(value) in (tuple, frozenset):
+        return all(_freeze(item) for item in value)
+    if _is_array(value):
+        if value.dtype.hasobject:
+            return False
+        value.setflags(write=False)
+        return True
+    # dataclasses only exist from python 3.7, a dataclass instance means the module was already imported.
+    dataclasses = sys.modules.get('dataclasses')
+    if dataclasses is not None and dataclasses.is_dataclass(value) and not isinstance(value, type) \
+            and value.__dataclass_params__.frozen:
+        return all(_freeze(getattr(value, field.name)) for field in dataclasses.fields(value))
+    return False
+
+
+class _Entry():
+    # a value published in the board. Entries are never modified, a set replaces the whole entry, so readers
+    # always see a value together with its flags.
+
+    __slots__ = ('value', 'shared', 'version', 'expires', 'size')
+
+    value: typing.Any
+    shared: bool  # whether the value is immutable and returned without a copy
+    version: int  # number of times the key was set
+    expires: float  # time on the clock after which the entry is removed, None if it never expires
+    size: int  # approximate number of bytes, only computed when the board has a max_bytes
+
+    def __init__(self, value: typing.Any, shared: bool, version: int, expires: float = None, size: int = None):
+        self.value = value
+        self.shared = shared
+        self.version = version
+        self.expires = expires
+        self.size = size
+
+
+class _KeyLockStatistics():
+
+    __slots__ = ('acquisitions', 'contentions', 'wait_time')
+
+    acquisitions: int
+    contentions: int
+    wait_time: float
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contentions = 0
+        self.wait_time = 0.0
+
+
+class _KeyStatistics():
+    # what a key costs, counted by instrumented boards.
+
+    __slots__ = ('size', 'reads', 'writes', 'copy_in_time', 'copy_out_time')
+
+    size: int  # approximate number of bytes of the last value set, 0 once it is removed
+    reads: int
+    writes: int
+    copy_in_time: float  # seconds spent copying the values set
+    copy_out_time: float  # seconds spent copying the values read
 
     def __init__(self):
-        self._map = {}
+        self.size = 0
+        self.reads = 0
+        self.writes = 0
+        self.copy_in_time = 0.0
+        self.copy_out_time = 0.0
+
+
+class _History():
+    # ring buffer of the last values set for a key and the times they were set. Each value is written twice, at
+    # its index and at its index plus the size, so the last values are always contiguous and can be sliced
+    # without a copy. The values are numpy arrays for numeric histories, otherwise lists of entries.
+
+    __slots__ = ('size', 'count', 'values', 'times', 'numeric')
+
+    size: int
+    count: int  # number of values appended since the history was enabled or cleared
+    values: typing.Any
+    times: typing.Any
+    numeric: bool
+
+    def __init__(self, size: int, dtype: typing.Any = None, shape: typing.Tuple[int, ...] = ()):
+        self.size = size
+        self.count = 0
+        self.numeric = dtype is not None
+        if self.numeric:
+            import numpy
+            self.values = numpy.zeros((2 * size,) + tuple(shape), dtype=dtype)
+            self.times = numpy.zeros(2 * size, dtype=numpy.float64)
+        else:
+            self.values = [None] * (2 * size)
+            self.times = [0.0] * (2 * size)
+
+    def append(self, value: typing.Any, time: float) -> None:
+        index = self.count % self.size
+        self.values[index] = value
+        self.values[index + self.size] = value
+        self.times[index] = time
+        self.times[index + self.size] = time
+        # counted last, so readers never include a value that is still being written.
+        self.count += 1
+
+    def window(self, n: int = None) -> typing.Tuple[int, int]:
+        # start and end index of the last n values, oldest first.
+        count = self.count
+        available = min(count, self.size)
+        n = available if n is None else max(0, min(n, available))
+        end = count % self.size + self.size
+        return end - n, end
+
+    def since(self, time: float) -> typing.Tuple[int, int]:
+        # start and end index of the values set at the time or after, the times are increasing in the window.
+        start, end = self.window()
+        return bisect.bisect_left(self.times, time, start, end), end
+
+
+class Board():
+
+    _entries: typing.Dict[str, _Entry]
+    _parent: 'Board'  # board the reads fall through to, None if this board is not a scope
+    _scope_name: str
+    _copy_on_write: bool
+    _stripes: typing.List[threading.Lock]  # writers lock the stripe of their key, readers do not lock
+    _lock_statistics: typing.Dict[str, _KeyLockStatistics]  # guarded by the stripe of each key
+    _histories: typing.Dict[str, _History]  # appended to under the stripe of each key
+    _lock: threading.RLock  # guards the listeners and subscribers
+    _listeners: typing.List[typing.Callable[[], None]]
+    _subscribers: typing.Dict[str, typing.List[typing.Callable[[str], None]]]
+    _max_entries: int
+    _max_bytes: int
+    _eviction: str
+    _bounded: bool
+    _accounting_lock: threading.Lock  # guards the fields below, taken after the stripes
+    _usage: 'collections.OrderedDict[str, None]'  # keys from the least to the most recently set, if bounded
+    _reads: typing.Dict[str, int]  # last read (lru) or number of reads (lfu) of each key, updated without lock
+    _read_counter: typing.Iterator[int]
+    _num_bytes: int
+    _expirations: typing.List[typing.Tuple[float, int, str]]  # heap of the expiry time, version and key
+    _removed_version: int  # highest version of a removed key, new keys continue from it
+    _eviction_statistics: typing.Dict[str, int]
+    _instrumented: bool
+    _key_statistics: typing.Dict[str, _KeyStatistics]  # updated under the accounting lock
+    # Longest time wait_for waits before checking the value again, for boards changed by other processes.
+    _poll_interval: float = None
+
+    def __init__(self, copy_on_write: bool = False, num_stripes: int = 16, max_entries: int = None,
+                 max_bytes: int = None, eviction: str = 'lru', sweep_interval: float = None, instrumented: bool = False):
+        """Constructor for Board
+
+        Parameters
+        ----------
+        copy_on_write : bool, optional
+            Whether values are frozen when they are set, by default False. The numpy arrays of a value are then
+            copied once and made read-only, and values that are immutable as a whole (scalars, tuples, frozensets,
+            frozen dataclasses and read-only arrays) are returned by `get` without a copy. A state that wants to
+            change such a value should copy it, e.g. with `array.copy()`, and set it again. Other values are still
+            copied on every get. Immutable scalars and tuples of them are never copied in either mode.
+        num_stripes : int, optional
+            Number of locks shared by the keys for writing, by default 16. Writes to keys of different stripes
+            do not wait for each other, reads never wait.
+        max_entries : int, optional
+            Number of keys kept in the board, by default None for no limit. Setting more keys evicts others.
+        max_bytes : int, optional
+            Approximate number of bytes of the values kept in the board, by default None for no limit. The size
+            of each value is estimated when it is set, which costs about as much as copying it.
+        eviction : str, optional
+            Which keys are evicted when a limit is reached, 'lru' for the least recently used or 'lfu' for the
+            least frequently read, by default 'lru'. Reads do not take a lock to record the use of a key, so the
+            eviction is approximate: the least recently set keys are compared and one of them is evicted.
+        sweep_interval : float, optional
+            Interval in seconds of a background thread that removes the expired values, by default None for no
+            thread. Expired values are also removed when they are read, see the ttl of `set`, and by `sweep`.
+        instrumented : bool, optional
+            Whether to count the reads and writes of each key, the time spent copying its values and their
+            approximate size, by default False. See `get_key_statistics`. The size is estimated on every set,
+            which costs about as much as copying the value.
+
+        Raises
+        ------
+        ValueError
+            If the eviction policy is unknown.
+        """
+        if eviction not in ('lru', 'lfu'):
+            raise ValueError(f"unknown eviction policy {eviction}, expected 'lru' or 'lfu'")
+        self._entries = {}
+        self._parent = None
+        self._scope_name = ""
+        self._copy_on_write = copy_on_write
+        self._stripes = [threading.Lock() for _ in range(0, max(1, num_stripes))]
+        self._lock_statistics = {}
+        self._histories = {}
         self._lock = threading.RLock()
+        self._listeners = []
+        self._subscribers = {}
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._eviction = eviction
+        self._bounded = max_entries is not None or max_bytes is not None
+        self._accounting_lock = threading.Lock()
+        self._usage = collections.OrderedDict()
+        self._reads = {}
+        self._read_counter = itertools.count(1)
+        self._num_bytes = 0
+        self._expirations = []
+        self._removed_version = 0
+        self._eviction_statistics = {'expired': 0, 'evicted': 0, 'evicted_bytes': 0}
+        self._instrumented = instrumented
+        self._key_statistics = {}
+        if sweep_interval is not None:
+            threading.Thread(target=_sweep_periodically, args=(weakref.ref(self), sweep_interval),
+                             daemon=True).start()
 
     def get(self, key: str, deep_copy: bool = True) -> typing.Any:
         """Get the object associated with the key from the board. If the key doesn't exist, None is returned.
@@ -25,13 +295,18 @@ class Board():
         typing.Any
             The object/variable saved with the key.
         """
-        with self._lock:
-            if deep_copy:
-                return copy.deepcopy(self._map.get(key, None))
-            else:
-                return self._map.get(key, None)
+        # reading from the dictionary is atomic and entries are never modified, so no lock is needed. The copy
+        # is made from the entry that was read, even if the key is set again meanwhile.
+        entry = self._find_entry(key)
+        if entry is None:
+            return None
+        if self._instrumented:
+            return self._copy_out({key: entry}, deep_copy)[key]
+        if deep_copy and not entry.shared:
+            return copy.deepcopy(entry.value)
+        return entry.value
 
-    def set(self, key: str, value: typing.Any, deep_copy: bool = True) -> None:
+    def set(self, key: str, value: typing.Any, deep_copy: bool = True, ttl: float = None) -> None:
         """Save the object with the given key in the board. By default, a deep copy
         of the object is made. You can change this by setting deep_copy = False.
         There is no check for repetitions and newer objects will replace the old objects
@@ -45,12 +320,684 @@ class Board():
             object or variable to be saved
         deep_copy : bool, optional
             whether a deepcopy of the object/variable is made, by default True
+        ttl : float, optional
+            Time to live in seconds on the current clock, after which the key is removed, by default None for
+            a value that never expires.
+        """
+        # the copy is made before taking the lock.
+        start_time = time.perf_counter()
+        stored, shared = self._copy_in(value, deep_copy)
+        copy_time = time.perf_counter() - start_time
+        expires = self._expiry(ttl)
+        size = self._measure(stored)
+        locks = self._acquire((key,))
+        try:
+            self._publish(key, stored, shared, expires, size)
+        finally:
+            self._release(locks)
+        if self._instrumented:
+            self._record_write(key, size, copy_time)
+        if self._bounded:
+            self._evict()
+        for subscriber in self._subscribers.get(key, ()):
+            subscriber(key)
+        self.notify()
+
+    def get_many(self, keys: typing.Iterable[str], deep_copy: bool = True) -> typing.Dict[str, typing.Any]:
+        """Get several objects from the board, same as calling `get` for each key. The copies share a single
+        memo, so objects referenced by several of the values are only copied once and stay shared between
+        the copies. Keys set meanwhile might be read before or after the change, see `snapshot`.
+
+        Parameters
+        ----------
+        keys : typing.Iterable[str]
+            Keys used in the set function
+        deep_copy : bool, optional
+            Whether to create a deep_copy of the objects, by default True
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            The object/variable saved with each key, None for keys that do not exist.
+        """
+        return self._copy_out({key: self._find_entry(key) for key in keys}, deep_copy)
+
+    def snapshot(self, keys: typing.Iterable[str] = None, deep_copy: bool = True) -> typing.Dict[str, typing.Any]:
+        """Get a consistent view of several objects: no set, or `set_many`, happens in the middle of reading them.
+        The copies are made afterwards, sharing a single memo like `get_many`.
+
+        Parameters
+        ----------
+        keys : typing.Iterable[str], optional
+            Keys to read, by default None for every key in the board
+        deep_copy : bool, optional
+            Whether to create a deep_copy of the objects, by default True
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            The object/variable saved with each key, None for given keys that do not exist.
+        """
+        return self._copy_out(self._snapshot_entries(None if keys is None else list(keys)), deep_copy)
+
+    def _snapshot_entries(self, keys: typing.List[str]) -> typing.Dict[str, _Entry]:
+        if keys is None:
+            locks = self._lock_stripes(range(0, len(self._stripes)))[0]
+        else:
+            locks = self._lock_stripes(self._stripe_indices(keys))[0]
+        try:
+            if keys is None:
+                entries = dict(self._entries)
+            else:
+                entries = {key: self._entries.get(key, None) for key in keys}
+        finally:
+            self._release(locks)
+        now = None
+        for key, entry in list(entries.items()):
+            if entry is not None and entry.expires is not None:
+                now = get_clock().time() if now is None else now
+                if now >= entry.expires:
+                    # left to the parents like a missing key.
+                    if keys is None:
+                        del entries[key]
+                    else:
+                        entries[key] = None
+        if self._parent is None:
+            return entries
+        # the keys missing from a scope are read from its parents, each board is consistent on its own.
+        if keys is None:
+            parent_entries = self._parent._snapshot_entries(None)
+            parent_entries.update(entries)
+            return parent_entries
+        missing = [key for key, entry in entries.items() if entry is None]
+        if len(missing) > 0:
+            entries.update(self._parent._snapshot_entries(missing))
+        return entries
+
+    def set_many(self, items: typing.Mapping[str, typing.Any], deep_copy: bool = True, ttl: float = None) -> None:
+        """Save several objects in the board at once. They are copied in a single pass sharing one memo, so objects
+        referenced by several values stay shared in the board, and `snapshot` sees either none or all of them.
+
+        Parameters
+        ----------
+        items : typing.Mapping[str, typing.Any]
+            Objects/variables to save by key.
+        deep_copy : bool, optional
+            whether a deepcopy of the objects/variables is made, by default True
+        ttl : float, optional
+            Time to live in seconds of every value, by default None for values that never expire, see `set`.
+        """
+        memo = {}
+        copies = []
+        copy_times = []
+        for key, value in items.items():
+            start_time = time.perf_counter()
+            copies.append((key, *self._copy_in(value, deep_copy, memo)))
+            copy_times.append(time.perf_counter() - start_time)
+        if len(copies) == 0:
+            return
+        expires = self._expiry(ttl)
+        sizes = [self._measure(stored) for _, stored, _ in copies]
+        locks = self._acquire([key for key, _, _ in copies])
+        try:
+            for (key, stored, shared), size in zip(copies, sizes):
+                self._publish(key, stored, shared, expires, size)
+        finally:
+            self._release(locks)
+        if self._instrumented:
+            for (key, _, _), size, copy_time in zip(copies, sizes, copy_times):
+                self._record_write(key, size, copy_time)
+        if self._bounded:
+            self._evict()
+        for key, _, _ in copies:
+            for subscriber in self._subscribers.get(key, ()):
+                subscriber(key)
+        self.notify()
+
+    def _copy_in(self, value: typing.Any, deep_copy: bool,
+                 memo: typing.Dict[int, typing.Any] = None) -> typing.Tuple[typing.Any, bool]:
+        # the value to store for a set, and whether it can be returned without a copy.
+        if not deep_copy:
+            return value, type(value) in _IMMUTABLE_TYPES
+        stored = copy.deepcopy(value, memo)
+        # deepcopy returns the value itself when nothing in it can change, so later copies would be the same.
+        return stored, stored is value or (self._copy_on_write and _freeze(stored))
+
+    def _copy_out(self, entries: typing.Dict[str, _Entry], deep_copy: bool) -> typing.Dict[str, typing.Any]:
+        memo = {}
+        values = {}
+        for key, entry in entries.items():
+            if entry is None:
+                values[key] = None
+            elif deep_copy and not entry.shared:
+                start_time = time.perf_counter()
+                values[key] = copy.deepcopy(entry.value, memo)
+                if self._instrumented:
+                    self._record_read(key, time.perf_counter() - start_time)
+            else:
+                values[key] = entry.value
+                if self._instrumented:
+                    self._record_read(key, 0.0)
+        return values
+
+    def _measure(self, stored: typing.Any) -> int:
+        # approximate size of a value to set, None if the board does not need it.
+        if self._max_bytes is None and not self._instrumented:
+            return None
+        return _approximate_size(stored)
+
+    def _key_statistics_of(self, key: str) -> _KeyStatistics:
+        # the accounting lock should be held.
+        statistics = self._key_statistics.get(key, None)
+        if statistics is None:
+            statistics = self._key_statistics[key] = _KeyStatistics()
+        return statistics
+
+    def _record_read(self, key: str, copy_time: float) -> None:
+        with self._accounting_lock:
+            statistics = self._key_statistics_of(key)
+            statistics.reads += 1
+            statistics.copy_out_time += copy_time
+
+    def _record_write(self, key: str, size: int, copy_time: float) -> None:
+        with self._accounting_lock:
+            statistics = self._key_statistics_of(key)
+            statistics.writes += 1
+            statistics.size = size
+            statistics.copy_in_time += copy_time
+
+    def _find_entry(self, key: str) -> _Entry:
+        # the entry of the key in this board, or in the closest parent that has it.
+        entry = self._live_entry(key)
+        if entry is None:
+            if self._parent is not None:
+                return self._parent._find_entry(key)
+        elif self._bounded:
+            # single operations on a dictionary are atomic, a count lost to a race only makes eviction less exact.
+            if self._eviction == 'lru':
+                self._reads[key] = next(self._read_counter)
+            else:
+                self._reads[key] = self._reads.get(key, 0) + 1
+        return entry
+
+    def _live_entry(self, key: str) -> _Entry:
+        # the entry of the key in this board, removing it if it expired.
+        entry = self._entries.get(key, None)
+        if entry is not None and entry.expires is not None and get_clock().time() >= entry.expires:
+            self._expire(key, entry)
+            return None
+        return entry
+
+    def _expiry(self, ttl: float) -> float:
+        return None if ttl is None else get_clock().time() + ttl
+
+    def _publish(self, key: str, stored: typing.Any, shared: bool, expires: float = None, size: int = None) -> None:
+        # replace the entry of the key, the stripe of the key should be locked.
+        if size is None and self._max_bytes is not None:
+            size = _approximate_size(stored)
+        previous = self._entries.get(key, None)
+        version = self._removed_version + 1 if previous is None else previous.version + 1
+        entry = _Entry(stored, shared, version, expires, size)
+        history = self._histories.get(key, None)
+        if history is not None:
+            # appended first, so a value that does not fit a numeric history is not set either.
+            history.append(stored if history.numeric else entry, get_clock().time())
+        self._entries[key] = entry
+        if self._bounded or expires is not None or size is not None:
+            with self._accounting_lock:
+                self._num_bytes += (entry.size or 0) - (0 if previous is None else previous.size or 0)
+                if self._bounded:
+                    self._usage[key] = None
+                    self._usage.move_to_end(key)
+                    if self._eviction == 'lru':
+                        self._reads[key] = next(self._read_counter)
+                if expires is not None:
+                    heapq.heappush(self._expirations, (expires, version, key))
+                    # values set again before they expire leave their old expiry behind.
+                    if len(self._expirations) > 2 * len(self._entries) + 64:
+                        self._expirations = [(item.expires, item.version, item_key)
+                                             for item_key, item in list(self._entries.items())
+                                             if item.expires is not None]
+                        heapq.heapify(self._expirations)
+
+    def _remove(self, key: str, entry: _Entry = None, reason: str = None) -> bool:
+        # remove the entry of the key, or the current one if None, the stripe of the key should be locked. Returns
+        # whether it was removed, it is not if the key was set again meanwhile.
+        current = self._entries.get(key, None)
+        if current is None or (entry is not None and current is not entry):
+            return False
+        del self._entries[key]
+        # dropped with the key, so evictions and expirations keep the memory of the board bounded.
+        self._lock_statistics.pop(key, None)
+        with self._accounting_lock:
+            # versions never go back to a value they had, so watchers of the key see that it changed.
+            self._removed_version = max(self._removed_version, current.version)
+            self._num_bytes -= current.size or 0
+            self._usage.pop(key, None)
+            self._reads.pop(key, None)
+            if key in self._key_statistics:
+                self._key_statistics[key].size = 0
+            if reason is not None:
+                self._eviction_statistics[reason] += 1
+            if reason == 'evicted':
+                self._eviction_statistics['evicted_bytes'] += current.size or 0
+        return True
+
+    def _expire(self, key: str, entry: _Entry) -> None:
+        locks = self._lock_stripes(self._stripe_indices((key,)))[0]
+        try:
+            self._remove(key, entry, 'expired')
+        finally:
+            self._release(locks)
+
+    def _over_limits(self) -> bool:
+        if self._max_entries is not None and len(self._entries) > self._max_entries:
+            return True
+        return self._max_bytes is not None and self._num_bytes > self._max_bytes
+
+    def _evict(self) -> None:
+        # remove keys until the board is within its limits again. The stripes are taken without holding the
+        # accounting lock, since writers take them in the opposite order.
+        while True:
+            with self._accounting_lock:
+                if not self._over_limits() or len(self._usage) == 0:
+                    return
+                # the keys are only reordered when they are set, so iterating them here is safe. The key set last
+                # is left out, it is only evicted when it is alone, e.g. if it is larger than max_bytes.
+                candidates = list(itertools.islice(self._usage, max(1, min(_EVICTION_SAMPLES, len(self._usage) - 1))))
+                key = min(candidates, key=lambda candidate: self._reads.get(candidate, 0))
+            locks = self._lock_stripes(self._stripe_indices((key,)))[0]
+            try:
+                self._remove(key, None, 'evicted')
+            finally:
+                self._release(locks)
+
+    def delete(self, key: str) -> None:
+        """Remove the key from the board. Nothing happens if it does not exist. For a scope, only the value set in
+        the scope is removed, the value of its parents is read again.
+
+        Parameters
+        ----------
+        key : str
+            Key to remove.
+        """
+        locks = self._acquire((key,))
+        try:
+            removed = self._remove(key)
+        finally:
+            self._release(locks)
+        if removed:
+            self.notify()
+
+    def sweep(self) -> int:
+        """Remove the values whose ttl passed. Expired values are never returned, but without a sweep they only
+        free their memory once they are read.
+
+        Returns
+        -------
+        int
+            Number of values removed.
+        """
+        now = get_clock().time()
+        expired = []
+        with self._accounting_lock:
+            while len(self._expirations) > 0 and self._expirations[0][0] <= now:
+                expired.append(heapq.heappop(self._expirations))
+            # counts recorded by reads racing with a removal.
+            for key in [key for key in list(self._reads) if key not in self._entries]:
+                self._reads.pop(key, None)
+        count = 0
+        for expires, version, key in expired:
+            entry = self._entries.get(key, None)
+            if entry is not None and entry.version == version and entry.expires == expires:
+                locks = self._lock_stripes(self._stripe_indices((key,)))[0]
+                try:
+                    count += self._remove(key, entry, 'expired')
+                finally:
+                    self._release(locks)
+        return count
+
+    def get_key_statistics(self, sort_by: str = 'size') -> typing.List[typing.Dict[str, typing.Any]]:
+        """Report of what each key costs, counted since the board was created if it is instrumented, e.g. to find
+        the keys whose values are large or slow to copy and could be read with `deep_copy=False`.
+
+        Parameters
+        ----------
+        sort_by : str, optional
+            Field the report is sorted by, largest first, by default 'size'. One of 'size', 'reads', 'writes',
+            'copy_in_time', 'copy_out_time' and 'copy_time'.
+
+        Returns
+        -------
+        typing.List[typing.Dict[str, typing.Any]]
+            For each key read or set, its name, the approximate size in bytes of its current value, the number of
+            reads and writes, and the seconds spent copying values in, out and in total. Empty if the board is not
+            instrumented.
+
+        Raises
+        ------
+        ValueError
+            If the field to sort by is unknown.
+        """
+        fields = ('size', 'reads', 'writes', 'copy_in_time', 'copy_out_time', 'copy_time')
+        if sort_by not in fields:
+            raise ValueError(f"cannot sort by {sort_by}, expected one of {', '.join(fields)}")
+        with self._accounting_lock:
+            report = [{'key': key,
+                       'size': statistics.size,
+                       'reads': statistics.reads,
+                       'writes': statistics.writes,
+                       'copy_in_time': statistics.copy_in_time,
+                       'copy_out_time': statistics.copy_out_time,
+                       'copy_time': statistics.copy_in_time + statistics.copy_out_time}
+                      for key, statistics in self._key_statistics.items()]
+        report.sort(key=lambda item: item[sort_by], reverse=True)
+        return report
+
+    def get_eviction_statistics(self) -> typing.Dict[str, int]:
+        """Size of the board and number of values removed because of their ttl or the limits of the board.
+
+        Returns
+        -------
+        typing.Dict[str, int]
+            The number of entries, their approximate number of bytes (only counted with a max_bytes or when
+            instrumented), how many values expired, how many were evicted and the number of bytes evicted.
+        """
+        with self._accounting_lock:
+            statistics = {'entries': len(self._entries), 'bytes': self._num_bytes}
+            statistics.update(self._eviction_statistics)
+        return statistics
+
+    def enable_history(self, key: str, size: int, dtype: typing.Any = None, shape: typing.Sequence[int] = ()) -> None:
+        """Keep the last values set for the key, with the time each was set, in a buffer allocated once. This is
+        meant for keys set at a high rate, e.g. by sensors, whose recent values are read with `get_history` and
+        `get_since`. Only values set from now on are kept, enabling it again empties the history.
+
+        Parameters
+        ----------
+        key : str
+            Key whose values are kept.
+        size : int
+            Number of values kept, older ones are overwritten.
+        dtype : typing.Any, optional
+            numpy dtype of numeric values, by default None for values of any type. With a dtype, the values are
+            stored in a numpy array and read back as views of it, without copies.
+        shape : typing.Sequence[int], optional
+            Shape of each numeric value, by default () for scalars.
+
+        Raises
+        ------
+        ValueError
+            If the size is not positive.
+        ImportError
+            If a dtype is given and numpy is not installed.
+        """
+        if size <= 0:
+            raise ValueError("the size of a history should be positive")
+        history = _History(size, dtype, shape)
+        locks = self._acquire((key,))
+        try:
+            self._histories[key] = history
+        finally:
+            self._release(locks)
+
+    def disable_history(self, key: str) -> None:
+        """Stop keeping the values of the key, see `enable_history`. Nothing happens if it was not enabled.
+
+        Parameters
+        ----------
+        key : str
+            Key whose history is dropped.
+        """
+        locks = self._acquire((key,))
+        try:
+            self._histories.pop(key, None)
+        finally:
+            self._release(locks)
+
+    def get_history(self, key: str, n: int = None, deep_copy: bool = True,
+                    with_times: bool = False) -> typing.Any:
+        """Get the last values set for a key whose history is enabled, oldest first.
+
+        A numeric history returns a read-only numpy view of its buffer, so filters can run over it without any
+        copy. The view stays valid until `size - n` more values are set, after which the oldest ones are
+        overwritten; copy it with `array.copy()` to keep it longer. Other histories return a list of the values.
+
+        Parameters
+        ----------
+        key : str
+            Key whose history is enabled, in this board or one of its parents.
+        n : int, optional
+            Number of values, by default None for all the values kept. Fewer are returned if fewer were set.
+        deep_copy : bool, optional
+            Whether to create a deep_copy of the values of a non-numeric history, by default True
+        with_times : bool, optional
+            Whether to return the times the values were set as well, on the current clock, by default False
+
+        Returns
+        -------
+        typing.Any
+            The values, or a tuple of the times and the values if with_times is True.
+
+        Raises
+        ------
+        KeyError
+            If the history of the key is not enabled.
+        """
+        history = self._find_history(key)
+        return self._history_slice(history, *history.window(n), deep_copy, with_times)
+
+    def get_since(self, key: str, time: float, deep_copy: bool = True, with_times: bool = False) -> typing.Any:
+        """Get the values set for a key whose history is enabled at the given time or after, oldest first. Only the
+        values still kept are returned, the result is the same as `get_history` otherwise.
+
+        Parameters
+        ----------
+        key : str
+            Key whose history is enabled, in this board or one of its parents.
+        time : float
+            Time on the current clock, see `get_clock`.
+        deep_copy : bool, optional
+            Whether to create a deep_copy of the values of a non-numeric history, by default True
+        with_times : bool, optional
+            Whether to return the times the values were set as well, by default False
+
+        Returns
+        -------
+        typing.Any
+            The values, or a tuple of the times and the values if with_times is True.
+
+        Raises
+        ------
+        KeyError
+            If the history of the key is not enabled.
+        """
+        history = self._find_history(key)
+        return self._history_slice(history, *history.since(time), deep_copy, with_times)
+
+    def _find_history(self, key: str) -> _History:
+        board = self
+        while board is not None:
+            history = board._histories.get(key, None)
+            if history is not None:
+                return history
+            board = board._parent
+        raise KeyError(f"the history of {key} is not enabled")
+
+    def _history_slice(self, history: _History, start: int, end: int, deep_copy: bool,
+                       with_times: bool) -> typing.Any:
+        if history.numeric:
+            values = history.values[start:end]
+            values.flags.writeable = False
+            times = history.times[start:end]
+            times.flags.writeable = False
+        else:
+            memo = {}
+            values = [copy.deepcopy(entry.value, memo) if deep_copy and not entry.shared else entry.value
+                      for entry in history.values[start:end]]
+            times = history.times[start:end]
+        return (times, values) if with_times else values
+
+    def get_version(self, key: str) -> int:
+        """Number of times the key was set, which changes whenever its value does.
+
+        Parameters
+        ----------
+        key : str
+            Key to check
+
+        Returns
+        -------
+        int
+            Version of the key, 0 if it was never set. For a scope, the sets in its parents are counted as well.
+        """
+        entry = self._live_entry(key)
+        version = 0 if entry is None else entry.version
+        if self._parent is not None:
+            version += self._parent.get_version(key)
+        return version
+
+    def subscribe(self, key: str, callback: typing.Callable[[str], None]) -> None:
+        """Add a function that is called with the key whenever the key is set.
+
+        Parameters
+        ----------
+        key : str
+            Key to watch.
+        callback : typing.Callable[[str], None]
+            Function to call. It is called from the thread that set the key, so it should be fast.
+        """
+        with self._lock:
+            self._subscribers[key] = self._subscribers.get(key, []) + [callback]
+
+    def unsubscribe(self, key: str, callback: typing.Callable[[str], None]) -> None:
+        """Remove a function added with `subscribe`. Nothing happens if it was never added.
+
+        Parameters
+        ----------
+        key : str
+            Key the function was subscribed to.
+        callback : typing.Callable[[str], None]
+            Function to remove.
         """
         with self._lock:
-            if deep_copy:
-                self._map[key] = copy.deepcopy(value)
+            subscribers = [subscriber for subscriber in self._subscribers.get(key, []) if subscriber != callback]
+            if len(subscribers) > 0:
+                self._subscribers[key] = subscribers
             else:
-                self._map[key] = value
+                self._subscribers.pop(key, None)
+
+    def wait_for(self, key: str, predicate: typing.Callable[[typing.Any], bool] = None,
+                 timeout: float = None) -> bool:
+        """Block until the value of the key matches the predicate, without polling. The time is measured on the
+        current clock, see `get_clock`.
+
+        Parameters
+        ----------
+        key : str
+            Key to watch.
+        predicate : typing.Callable[[typing.Any], bool], optional
+            Function called with the value each time the key is set, it should not modify the value. By default
+            None, which waits until the key exists.
+        timeout : float, optional
+            Timeout in seconds, None will mean wait forever, by default None
+
+        Returns
+        -------
+        bool
+            True if the value matches, False if timeout.
+        """
+        clock = get_clock()
+        deadline = clock.deadline(timeout)
+        changed_event = ClockEvent()
+
+        def on_change(_: str) -> None:
+            changed_event.set()
+
+        # a scope reads the key from its parents as long as it does not have it.
+        boards = []
+        poll_interval = None
+        board = self
+        while board is not None:
+            boards.append(board)
+            board.subscribe(key, on_change)
+            if board._poll_interval is not None:
+                poll_interval = min(board._poll_interval, poll_interval or board._poll_interval)
+            board = board._parent
+        try:
+            while True:
+                # cleared before checking, so a set meanwhile wakes up the wait.
+                changed_event.clear()
+                entry = self._find_entry(key)
+                if entry is not None and (predicate is None or predicate(entry.value)):
+                    return True
+                remaining = clock.remaining(deadline)
+                if remaining == 0:
+                    return False
+                if poll_interval is not None:
+                    remaining = poll_interval if remaining is None else min(remaining, poll_interval)
+                clock.wait(changed_event, remaining)
+        finally:
+            for board in boards:
+                board.unsubscribe(key, on_change)
+
+    def _stripe_indices(self, keys: typing.Iterable[str]) -> typing.Dict[int, typing.List[str]]:
+        indices = {}
+        for key in keys:
+            indices.setdefault(hash(key) % len(self._stripes), []).append(key)
+        return indices
+
+    def _lock_stripes(self, indices: typing.Iterable[int]) -> typing.Tuple[typing.List[threading.Lock],
+                                                                           typing.Dict[int, float]]:
+        # lock the stripes in order of index, so concurrent bulk operations do not deadlock. Returns the locks and
+        # how long each stripe had to be waited for.
+        locks = []
+        wait_times = {}
+        for index in sorted(indices):
+            lock = self._stripes[index]
+            if lock.acquire(blocking=False):
+                wait_times[index] = 0.0
+            else:
+                start_time = time.perf_counter()
+                lock.acquire()
+                wait_times[index] = time.perf_counter() - start_time
+            locks.append(lock)
+        return locks, wait_times
+
+    def _release(self, locks: typing.List[threading.Lock]) -> None:
+        for lock in locks:
+            lock.release()
+
+    def _acquire(self, keys: typing.Sequence[str]) -> typing.List[threading.Lock]:
+        # lock the stripes of the keys for writing, counting how long writers waited for them.
+        indices = self._stripe_indices(keys)
+        locks, wait_times = self._lock_stripes(indices)
+        for index, stripe_keys in indices.items():
+            wait_time = wait_times[index]
+            for key in stripe_keys:
+                statistics = self._lock_statistics.get(key)
+                if statistics is None:
+                    statistics = self._lock_statistics[key] = _KeyLockStatistics()
+                statistics.acquisitions += 1
+                if wait_time > 0:
+                    statistics.contentions += 1
+                    statistics.wait_time += wait_time
+        return locks
+
+    def get_lock_statistics(self) -> typing.Dict[str, typing.Dict[str, float]]:
+        """Contention of the write locks for each key in the board, keys that were removed are forgotten. Reads do
+        not take any lock, snapshots take them without being counted.
+
+        Returns
+        -------
+        typing.Dict[str, typing.Dict[str, float]]
+            For each key, the number of times its lock was taken, how many of those had to wait for another
+            writer of the same stripe, and the total time in seconds spent waiting.
+        """
+        return {key: {'acquisitions': statistics.acquisitions,
+                      'contentions': statistics.contentions,
+                      'wait_time': statistics.wait_time}
+                for key, statistics in list(self._lock_statistics.items())}
 
     def exist(self, key: str) -> bool:
         """Checks whether a key already exist in the board.
@@ -65,14 +1012,142 @@ class Board():
         bool
             True if the key exist in the board, False otherwise.
         """
-        with self._lock:
-            return key in self._map
+        return self._find_entry(key) is not None
+
+    def scope(self, name: str = "") -> 'Board':
+        """Create a child board for a part of the machine, e.g. a nested state and its children. Reading a key
+        the scope does not have falls through to this board, while values set in the scope stay in the scope,
+        unless they are promoted with `promote`. Listeners are shared with this board.
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the scope, by default ""
+
+        Returns
+        -------
+        Board
+            The new scope.
+        """
+        child = Board(self._copy_on_write, len(self._stripes), instrumented=self._instrumented)
+        child._parent = self
+        child._scope_name = name if self._scope_name == "" else f"{self._scope_name}.{name}"
+        return child
+
+    def get_scope_name(self) -> str:
+        """Name of the scope, including the names of its parent scopes separated by dots. Empty for a board that
+        is not a scope.
+        """
+        return self._scope_name
+
+    def get_parent(self) -> 'Board':
+        """The board this scope reads from, None if this board is not a scope.
+        """
+        return self._parent
+
+    def promote(self, keys: typing.Iterable[str] = None) -> None:
+        """Move values set in this scope to its parent board, without copying them again.
+
+        Parameters
+        ----------
+        keys : typing.Iterable[str], optional
+            Keys to move, by default None for every key set in the scope. Keys the scope does not have are ignored.
+
+        Raises
+        ------
+        ValueError
+            If the board is not a scope.
+        """
+        if self._parent is None:
+            raise ValueError("only a scope can promote its values")
+        keys = list(self._entries.keys()) if keys is None else [key for key in keys if key in self._entries]
+        if len(keys) == 0:
+            return
+        locks = self._acquire(keys)
+        try:
+            entries = [(key, self._entries[key]) for key in keys if key in self._entries]
+            for key, _ in entries:
+                self._remove(key)
+        finally:
+            self._release(locks)
+        parent = self._parent
+        locks = parent._acquire([key for key, _ in entries])
+        try:
+            for key, entry in entries:
+                parent._publish(key, entry.value, entry.shared, entry.expires)
+        finally:
+            parent._release(locks)
+        if parent._bounded:
+            parent._evict()
+        for key, _ in entries:
+            for subscriber in parent._subscribers.get(key, ()):
+                subscriber(key)
+        parent.notify()
+
+    def release(self) -> None:
+        """Drop every value set in this board at once, e.g. when the scope of a nested state ends. The board can
+        still be used afterwards, it is then empty. Histories stay enabled but are emptied.
+        """
+        # replaced instead of cleared, so readers holding the old dictionary are safe.
+        entries = self._entries
+        self._entries = {}
+        self._lock_statistics = {}
+        with self._accounting_lock:
+            # versions never go back to a value they had, same as `_remove`.
+            for entry in entries.values():
+                self._removed_version = max(self._removed_version, entry.version)
+            self._usage = collections.OrderedDict()
+            self._reads = {}
+            self._num_bytes = 0
+            self._expirations = []
+            for statistics in self._key_statistics.values():
+                statistics.size = 0
+        for history in list(self._histories.values()):
+            history.count = 0
 
     def load(self, keypair: typing.Mapping[str, typing.Any]) -> None:
-        """deep copy a collection of key pairing into the board.
+        """deep copy a collection of key pairing into the board, in a single pass, see `set_many`.
 
         Args:
             keypair (typing.Mapping[str, typing.Any]): Values to be copied in.
         """
-        for key, item in keypair.items():
-            self.set(key, item, deep_copy=True)
+        self.set_many(keypair, deep_copy=True)
+
+    def add_listener(self, callback: typing.Callable[[], None]) -> None:
+        """Add a function that is called, without arguments, whenever a value is set in the board or
+        a state running with this board finishes.
+
+        Parameters
+        ----------
+        callback : typing.Callable[[], None]
+            Function to call. It is called from the thread that made the change, so it should be fast.
+        """
+        if self._parent is not None:
+            self._parent.add_listener(callback)
+            return
+        with self._lock:
+            self._listeners = self._listeners + [callback]
+
+    def remove_listener(self, callback: typing.Callable[[], None]) -> None:
+        """Remove a function added with `add_listener`. Nothing happens if it was never added.
+
+        Parameters
+        ----------
+        callback : typing.Callable[[], None]
+            Function to remove.
+        """
+        if self._parent is not None:
+            self._parent.remove_listener(callback)
+            return
+        with self._lock:
+            self._listeners = [listener for listener in self._listeners if listener != callback]
+
+    def notify(self) -> None:
+        """Call all the listeners of the board.
+        """
+        if self._parent is not None:
+            self._parent.notify()
+            return
+        # the list is replaced instead of modified, so it can be iterated without the lock.
+        for listener in self._listeners:
+            listener()
@@ -0,0 +1,280 @@
+import contextlib
+import threading
+import time
+import typing
+
+
+class Clock():
+    """Source of time for the states and machines. All timestamps, timeouts and sleeps in the library go
+    through the current clock, see `get_clock` and `set_clock`. The default `RealClock` uses `time.monotonic`.
+    """
+
+    def time(self) -> float:
+        """Current time in seconds. Only differences between two values are meaningful.
+        """
+        raise NotImplementedError("Default time method is not overwritten")
+
+    def wait(self, event: threading.Event = None, timeout: float = None) -> bool:
+        """Block until the event is set or the timeout passed on this clock.
+
+        Parameters
+        ----------
+        event : threading.Event, optional
+            Event to wait for, it should be a `ClockEvent` so the clock knows when it is set, by default None
+        timeout : float, optional
+            Timeout in seconds, None will mean wait forever, by default None
+
+        Returns
+        -------
+        bool
+            True if the event is set, False if timeout.
+        """
+        return self.wait_until(event, None if timeout is None else self.time() + timeout)
+
+    def wait_until(self, event: threading.Event = None, deadline: float = None) -> bool:
+        """Same as `wait`, with an absolute deadline on this clock instead of a timeout.
+        """
+        raise NotImplementedError("Default wait_until method is not overwritten")
+
+    def sleep(self, duration: float) -> None:
+        """Block for the given time in seconds.
+        """
+        self.wait(None, max(0.0, duration))
+
+    def spin_until(self, deadline: float, event: threading.Event = None) -> None:
+        """Busy wait until the deadline or until the event is set. Clocks that do not move on their own
+        block instead.
+        """
+        if deadline > self.time():
+            self.wait_until(event, deadline)
+
+    def deadline(self, timeout: float = None) -> float:
+        """Absolute deadline on this clock for a timeout starting now, None if the timeout is None.
+        """
+        return None if timeout is None else self.time() + timeout
+
+    def remaining(self, deadline: float = None) -> float:
+        """Time in seconds left until a deadline returned by `deadline`, 0 if it passed and None if there is none.
+        This lets nested waits share a single timeout.
+        """
+        return None if deadline is None else max(0.0, deadline - self.time())
+
+    def add_execution(self) -> None:
+        """Called before an execution is submitted to a thread. The clock might use it to know when every
+        execution is idle.
+        """
+        pass
+
+    def remove_execution(self) -> None:
+        """Called once an execution added with `add_execution` finished.
+        """
+        pass
+
+    def bind_thread(self) -> None:
+        """Mark the current thread as running an execution added with `add_execution`.
+        """
+        pass
+
+    def unbind_thread(self) -> None:
+        """Mark the current thread as no longer running an execution.
+        """
+        pass
+
+    @contextlib.contextmanager
+    def drive(self) -> typing.Iterator['Clock']:
+        """Count the current thread as an execution while in the context. With a `SimulatedClock`, the time then
+        only moves while this thread waits on the clock, e.g. in `sleep` or `State.wait`, so it can inspect the
+        states in between.
+        """
+        self.add_execution()
+        self.bind_thread()
+        try:
+            yield self
+        finally:
+            self.unbind_thread()
+            self.remove_execution()
+
+    def _notify_event(self, event: threading.Event) -> None:
+        pass
+
+
+class RealClock(Clock):
+    """Clock following `time.monotonic`.
+    """
+
+    def time(self) -> float:
+        return time.monotonic()
+
+    def wait(self, event: threading.Event = None, timeout: float = None) -> bool:
+        if event is not None:
+            return event.wait(timeout)
+        if timeout is None:
+            raise ValueError("cannot wait forever without an event")
+        time.sleep(max(0.0, timeout))
+        return False
+
+    def wait_until(self, event: threading.Event = None, deadline: float = None) -> bool:
+        return self.wait(event, None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def spin_until(self, deadline: float, event: threading.Event = None) -> None:
+        while time.monotonic() < deadline:
+            if event is not None and event.is_set():
+                return
+
+
+class _Waiter():
+
+    event: threading.Event
+    deadline: float
+    counted: bool
+    woken: bool
+
+    def __init__(self, event: threading.Event, deadline: float, counted: bool):
+        self.event = event
+        self.deadline = deadline
+        self.counted = counted
+        self.woken = False
+
+
+class SimulatedClock(Clock):
+    """Virtual clock for accelerated and repeatable runs. Time only moves when every execution is idle, i.e.
+    waiting on the clock, and then jumps directly to the next pending deadline. A `WaitState` of one minute
+    therefore finishes as soon as everything else is waiting as well.
+
+    Executions are the `execute` methods running on a `ThreadExecutor` or `PooledExecutor` and the threads of
+    a `MachineGroup`. `AsyncState` and `AsyncMachine` sleep on their event loop, which keeps using real time.
+    Anything else an execution blocks on holds the time still, e.g. `time.sleep`, so they should wait through
+    the clock instead. Set the clock before starting any machine.
+    """
+
+    _now: float
+    _condition: threading.Condition
+    _waiters: typing.List[_Waiter]
+    _num_active: int
+    _local: threading.local
+
+    def __init__(self, start_time: float = 0.0):
+        """Constructor for SimulatedClock
+
+        Parameters
+        ----------
+        start_time : float, optional
+            Initial time of the clock in seconds, by default 0.0
+        """
+        self._now = start_time
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._num_active = 0
+        self._local = threading.local()
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, duration: float) -> None:
+        """Move the clock forward by the given time in seconds. Waits that passed their deadline end once every
+        execution is idle.
+        """
+        with self._condition:
+            self._now += max(0.0, duration)
+            self._maybe_advance()
+
+    def num_active(self) -> int:
+        """Number of executions that are currently not waiting on the clock.
+        """
+        with self._condition:
+            return self._num_active
+
+    def wait_until(self, event: threading.Event = None, deadline: float = None) -> bool:
+        if event is not None and event.is_set():
+            return True
+        if event is None and deadline is None:
+            raise ValueError("cannot wait forever without an event")
+        counted = getattr(self._local, 'bound', False)
+        with self._condition:
+            waiter = _Waiter(event, deadline, counted)
+            self._waiters.append(waiter)
+            if counted:
+                self._num_active -= 1
+            # the event might have been set before the waiter was added.
+            if event is not None and event.is_set():
+                self._wake(waiter)
+            self._maybe_advance()
+            while not waiter.woken:
+                self._condition.wait()
+            self._waiters.remove(waiter)
+        return event is not None and event.is_set()
+
+    def add_execution(self) -> None:
+        with self._condition:
+            self._num_active += 1
+
+    def remove_execution(self) -> None:
+        with self._condition:
+            self._num_active -= 1
+            self._maybe_advance()
+
+    def bind_thread(self) -> None:
+        self._local.bound = True
+
+    def unbind_thread(self) -> None:
+        self._local.bound = False
+
+    def _notify_event(self, event: threading.Event) -> None:
+        with self._condition:
+            for waiter in self._waiters:
+                if waiter.event is event and not waiter.woken:
+                    self._wake(waiter)
+
+    def _wake(self, waiter: _Waiter) -> None:
+        # count the execution as active right away, so the time does not move before its thread wakes up.
+        waiter.woken = True
+        if waiter.counted:
+            self._num_active += 1
+        self._condition.notify_all()
+
+    def _maybe_advance(self) -> None:
+        # once every execution is waiting, jump to the next deadline. Waiters are woken one at a time, in
+        # order of deadline and then of arrival, so executions due at the same time run in a repeatable order.
+        while self._num_active == 0:
+            pending = [w for w in self._waiters if not w.woken and w.deadline is not None]
+            if len(pending) == 0:
+                return
+            waiter = min(pending, key=lambda w: w.deadline)
+            self._now = max(self._now, waiter.deadline)
+            self._wake(waiter)
+
+
+class ClockEvent(threading.Event):
+    """`threading.Event` that tells the current clock when it is set, so a `SimulatedClock` knows that the
+    executions waiting on it are active again. Events waited on through the clock should be of this type.
+    """
+
+    def set(self) -> None:
+        super().set()
+        _clock._notify_event(self)
+
+
+_clock: Clock = RealClock()
+
+
+def get_clock() -> Clock:
+    """Get the clock used by the states and machines.
+
+    Returns
+    -------
+    Clock
+        The current clock.
+    """
+    return _clock
+
+
+def set_clock(clock: Clock) -> None:
+    """Set the clock used by the states and machines, e.g. a `SimulatedClock` to run faster than real time.
+
+    Parameters
+    ----------
+    clock : Clock
+        The new clock, None to go back to real time.
+    """
+    global _clock
+    _clock = RealClock() if clock is None else clock
@@ -0,0 +1,359 @@
+import asyncio
+import collections
+import concurrent.futures
+import threading
+import typing
+
+from .clock import Clock, ClockEvent, get_clock
+
+
+class ExecutionHandle():
+    """Handle of a single `execute` run submitted to an `Executor`. It mirrors the part of the
+    `threading.Thread` API used by the states (`is_alive` and `join`), so the handle can be
+    stored in `State._run_thread` without changing how the rest of the library checks it.
+    """
+
+    _name: str
+    _started_event: threading.Event
+    _done_event: ClockEvent
+    _clock: Clock
+    _thread_ident: int
+    _future: concurrent.futures.Future
+    _done_callbacks: typing.List[typing.Callable[[], None]]
+
+    def __init__(self, name: str = ""):
+        self._name = name
+        self._started_event = threading.Event()
+        self._done_event = ClockEvent()
+        self._clock = None
+        self._thread_ident = None
+        self._future = None
+        self._done_callbacks = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def is_alive(self) -> bool:
+        """Whether the submitted function is still queued or running.
+
+        Returns
+        -------
+        bool
+            True if the function has not returned yet.
+        """
+        return not self._done_event.is_set()
+
+    def join(self, timeout: float = None) -> None:
+        """Wait until the submitted function returns.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Timeout in seconds, None will mean wait forever, by default None
+
+        Raises
+        ------
+        RuntimeError
+            If called from the thread running the function, same as `threading.Thread.join`.
+        """
+        if self._thread_ident == threading.get_ident() and self.is_alive():
+            raise RuntimeError("cannot join current thread")
+        get_clock().wait(self._done_event, timeout)
+
+    def add_done_callback(self, callback: typing.Callable[[], None]) -> None:
+        """Add a function that is called, without arguments, once the submitted function returns.
+        Callbacks should be added before the handle is submitted.
+
+        Parameters
+        ----------
+        callback : typing.Callable[[], None]
+            Function to call.
+        """
+        self._done_callbacks.append(callback)
+
+    def _set_done(self) -> None:
+        self._done_event.set()
+        for callback in self._done_callbacks:
+            callback()
+
+    def cancel(self) -> bool:
+        """Request the cancellation of the submitted function. Only coroutines running on an
+        `EventLoopExecutor` can be cancelled, threads have to check the interrupt flag themselves.
+
+        Returns
+        -------
+        bool
+            True if a cancellation was requested.
+        """
+        if self._future is None:
+            return False
+        return self._future.cancel()
+
+    def _count_execution(self) -> None:
+        # called before the handle is submitted to a thread, see `Clock.add_execution`.
+        self._clock = get_clock()
+        self._clock.add_execution()
+
+    def _run(self, target: typing.Callable, args: tuple) -> None:
+        self._thread_ident = threading.get_ident()
+        if self._clock is not None:
+            self._clock.bind_thread()
+        self._started_event.set()
+        try:
+            target(*args)
+        finally:
+            self._thread_ident = None
+            if self._clock is not None:
+                self._clock.unbind_thread()
+            # wake up the waiting executions before this one stops counting as active.
+            self._set_done()
+            if self._clock is not None:
+                self._clock.remove_execution()
+
+    async def _run_async(self, target: typing.Callable, args: tuple) -> None:
+        if self._done_event.is_set():
+            # cancelled before it started, see `_set_done_if_not_started`.
+            return
+        self._started_event.set()
+        try:
+            await target(*args)
+        finally:
+            # set once the coroutine is done with its cleanup, not when it is cancelled.
+            self._set_done()
+
+    def _set_done_if_not_started(self) -> None:
+        # called on the loop thread after the task is cancelled, so the coroutine either started already and sets
+        # the done event itself, or sees it set and never runs.
+        if not self._started_event.is_set():
+            self._set_done()
+
+
+class Executor():
+    """Backend that runs the `execute` method of states. Derived classes overwrite `submit`.
+    """
+
+    def submit(self, handle: ExecutionHandle, target: typing.Callable, args: tuple = ()) -> None:
+        """Run the target with the given arguments asynchronously. The handle is created by the caller,
+        so it can be stored before the target starts running.
+
+        Parameters
+        ----------
+        handle : ExecutionHandle
+            Handle that tracks the completion of the function. Its name is used for the thread running it.
+        target : typing.Callable
+            Function to run.
+        args : tuple, optional
+            Arguments passed to the function, by default ()
+        """
+        raise NotImplementedError("Default submit method is not overwritten")
+
+
+class ThreadExecutor(Executor):
+    """Executor that creates a new thread for every submission. This is the behavior of
+    previous versions of the library.
+    """
+
+    def submit(self, handle: ExecutionHandle, target: typing.Callable, args: tuple = ()) -> None:
+        handle._count_execution()
+        threading.Thread(target=handle._run, args=(target, args), name=handle.name).start()
+
+
+class PooledExecutor(Executor):
+    """Executor that reuses worker threads between submissions. A submission is handed to an idle
+    worker if there is one, otherwise a new worker is created. Nested states block on their children,
+    so a submission is never queued behind a busy worker. Only the number of idle workers kept
+    around is bounded.
+    """
+
+    _max_idle: int
+    _idle_timeout: float
+    _lock: threading.Lock
+    _idle_workers: typing.Deque['_PooledWorker']
+    _num_workers: int
+    _num_created: int
+
+    def __init__(self, max_idle: int = 32, idle_timeout: float = 60.0):
+        """Constructor for PooledExecutor
+
+        Parameters
+        ----------
+        max_idle : int, optional
+            Maximum number of idle workers kept for reuse, by default 32
+        idle_timeout : float, optional
+            Time in seconds an idle worker waits for work before exiting, by default 60.0
+        """
+        self._max_idle = max_idle
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle_workers = collections.deque()
+        self._num_workers = 0
+        self._num_created = 0
+
+    def submit(self, handle: ExecutionHandle, target: typing.Callable, args: tuple = ()) -> None:
+        handle._count_execution()
+        with self._lock:
+            worker = self._idle_workers.pop() if self._idle_workers else None
+            if worker is None:
+                worker = _PooledWorker(self)
+                self._num_workers += 1
+                self._num_created += 1
+            worker.assign(handle, target, args)
+        if not worker.is_alive():
+            worker.start()
+        # same as `threading.Thread.start`, only return once the function is running.
+        handle._started_event.wait()
+
+    def num_workers(self) -> int:
+        """Number of workers alive, both idle and busy.
+        """
+        with self._lock:
+            return self._num_workers
+
+    def num_created(self) -> int:
+        """Number of workers created since the executor was constructed.
+        """
+        with self._lock:
+            return self._num_created
+
+    def _return_worker(self, worker: '_PooledWorker') -> bool:
+        # called by the worker once its task is done. Returns False if the worker should exit.
+        with self._lock:
+            if len(self._idle_workers) >= self._max_idle:
+                self._num_workers -= 1
+                return False
+            self._idle_workers.append(worker)
+            return True
+
+    def _retire_worker(self, worker: '_PooledWorker') -> bool:
+        # called by an idle worker that timed out. Returns False if work was assigned in the meantime.
+        with self._lock:
+            try:
+                self._idle_workers.remove(worker)
+            except ValueError:
+                return False
+            self._num_workers -= 1
+            return True
+
+
+class _PooledWorker(threading.Thread):
+
+    # how often an idle worker checks whether the main thread has exited
+    _POLL_INTERVAL = 0.1
+
+    _executor: PooledExecutor
+    _task_event: threading.Event
+    _task: tuple
+
+    def __init__(self, executor: PooledExecutor):
+        super().__init__(name="PooledWorker")
+        self._executor = executor
+        self._task_event = threading.Event()
+        self._task = None
+
+    def assign(self, handle: ExecutionHandle, target: typing.Callable, args: tuple) -> None:
+        self._task = (handle, target, args)
+        self._task_event.set()
+
+    def _wait_for_task(self) -> bool:
+        idle_time = 0.0
+        while not self._task_event.wait(self._POLL_INTERVAL):
+            idle_time += self._POLL_INTERVAL
+            # idle workers should not keep the interpreter alive.
+            if idle_time >= self._executor._idle_timeout or not threading.main_thread().is_alive():
+                if self._executor._retire_worker(self):
+                    return False
+        return True
+
+    def run(self) -> None:
+        while self._wait_for_task():
+            self._task_event.clear()
+            handle, target, args = self._task
+            self._task = None
+            # name the thread after the state for debugging.
+            self.name = handle.name
+            handle._run(target, args)
+            self.name = "PooledWorker"
+            if not self._executor._return_worker(self):
+                return
+
+
+class EventLoopExecutor(Executor):
+    """Executor that runs coroutine functions as tasks on a single asyncio event loop. The loop
+    runs in its own daemon thread, which is created on the first submission.
+    """
+
+    _lock: threading.Lock
+    _loop: asyncio.AbstractEventLoop
+    _loop_thread: threading.Thread
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_thread = None
+
+    def get_loop(self) -> asyncio.AbstractEventLoop:
+        """Get the event loop of this executor, starting it if required.
+
+        Returns
+        -------
+        asyncio.AbstractEventLoop
+            The running event loop.
+        """
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._run_loop, name="EventLoopExecutor", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def submit(self, handle: ExecutionHandle, target: typing.Callable, args: tuple = ()) -> None:
+        loop = self.get_loop()
+        # joining a task from the loop thread would block the loop forever.
+        handle._thread_ident = self._loop_thread.ident
+        handle._future = asyncio.run_coroutine_threadsafe(handle._run_async(target, args), loop)
+        # the future is cancelled right away, the done event is only set here if the task never started.
+        handle._future.add_done_callback(
+            lambda future: loop.call_soon_threadsafe(handle._set_done_if_not_started) if future.cancelled() else None)
+
+
+_default_executor: Executor = PooledExecutor()
+_default_event_loop_executor: EventLoopExecutor = EventLoopExecutor()
+
+
+def get_default_executor() -> Executor:
+    """Get the executor used by states that do not have their own executor.
+
+    Returns
+    -------
+    Executor
+        The default executor.
+    """
+    return _default_executor
+
+
+def set_default_executor(executor: Executor) -> None:
+    """Set the executor used by states that do not have their own executor.
+
+    Parameters
+    ----------
+    executor : Executor
+        The new default executor, e.g. `ThreadExecutor()` to create a thread per state activation.
+    """
+    global _default_executor
+    _default_executor = executor
+
+
+def get_default_event_loop_executor() -> EventLoopExecutor:
+    """Get the executor used by `AsyncState` that do not have their own executor.
+
+    Returns
+    -------
+    EventLoopExecutor
+        The default event loop executor.
+    """
+    return _default_event_loop_executor
@@ -0,0 +1,229 @@
+import array
+import itertools
+import json
+import logging
+import os
+import struct
+import threading
+import typing
+
+from .state import State
+from .state_monitor import StateMonitor, _state_paths
+from .state_status import StateStatus
+
+# header of a dump: magic, format version, capacity, number of events written and length of the state names.
+_HEADER = struct.Struct('<4sIQQQ')
+_MAGIC = b'BMFR'
+_VERSION = 1
+_KIND_STATUS = 0
+_KIND_TRANSITION = 1
+
+
+class FlightRecorder(StateMonitor):
+    """Monitor logging every status change and transition of the states it is attached to in a fixed size ring
+    buffer, allocated once, so it can always be on and tell what a machine did before something went wrong.
+
+    The buffer is made of `array` columns: the time, the kind of event, the state, its new status or the state a
+    transition goes to, and a sequence number. States are interned as small integers, their names are only
+    written once in a dump. Recording an event reserves a slot with a shared counter and fills the columns,
+    without lock, in about a microsecond.
+
+    The buffer is written to a file by `dump`, and automatically when a state ends with an exception if
+    `dump_path` is given. The exception then reaches every nested state above the state that raised it, the file is
+    only written for the first of them. `load_flight_record` decodes a file back into the timeline.
+    """
+
+    _capacity: int
+    _dump_path: str
+    _counter: typing.Iterator[int]  # gives out the sequence number of each event
+    _times: array.array
+    _kinds: array.array
+    _states: array.array
+    _values: array.array
+    _sequences: array.array  # sequence number of the event in each slot, written last, -1 if the slot is empty
+    _ids: typing.Dict[int, int]  # interned id of each state, by id
+    _names: typing.List[typing.Tuple[str, str]]  # path and type of each interned state
+    _lock: threading.Lock  # guards the interning of new states and the dumps
+    _logger: logging.Logger
+    _dumped_exception: Exception  # exception of the last automatic dump, the nested states above it share it
+
+    def __init__(self, capacity: int = 65536, dump_path: str = None, logger: logging.Logger = None):
+        """Constructor for FlightRecorder
+
+        Parameters
+        ----------
+        capacity : int, optional
+            Number of events kept, older events are overwritten, by default 65536
+        dump_path : str, optional
+            File the buffer is dumped to whenever a state ends with an exception, by default None for no
+            automatic dumps
+        logger : logging.Logger, optional
+            Logger for the errors of automatic dumps, by default None for the logger of this module
+        """
+        self._capacity = capacity
+        self._dump_path = dump_path
+        self._counter = itertools.count()
+        self._times = array.array('d', bytes(8 * capacity))
+        self._kinds = array.array('b', bytes(capacity))
+        self._states = array.array('i', bytes(4 * capacity))
+        self._values = array.array('i', bytes(4 * capacity))
+        self._sequences = array.array('q', [-1]) * capacity
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self._logger = logging.getLogger(__name__) if logger is None else logger
+        self._dumped_exception = None
+
+    def attach(self, state: State) -> None:
+        # the states are interned with their path in the tree.
+        for reachable, path in _state_paths(state):
+            self._intern(reachable, path)
+        super().attach(state)
+
+    def _intern(self, state: State, path: str = None) -> int:
+        state_id = self._ids.get(id(state))
+        if state_id is None:
+            with self._lock:
+                state_id = self._ids.get(id(state))
+                if state_id is None:
+                    state_id = len(self._names)
+                    self._names.append((state._name if path is None else path, type(state).__name__))
+                    self._ids[id(state)] = state_id
+        return state_id
+
+    def _record(self, time: float, kind: int, state_id: int, value: int) -> None:
+        # next on a counter is atomic, so each event gets its own slot.
+        sequence = next(self._counter)
+        index = sequence % self._capacity
+        # the slot is marked empty while it is rewritten, so a dump taken meanwhile skips it.
+        self._sequences[index] = -1
+        self._times[index] = time
+        self._kinds[index] = kind
+        self._states[index] = state_id
+        self._values[index] = value
+        self._sequences[index] = sequence
+
+    def on_status(self, state: State, status: StateStatus, time: float) -> None:
+        if status is None:
+            return
+        self._record(time, _KIND_STATUS, self._intern(state), status.value)
+        if status == StateStatus.EXCEPTION and self._dump_path is not None:
+            self._dump_on_exception(state)
+
+    def _dump_on_exception(self, state: State) -> None:
+        # nested states pass the exception of their child on, so a failure is only dumped once.
+        exception = state._internal_exception
+        with self._lock:
+            if exception is not None and exception is self._dumped_exception:
+                return
+            self._dumped_exception = exception
+        try:
+            self.dump(self._dump_path)
+        except OSError:
+            # the dump runs in the thread of the failing state, it should not hide the original exception.
+            self._logger.exception("flight record of %s could not be written to %s", state._name, self._dump_path)
+
+    def on_transition(self, state: State, next_state: State, time: float) -> None:
+        self._record(time, _KIND_TRANSITION, self._intern(state), self._intern(next_state))
+
+    def dump(self, file_path: str) -> None:
+        """Write the buffer and the names of the states to a binary file, see `load_flight_record`. Events recorded
+        while dumping might be missing from it.
+
+        Parameters
+        ----------
+        file_path : str
+            Path of the file, it is replaced at once so readers never see a partial dump.
+        """
+        with self._lock:
+            names, sequences, columns = self._copy()
+            encoded_names = json.dumps(names).encode('utf-8')
+            temporary_path = f"{file_path}.tmp"
+            with open(temporary_path, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, _VERSION, self._capacity, max(sequences) + 1, len(encoded_names)))
+                f.write(encoded_names)
+                f.write(sequences.tobytes())
+                for column in columns:
+                    f.write(column.tobytes())
+            os.replace(temporary_path, file_path)
+
+    def get_timeline(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Decode the events currently in the buffer, oldest first, same as dumping and loading them.
+
+        Returns
+        -------
+        typing.List[typing.Dict[str, typing.Any]]
+            The events, see `load_flight_record`.
+        """
+        with self._lock:
+            names, sequences, columns = self._copy()
+        return _decode(names, sequences, *columns)
+
+    def _copy(self) -> typing.Tuple[typing.List[typing.Tuple[str, str]], array.array, typing.List[array.array]]:
+        # copy of the names, sequence numbers and columns, the lock should be held. Events keep being recorded
+        # meanwhile, so the sequence numbers are read before and after the columns, and the slots where they differ
+        # are marked empty: their columns might mix two events.
+        names = list(self._names)
+        sequences = array.array('q', self._sequences)
+        columns = [array.array(column.typecode, column) for column in
+                   (self._times, self._kinds, self._states, self._values)]
+        for index, sequence in enumerate(array.array('q', self._sequences)):
+            if sequence != sequences[index]:
+                sequences[index] = -1
+        return names, sequences, columns
+
+
+def load_flight_record(file_path: str) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Decode a file written by `FlightRecorder.dump` into the timeline of the events it holds.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file.
+
+    Returns
+    -------
+    typing.List[typing.Dict[str, typing.Any]]
+        The events, oldest first. Each event has its sequence number, time, kind ('status' or 'transition'), and
+        the path and type of the state. Status events add the new status, transitions the path of the next state.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a flight record.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{file_path} is not a flight record")
+    magic, version, capacity, _, names_length = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"{file_path} is not a flight record")
+    offset = _HEADER.size
+    names = [tuple(name) for name in json.loads(data[offset:offset + names_length].decode('utf-8'))]
+    offset += names_length
+    columns = []
+    for typecode in ('q', 'd', 'b', 'i', 'i'):
+        column = array.array(typecode)
+        size = column.itemsize * capacity
+        column.frombytes(data[offset:offset + size])
+        offset += size
+        columns.append(column)
+    return _decode(names, *columns)
+
+
+def _decode(names: typing.List[typing.Tuple[str, str]], sequences: array.array, times: array.array,
+            kinds: array.array, states: array.array, values: array.array) -> typing.List[typing.Dict[str, typing.Any]]:
+    events = []
+    for index in sorted((index for index in range(0, len(sequences)) if sequences[index] >= 0),
+                        key=lambda index: sequences[index]):
+        path, type_name = names[states[index]]
+        event = {'sequence': sequences[index], 'time': times[index], 'state': path, 'type': type_name}
+        if kinds[index] == _KIND_STATUS:
+            event['kind'] = 'status'
+            event['status'] = StateStatus(values[index]).name
+        else:
+            event['kind'] = 'transition'
+            event['to'] = names[values[index]][0]
+        events.append(event)
+    return events
@@ -1,12 +1,14 @@
 import logging
 import sys
-import time
 import typing
 
 from .board import Board
+from .clock import ClockEvent, get_clock
 from .nested_state import NestedState
 from .state import State, StateStatus
-from .utils import parse_debug_info
+from .step_state import StepState
+from .tick_scheduler import TickScheduler
+from .utils import DebugInfoLines
 
 
 class Machine(NestedState):
@@ -18,9 +20,47 @@ class Machine(NestedState):
     _rate: float  # Rate to tick
     _debug_flag: bool
     _debug_cb: typing.Callable[[typing.Dict[str, typing.Any]], None]
+    _status_version: int  # Incremented whenever the status of a state of this machine changes
+    _debug_version: int  # Status version when the debug information was last built
+    _last_debug_info: typing.Dict[str, typing.Any]  # Debug information last published
     _logger: logging.Logger
+    _event_driven: bool  # Whether to tick as soon as something changes
+    _wake_event: ClockEvent  # Event that wakes up the tick loop
+    _group_wake: typing.Callable[['Machine'], None]  # Wakes up the group ticking the machine, None if not in one
+    _scheduler: TickScheduler  # Deadlines and statistics of the ticks
 
-    def __init__(self, name, root, end_state_ids=None, rate=1.0, debug: bool = False, debug_cb=None, logger: logging.Logger = None):
+    def __init__(self, name, root, end_state_ids=None, rate=1.0, debug: bool = False, debug_cb=None,
+                 logger: logging.Logger = None, event_driven: bool = False, busy_wait: float = 0.0, scoped: bool = False):
+        """Constructor for Machine
+
+        Parameters
+        ----------
+        name : str
+            Name of the machine.
+        root : State
+            Starting state.
+        end_state_ids : list, optional
+            Names of the states where the machine ends once they finish, by default None
+        rate : float, optional
+            Rate in Hz to tick the states, by default 1.0
+        debug : bool, optional
+            Whether to publish debug information after ticks where the status or current state of a
+            nested state changed, by default False
+        debug_cb : typing.Callable, optional
+            Callback that receives the debug information and a `DebugInfoLines`, a read-only sequence of its
+            formatted lines, by default None
+        logger : logging.Logger, optional
+            Logger for debug information and warnings, by default None
+        event_driven : bool, optional
+            Whether to tick as soon as a state finishes, a value is set in the board or the machine is interrupted,
+            instead of waiting for the next period. The rate is still the slowest the machine ticks, by default False
+        busy_wait : float, optional
+            Time in seconds before each tick spent busy waiting instead of sleeping, for sub-millisecond precision
+            at high rates. It costs CPU time, by default 0.0
+        scoped : bool, optional
+            Whether the states of the machine use a scope of the board, see `Board.scope`. Values they set and do
+            not promote are dropped once the machine finishes, by default False
+        """
         self._root = root
         self._curr_state = root
         self._started = False
@@ -28,73 +68,157 @@ class Machine(NestedState):
         self._rate = 1.0 / rate
         self._debug_flag = debug
         self._debug_cb = debug_cb
+        self._status_version = 0
+        self._debug_version = -1
+        self._last_debug_info = None
         self._logger = logger
-        super(Machine, self).__init__(name)
+        self._event_driven = event_driven
+        self._wake_event = ClockEvent()
+        self._group_wake = None
+        self._scheduler = TickScheduler(self._rate, busy_wait)
+        super(Machine, self).__init__(name, scoped)
 
     def start(self, board: Board, flow_in: typing.Any = None, manual_exec=False) -> None:
         # Overwrites States' start
+        self._debug_version = -1
+        self._last_debug_info = None
         self._status = StateStatus.RUNNING
         # Method that is called when first enter this state.
         self._curr_state = self._root
         self._interupted_event.clear()
-        # start the current state first before
-        self._curr_state.start(board, flow_in)
-        # start the execution pipeline which automatically runs a state machine.
-        if not manual_exec:
-            super().start(board)
+        # a new execution starts with a new scope.
+        self._release_scopes()
+        board = self._get_scope(board, self)
+        # hold the clock, otherwise a simulated clock moves as soon as the root state waits on it.
+        clock = get_clock()
+        clock.add_execution()
+        for state, _ in _reachable_states(self._root):
+            # the step states of the machine are advanced by its ticks, not by whoever waits on them.
+            if isinstance(state, StepState):
+                state._ticked = True
+            # the debug information only changes with the status of the states of this machine.
+            if self._debug_flag and self._on_state_status not in state._status_listeners:
+                state._add_status_listener(self._on_state_status)
+        try:
+            # start the current state first before
+            self._curr_state.start(board, flow_in)
+            # start the execution pipeline which automatically runs a state machine.
+            if not manual_exec:
+                super().start(board)
+        finally:
+            clock.remove_execution()
 
     def execute(self, board: Board):
-        # tick the internal states
-        while not self.is_interrupted():
-            # start time
-            start_time_tick = time.time()
-            # check the internal states
-            self.update(board)
-            # we publish any debug information if requested
-            if self._debug_flag:
-                # get debug info
-                debug_info = self.get_debug_info()
-                # parse the information
-                parsed_info = parse_debug_info(debug_info, prefix="[Base] ")
-                # call the cb if we have it
-                if self._debug_cb is not None:
-                    self._debug_cb(debug_info, parsed_info)
-                # log it
-                if self._logger is not None:
-                    self._logger.debug(('\n').join(parsed_info))
-
-            # quit if we reach an end state & the state has ended
-            if self.is_end():
-                return StateStatus.SUCCESS
-            # check if the state or its nested states has thrown an exception
-            if self._curr_state.check_status(StateStatus.EXCEPTION):
-                self.propergate_exception_information(self._curr_state)
-                return StateStatus.EXCEPTION
-
-            #TODO this part probably can be improved through better code + CPYTHON implementaions
-            # sleep for the remaining time
-            passed_time = time.time() - start_time_tick
-            if passed_time > self._rate:
-                # warn about slow tick rate
-                if self._logger is not None:
-                    self._logger.warn(f"Machine{self.get_debug_name()} \
-                        ticking at {passed_time} which is larger than {self._rate}")
-            else:
-                time.sleep(self._rate - passed_time)
+        if self._event_driven and board is not None:
+            board.add_listener(self._wake)
+        self._scheduler.reset()
+        try:
+            # tick the internal states
+            while not self.is_interrupted():
+                self._scheduler.begin_tick()
+                # clear before checking, so changes during the tick wake up the next one.
+                self._wake_event.clear()
+                # check the internal states
+                status = self._tick_once(board)
+                self._end_tick()
+                if status is not None:
+                    return status
+                # sleep until the next deadline
+                self._scheduler.sleep(self._wake_event if self._event_driven else None)
+        finally:
+            if self._event_driven and board is not None:
+                board.remove_listener(self._wake)
 
         return StateStatus.INTERRUPTED
 
+    def _wake(self) -> None:
+        # wake the tick loop up before the end of the period.
+        self._wake_event.set()
+
+    def _tick_once(self, board: Board) -> StateStatus:
+        # update the internal states, return the machine's status if it should stop, None otherwise.
+        if len(self._monitors) == 0:
+            return self._tick_states(board)
+        clock = get_clock()
+        start_time = clock.time()
+        try:
+            return self._tick_states(board)
+        finally:
+            end_time = clock.time()
+            for monitor in self._monitors:
+                monitor.on_tick(self, start_time, end_time)
+
+    def _tick_states(self, board: Board) -> StateStatus:
+        self.update(board)
+        # we publish any debug information if requested
+        if self._debug_flag:
+            self._publish_debug_info()
+
+        # quit if we reach an end state & the state has ended
+        if self.is_end():
+            return StateStatus.SUCCESS
+        # check if the state or its nested states has thrown an exception
+        if self._curr_state.check_status(StateStatus.EXCEPTION):
+            self.propergate_exception_information(self._curr_state)
+            return StateStatus.EXCEPTION
+        return None
+
+    def _on_state_status(self, state: State) -> None:
+        self._status_version += 1
+
+    def _publish_debug_info(self) -> None:
+        # only rebuild the information if any status of this machine changed since the last time, including the
+        # start of a new state. The version is read first, so changes while building are picked up by the next tick.
+        version = self._status_version
+        if version == self._debug_version:
+            return
+        self._debug_version = version
+        # get debug info
+        debug_info = self.get_debug_info()
+        # the status might have changed back and forth since.
+        if debug_info == self._last_debug_info:
+            return
+        self._last_debug_info = debug_info
+        # the lines are only formatted if someone reads them.
+        parsed_info = DebugInfoLines(debug_info, prefix="[Base] ")
+        # call the cb if we have it
+        if self._debug_cb is not None:
+            self._debug_cb(debug_info, parsed_info)
+        # log it
+        if self._logger is not None and self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug('%s', parsed_info)
+
+    def _end_tick(self) -> None:
+        passed_time = self._scheduler.end_tick()
+        if passed_time > self._rate:
+            # warn about slow tick rate
+            if self._logger is not None:
+                self._logger.warning(f"Machine{self.get_debug_name()} \
+                    ticking at {passed_time} which is larger than {self._rate}")
+
+    def get_tick_statistics(self) -> typing.Dict[str, float]:
+        """Statistics about the tick loop since the machine started executing, such as the actual rate,
+        jitter percentiles, overruns and skipped ticks. See `TickScheduler.get_statistics`.
+
+        Returns
+        -------
+        typing.Dict[str, float]
+            Dictionary of statistics.
+        """
+        return self._scheduler.get_statistics()
+
     def tick(self, board: Board) -> State:
         # Overwrites State's tick
         # Because this is machine, when it is interrupted, it interrupt its lower level entities first.
-        for transition in self._transitions:
-            if transition[0](self, board):
-                # this means this machine is being transitioned out.
-                # tell the current state to stop.
-                self._curr_state.interrupt()
-                self.interrupt()
-                transition[1].start(board)
-                return transition[1]
+        next_state = self._find_transition(board)
+        if next_state is not None:
+            self._notify_transition(next_state)
+            # this means this machine is being transitioned out.
+            # tell the current state to stop.
+            self._curr_state.interrupt()
+            self.interrupt()
+            next_state.start(board)
+            return next_state
         return self
 
     def update(self, board: Board, wait=False) -> None:
@@ -113,7 +237,7 @@ class Machine(NestedState):
         self._curr_state = self._curr_state.tick(board)
 
     def is_end(self) -> bool:
-        return not self._curr_state._run_thread.is_alive() and \
+        return not self._curr_state.is_executing() and \
             (self._curr_state._name == self._end_state_ids or self._curr_state._name in self._end_state_ids)
 
     def run(self, board: Board = None, flow_in: typing.Any = None) -> None:
@@ -134,18 +258,56 @@ class Machine(NestedState):
         self.start(board, flow_in)
         self.wait()
 
+    def signal_interrupt(self):
+        super().signal_interrupt()
+        self._wake()
+        # a machine in a group is ticked by the thread of its shard instead.
+        group_wake = self._group_wake
+        if group_wake is not None:
+            group_wake(self)
+
+    def _get_children(self) -> typing.List[State]:
+        return [self._curr_state]
+
+    def _get_active_children(self) -> typing.List[State]:
+        return [self._curr_state]
+
     def interrupt(self, timeout: float = None) -> bool:
+        # the timeout covers the whole interrupt, the current state only gets what is left of it.
+        clock = get_clock()
+        deadline = clock.deadline(timeout)
+        self.signal_interrupt()
         # call interrupt for the nested class
-        if not self._curr_state.interrupt(timeout):
+        if not self._curr_state.interrupt(clock.remaining(deadline)):
             # unable to interrupt current state
             print(
                 f"ERROR {self._name} of type {self.__class__} unable to complete Interrupt Action. \
                     Zombie threads likely", file=sys.stderr)
             return False
-        return super().interrupt(timeout)
+        return super().interrupt(clock.remaining(deadline))
 
     def get_debug_info(self) -> typing.Dict[str, typing.Any]:
 
         self_info = super().get_debug_info()
         self_info['children'] = [self._curr_state.get_debug_info()]
         return self_info
+
+
+def _reachable_states(root: State) -> typing.List[typing.Tuple[State, State]]:
+    # the states of the tree with the nested state they belong to, None for the root and the states its
+    # transitions lead to. Each state is listed once, in the order they are found.
+    states = []
+    seen = set()
+    pending = [(root, None)]
+    while len(pending) > 0:
+        state, parent = pending.pop()
+        if id(state) in seen:
+            continue
+        seen.add(id(state))
+        states.append((state, parent))
+        pending.extend((next_state, parent) for _, next_state in reversed(state._transitions))
+        if isinstance(state, Machine):
+            pending.append((state._root, state))
+        if isinstance(state, NestedState):
+            pending.extend((child, state) for child in reversed(state._get_children()))
+    return states
@@ -0,0 +1,328 @@
+import heapq
+import itertools
+import threading
+import typing
+
+from .board import Board
+from .clock import Clock, ClockEvent, get_clock
+from .executor import ExecutionHandle
+from .machine import Machine
+from .state_status import StateStatus
+
+
+class MachineGroup():
+    """Drives many machines from a few threads instead of one thread per machine. Machines are sharded across
+    the driver threads, and each driver ticks its machines at their own rate in order of their next deadline.
+    Machines added to the group behave as if they were started normally, so `wait`, `interrupt` and
+    `get_tick_statistics` still work on them.
+    """
+
+    _num_threads: int
+    _shards: typing.List['_MachineShard']
+    _lock: threading.Lock
+    _start_time: float
+    _started: bool
+
+    def __init__(self, num_threads: int = 1):
+        """Constructor for MachineGroup
+
+        Parameters
+        ----------
+        num_threads : int, optional
+            Number of threads ticking the machines, by default 1
+        """
+        self._num_threads = num_threads
+        self._shards = [_MachineShard(self, i) for i in range(0, num_threads)]
+        self._lock = threading.Lock()
+        self._start_time = get_clock().time()
+        self._started = False
+
+    def add(self, machine: Machine, board: Board = None, flow_in: typing.Any = None, rate: float = None) -> None:
+        """Start the machine and let the group tick it. The machine is assigned to the driver thread with the
+        fewest machines.
+
+        Parameters
+        ----------
+        machine : Machine
+            Machine to run. It should not be running already.
+        board : Board, optional
+            Board to track variables between states, by default None which creates a new board
+        flow_in : typing.Any, optional
+            Data that is initially passed to the root state to help execution.
+        rate : float, optional
+            Rate in Hz to tick the machine, replacing the machine's rate, by default None
+        """
+        board = Board() if board is None else board
+        # hold the clock until the machine is in the group, see `Machine.start`.
+        clock = get_clock()
+        clock.add_execution()
+        try:
+            self._add(machine, board, flow_in, rate)
+        finally:
+            clock.remove_execution()
+
+    def _add(self, machine: Machine, board: Board, flow_in: typing.Any, rate: float) -> None:
+        if rate is not None:
+            machine._rate = 1.0 / rate
+            machine._scheduler.set_period(machine._rate)
+        machine.start(board, flow_in, manual_exec=True)
+        board = machine._find_scope(board, machine)
+        # the handle stands in for the machine's own execution thread.
+        machine._run_thread = ExecutionHandle(machine._name)
+        machine._run_thread.add_done_callback(board.notify)
+        machine.pre_execute()
+        machine._scheduler.reset()
+        with self._lock:
+            shard = min(self._shards, key=lambda s: s.num_machines())
+            shard.add(machine, board)
+            if self._started:
+                shard.ensure_started()
+
+    def start(self) -> None:
+        """Start ticking the machines in the group.
+        """
+        with self._lock:
+            self._started = True
+            self._start_time = get_clock().time()
+            for shard in self._shards:
+                shard.reset_statistics()
+                shard.ensure_started()
+
+    def stop(self, timeout: float = None) -> bool:
+        """Interrupt all machines in the group and stop the driver threads.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Timeout in seconds for each machine and thread, by default None
+
+        Returns
+        -------
+        bool
+            True if everything stopped, False if timeout.
+        """
+        success = True
+        with self._lock:
+            self._started = False
+        for shard in self._shards:
+            if not shard.stop(timeout):
+                success = False
+        # nothing ticks the machines anymore, so they can be finished from here.
+        for shard in self._shards:
+            if not shard.interrupt_all(timeout):
+                success = False
+        return success
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for all the machines in the group to finish.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Timeout in seconds, None will mean wait forever, by default None
+
+        Returns
+        -------
+        bool
+            Whether all the machines finished, if false, it means timedout.
+        """
+        clock = get_clock()
+        end_time = None if timeout is None else clock.time() + timeout
+        for machine in self.get_machines():
+            remaining = None if end_time is None else max(0.0, end_time - clock.time())
+            if not machine.wait(remaining):
+                return False
+        return True
+
+    def get_machines(self) -> typing.List[Machine]:
+        """Machines in the group that are still running.
+        """
+        machines = []
+        for shard in self._shards:
+            machines += shard.get_machines()
+        return machines
+
+    def get_statistics(self) -> typing.Dict[str, typing.Any]:
+        """Aggregated statistics of the group since it started.
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            Dictionary with the number of running machines, total ticks, ticks per second across all threads,
+            and a list with the number of machines and ticks of each thread.
+        """
+        elapsed = get_clock().time() - self._start_time
+        shards = [shard.get_statistics() for shard in self._shards]
+        ticks = sum(s['ticks'] for s in shards)
+        return {
+            'machines': sum(s['machines'] for s in shards),
+            'threads': self._num_threads,
+            'ticks': ticks,
+            'tick_rate': ticks / elapsed if elapsed > 0 else 0.0,
+            'shards': shards,
+        }
+
+
+class _MachineShard():
+
+    _group: MachineGroup
+    _index: int
+    _lock: threading.RLock
+    _wake_event: ClockEvent
+    _clock: Clock
+    _heap: list
+    _counter: typing.Iterator[int]
+    _machines: typing.Dict[int, typing.Tuple[Machine, Board]]
+    _thread: threading.Thread
+    _running: bool
+    _num_ticks: int
+
+    def __init__(self, group: MachineGroup, index: int):
+        self._group = group
+        self._index = index
+        self._lock = threading.RLock()
+        self._wake_event = ClockEvent()
+        self._clock = None
+        self._heap = []
+        # breaks ties between machines with the same deadline.
+        self._counter = itertools.count()
+        self._machines = {}
+        self._thread = None
+        self._running = False
+        self._num_ticks = 0
+
+    def num_machines(self) -> int:
+        with self._lock:
+            return len(self._machines)
+
+    def get_machines(self) -> typing.List[Machine]:
+        with self._lock:
+            return [machine for machine, _ in self._machines.values()]
+
+    def add(self, machine: Machine, board: Board) -> None:
+        with self._lock:
+            self._machines[id(machine)] = (machine, board)
+            heapq.heappush(self._heap, (machine._scheduler.get_next_deadline(), next(self._counter), machine))
+            machine._group_wake = self.wake
+        self._wake_event.set()
+
+    def wake(self, machine: Machine) -> None:
+        # tick the machine at once instead of at its deadline, e.g. once it is interrupted.
+        with self._lock:
+            for index, (_, order, queued) in enumerate(self._heap):
+                if queued is machine:
+                    self._heap[index] = (float('-inf'), order, machine)
+                    heapq.heapify(self._heap)
+                    break
+            # otherwise the machine is being ticked, and is pushed back as soon as it is done.
+        self._wake_event.set()
+
+    def ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            # the thread counts as an execution of the clock, same as the thread of a machine.
+            self._clock = get_clock()
+            self._clock.add_execution()
+            self._thread = threading.Thread(target=self._run, name=f"MachineGroup-{self._index}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None) -> bool:
+        with self._lock:
+            self._running = False
+            thread = self._thread
+        self._wake_event.set()
+        if thread is None:
+            return True
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+        return not thread.is_alive()
+
+    def interrupt_all(self, timeout: float = None) -> bool:
+        # should only be called once the thread stopped.
+        with self._lock:
+            machines = self.get_machines()
+            self._machines.clear()
+            self._heap.clear()
+        # every machine starts stopping before any is waited for, so they share the timeout.
+        for machine in machines:
+            machine.signal_interrupt()
+        # the shard has no clock if it never started.
+        clock = get_clock() if self._clock is None else self._clock
+        deadline = clock.deadline(timeout)
+        success = True
+        for machine in machines:
+            if not machine._curr_state.interrupt(clock.remaining(deadline)):
+                success = False
+            self._finish(machine, StateStatus.INTERRUPTED)
+        return success
+
+    def reset_statistics(self) -> None:
+        with self._lock:
+            self._num_ticks = 0
+
+    def get_statistics(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return {'machines': len(self._machines), 'ticks': self._num_ticks}
+
+    def _next_machine(self) -> Machine:
+        # block until a machine reaches its deadline, returns None once the shard stops.
+        while True:
+            with self._lock:
+                if not self._running:
+                    return None
+                # cleared before checking, so machines added meanwhile wake up the wait.
+                self._wake_event.clear()
+                deadline = self._heap[0][0] if len(self._heap) > 0 else None
+                if deadline is not None and deadline <= self._clock.time():
+                    return heapq.heappop(self._heap)[2]
+            self._clock.wait_until(self._wake_event, deadline)
+
+    def _run(self) -> None:
+        self._clock.bind_thread()
+        try:
+            self._drive()
+        finally:
+            self._clock.unbind_thread()
+            self._clock.remove_execution()
+
+    def _drive(self) -> None:
+        while True:
+            machine = self._next_machine()
+            if machine is None:
+                return
+            status = self._tick(machine)
+            with self._lock:
+                self._num_ticks += 1
+                if status is None:
+                    # interrupted during the tick, see `wake`.
+                    deadline = float('-inf') if machine.is_interrupted() else machine._scheduler.get_next_deadline()
+                    heapq.heappush(self._heap, (deadline, next(self._counter), machine))
+                    continue
+                self._machines.pop(id(machine))
+            self._finish(machine, status)
+
+    def _tick(self, machine: Machine) -> StateStatus:
+        # same as one iteration of Machine.execute, returns the status once the machine should stop.
+        if machine.is_interrupted():
+            return StateStatus.INTERRUPTED
+        board = self._machines[id(machine)][1]
+        machine._scheduler.begin_tick()
+        try:
+            status = machine._tick_once(board)
+        except Exception as e:
+            machine._curr_state.interrupt()
+            machine._internal_exception = e
+            return StateStatus.EXCEPTION
+        machine._end_tick()
+        return status
+
+    def _finish(self, machine: Machine, status: StateStatus) -> None:
+        machine._group_wake = None
+        machine._release_scopes()
+        machine._status = status
+        if status != StateStatus.EXCEPTION:
+            machine.post_execute()
+        machine._run_thread._set_done()
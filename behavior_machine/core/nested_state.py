@@ -1,3 +1,5 @@
+import typing
+
 from .state_status import StateStatus
 from .state import State
 from .board import Board
@@ -6,9 +8,13 @@ from .board import Board
 class NestedState(State):
 
     _exception_raised_state_name: str  # The name of thrown state
+    _scoped: bool  # Whether the children use scopes of the board, see `Board.scope`
+    _scopes: typing.Dict[int, Board]  # Scopes of the current execution, by id of the state using them
 
-    def __init__(self, name):
+    def __init__(self, name, scoped: bool = False):
         self._exception_raised_state_name = ""
+        self._scoped = scoped
+        self._scopes = {}
         super(NestedState, self).__init__(name)
 
     def propergate_exception_information(self, curr_state: State) -> None:
@@ -25,6 +31,45 @@ class NestedState(State):
             # _exception_raised_state_name doesn't exist
             self._exception_raised_state_name = f"{self._name}.{curr_state._name}"
 
+    def _get_children(self) -> typing.List[State]:
+        # all the children of this state, used for the statistics.
+        return []
+
+    def _get_active_children(self) -> typing.List[State]:
+        # the children that might currently be running.
+        return []
+
+    def signal_interrupt(self):
+        # the whole subtree is signalled at once, so every level starts stopping without waiting for its parent.
+        super().signal_interrupt()
+        for child in self._get_active_children():
+            child.signal_interrupt()
+
+    def _get_scope(self, board: Board, owner: State) -> Board:
+        # the board the owner, this state or one of its children, should use. Scoped states create a scope of the
+        # given board for it the first time, which is released once this state finishes.
+        if not self._scoped or board is None:
+            return board
+        scope = self._scopes.get(id(owner))
+        if scope is None:
+            scope = self._scopes[id(owner)] = board.scope(owner._name)
+        return scope
+
+    def _find_scope(self, board: Board, owner: State) -> Board:
+        # same as _get_scope, without creating the scope.
+        return self._scopes.get(id(owner), board)
+
+    def _release_scopes(self) -> None:
+        scopes = self._scopes
+        self._scopes = {}
+        for scope in scopes.values():
+            scope.release()
+
+    def get_interrupt_statistics(self) -> typing.Dict[str, typing.Any]:
+        self_info = super().get_interrupt_statistics()
+        self_info['children'] = [child.get_interrupt_statistics() for child in self._get_children()]
+        return self_info
+
     def _execute(self, board: Board):
         # Right now when it fails nothing goes up
         try:
@@ -41,6 +86,8 @@ class NestedState(State):
                 # This level of exception often happen in the transition checking level
             self._internal_exception = e
             self._status = StateStatus.EXCEPTION
+        # the values the children did not promote are dropped.
+        self._release_scopes()
         if self._status is None:
             self._status = StateStatus.NOT_SPECIFIED
 
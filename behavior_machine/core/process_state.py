@@ -0,0 +1,298 @@
+import concurrent.futures
+import multiprocessing
+import sys
+import threading
+import typing
+
+from .board import Board
+from .clock import ClockEvent
+from .state import State
+from .state_status import StateStatus
+
+
+class ProcessPool():
+    """Pool of worker processes shared by `ProcessState`. Each running state gets a slot in a shared array
+    of flags, which is how interrupts reach the worker process.
+    """
+
+    _max_workers: int
+    _max_tasks: int
+    _mp_context: typing.Any
+    _lock: threading.Lock
+    _executor: concurrent.futures.ProcessPoolExecutor
+    _flags: typing.Any
+    _free_slots: typing.List[int]
+
+    def __init__(self, max_workers: int = None, max_tasks: int = 1024, mp_context: typing.Any = None):
+        """Constructor for ProcessPool. The worker processes are created on the first submission.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            Number of worker processes, by default None which uses the number of processors
+        max_tasks : int, optional
+            Maximum number of states running or queued at the same time, by default 1024
+        mp_context : typing.Any, optional
+            Multiprocessing context used to create the workers, by default None for the platform's default.
+            Python 3.6 always uses the default, and its workers only receive interrupts when they are forked.
+
+        Raises
+        ------
+        RuntimeError
+            If a context is given on python 3.6.
+        """
+        if mp_context is not None and sys.version_info < (3, 7):
+            raise RuntimeError("mp_context requires python 3.7 or later")
+        self._max_workers = max_workers
+        self._max_tasks = max_tasks
+        self._mp_context = multiprocessing.get_context() if mp_context is None else mp_context
+        self._lock = threading.Lock()
+        self._executor = None
+        self._flags = None
+        self._free_slots = list(range(max_tasks - 1, -1, -1))
+
+    def submit(self, state: 'ProcessState', items: typing.Dict[str, typing.Any],
+               flow_in: typing.Any) -> typing.Tuple[concurrent.futures.Future, int]:
+        """Run the execute method of the state in a worker process.
+
+        Parameters
+        ----------
+        state : ProcessState
+            State to run, it is pickled and sent to the worker.
+        items : typing.Dict[str, typing.Any]
+            Board variables available to the state in the worker.
+        flow_in : typing.Any
+            Flow in value of the state.
+
+        Returns
+        -------
+        typing.Tuple[concurrent.futures.Future, int]
+            Future of the status, flow out and changed board variables, and the slot of the interrupt flag.
+
+        Raises
+        ------
+        RuntimeError
+            If `max_tasks` states are already running or queued.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._flags = self._mp_context.Array('b', self._max_tasks, lock=False)
+                if sys.version_info >= (3, 7):
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        self._max_workers, mp_context=self._mp_context, initializer=_init_worker, initargs=(self._flags,))
+                else:
+                    _inherited_flags[id(self)] = self._flags
+                    self._executor = concurrent.futures.ProcessPoolExecutor(self._max_workers)
+            if len(self._free_slots) == 0:
+                raise RuntimeError(f"more than {self._max_tasks} process states are running")
+            slot = self._free_slots.pop()
+            self._flags[slot] = 0
+            future = self._executor.submit(_run_in_worker, state, items, flow_in, slot, id(self))
+        future.add_done_callback(lambda _: self._release(slot))
+        return future, slot
+
+    def interrupt(self, future: concurrent.futures.Future, slot: int) -> None:
+        """Cancel the state if it is still queued, otherwise tell it that it is interrupted.
+
+        Parameters
+        ----------
+        future : concurrent.futures.Future
+            Future returned by `submit`.
+        slot : int
+            Slot returned by `submit`.
+        """
+        if future.cancel():
+            return
+        with self._lock:
+            # the slot is released once the future is done and might belong to another state by now.
+            if not future.done():
+                self._flags[slot] = 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes. The pool starts new ones if it is used again.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Whether to wait for the running states to finish, by default True
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait)
+
+    def _release(self, slot: int) -> None:
+        with self._lock:
+            self._free_slots.append(slot)
+
+
+# interrupt flags of the pool, set in each worker process when it starts.
+_worker_flags: typing.Any = None
+# python 3.6 has no initializer for the workers, the forked ones find the flags of their pool here instead.
+_inherited_flags: typing.Dict[int, typing.Any] = {}
+
+
+def _init_worker(flags: typing.Any) -> None:
+    global _worker_flags
+    _worker_flags = flags
+
+
+class _WorkerBoard(Board):
+    # board of the worker process that remembers which keys were set, so only those are sent back.
+
+    _changed: typing.Set[str]
+
+    def __init__(self, items: typing.Dict[str, typing.Any]):
+        super().__init__()
+        # the values were already copied when they were sent to this process.
+        for key, value in items.items():
+            super().set(key, value, deep_copy=False)
+        self._changed = set()
+
+    def set(self, key: str, value: typing.Any, deep_copy: bool = True, ttl: float = None) -> None:
+        super().set(key, value, deep_copy, ttl)
+        self._changed.add(key)
+
+
+def _run_in_worker(state: 'ProcessState', items: typing.Dict[str, typing.Any], flow_in: typing.Any, slot: int,
+                   pool_id: int) -> typing.Tuple[StateStatus, typing.Any, typing.Dict[str, typing.Any]]:
+    global _worker_flags
+    if _worker_flags is None:
+        _worker_flags = _inherited_flags.get(pool_id)
+    board = _WorkerBoard(items)
+    state._interrupt_slot = slot
+    state.flow_in = flow_in
+    status = state.execute(board)
+    return status, state.flow_out, {key: board.get(key, deep_copy=False) for key in board._changed}
+
+
+_default_process_pool: ProcessPool = None
+_default_process_pool_lock = threading.Lock()
+
+
+def get_default_process_pool() -> ProcessPool:
+    """Get the pool used by `ProcessState` that do not have their own pool, creating it if required.
+
+    Returns
+    -------
+    ProcessPool
+        The default process pool.
+    """
+    global _default_process_pool
+    with _default_process_pool_lock:
+        if _default_process_pool is None:
+            _default_process_pool = ProcessPool()
+        return _default_process_pool
+
+
+class ProcessState(State):
+    """State whose execute method runs in a worker process of a `ProcessPool`, for CPU-bound work that would
+    otherwise hold the GIL and slow down the tick threads. The state object is pickled and sent to the worker,
+    along with its flow in and the board variables given by `board_keys`. The status, flow out and board
+    variables set in the worker are sent back, exceptions are raised again in this process.
+
+    The state is a copy in the worker, so only `flow_out` and the board carry results back. Its class should
+    be importable and its attributes picklable, transitions are not sent. Interrupts reach the worker through
+    `is_interrupted`, which execute should check regularly.
+    """
+
+    _board_keys: typing.List[str]
+    _pool: ProcessPool
+    _future: concurrent.futures.Future
+    _interrupt_slot: int
+
+    def __init__(self, name: str = "", board_keys: typing.Iterable[str] = None, pool: ProcessPool = None):
+        """Constructor for ProcessState
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the state, by default the class name
+        board_keys : typing.Iterable[str], optional
+            Keys of the board variables the state reads in the worker, by default None
+        pool : ProcessPool, optional
+            Pool running the state, by default None which uses the default pool
+        """
+        super().__init__(name)
+        self._board_keys = [] if board_keys is None else list(board_keys)
+        self._pool = pool
+        self._future = None
+        self._interrupt_slot = None
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        # leave out what only makes sense in this process.
+        state = self.__dict__.copy()
+        for key in ['_transitions', '_status_transitions', '_custom_transitions', '_transition_versions',
+                    '_status_listeners', '_run_thread', '_executor', '_interupted_event', '_internal_exception',
+                    '_pool', '_future', '_monitors']:
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        self.__dict__.update(state)
+        self._transitions = []
+        self._status_transitions = {}
+        self._custom_transitions = []
+        self._transition_versions = {}
+        self._status_listeners = []
+        self._run_thread = None
+        self._executor = None
+        self._interupted_event = ClockEvent()
+        self._internal_exception = None
+        self._pool = None
+        self._future = None
+        self._monitors = ()
+
+    def _get_pool(self) -> ProcessPool:
+        return self._pool if self._pool is not None else get_default_process_pool()
+
+    def _execute(self, board: Board):
+        try:
+            self.pre_execute()
+            self._status = self._execute_in_worker(board)
+            self.post_execute()
+        except concurrent.futures.CancelledError:
+            self._status = StateStatus.INTERRUPTED
+        except Exception as e:
+            self._internal_exception = e
+            self._status = StateStatus.EXCEPTION
+        if self._status is None:
+            self._status = StateStatus.NOT_SPECIFIED
+
+    def _execute_in_worker(self, board: Board) -> StateStatus:
+        items = {}
+        if board is not None:
+            for key in self._board_keys:
+                if board.exist(key):
+                    items[key] = board.get(key, deep_copy=False)
+        pool = self._get_pool()
+        self._future, slot = pool.submit(self, items, self.flow_in)
+        self._interrupt_slot = slot
+        # the state might have been interrupted before the future existed.
+        if self.is_interrupted():
+            self._signal_worker()
+        try:
+            status, self.flow_out, changes = self._future.result()
+        finally:
+            self._interrupt_slot = None
+        if board is not None:
+            for key, value in changes.items():
+                board.set(key, value, deep_copy=False)
+        return status
+
+    def _signal_worker(self) -> None:
+        future = self._future
+        slot = self._interrupt_slot
+        if future is not None and slot is not None:
+            self._get_pool().interrupt(future, slot)
+
+    def signal_interrupt(self):
+        super().signal_interrupt()
+        self._signal_worker()
+
+    def is_interrupted(self) -> bool:
+        # in the worker, the flag set by the pool replaces the event.
+        if _worker_flags is not None and self._interrupt_slot is not None:
+            return _worker_flags[self._interrupt_slot] != 0
+        return super().is_interrupted()
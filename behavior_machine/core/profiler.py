@@ -0,0 +1,220 @@
+import json
+import math
+import threading
+import typing
+
+from .state import State
+from .state_monitor import StateMonitor
+from .state_status import StateStatus
+
+# bucket i of a histogram holds the durations from 2 ** (i - 1) to 2 ** i microseconds, the last one everything
+# longer. Bucket 0 holds the durations under a microsecond.
+_NUM_BUCKETS = 40
+_BUCKET_UNIT = 1e-6
+
+
+class _Histogram():
+    # histogram of durations in seconds, on buckets growing by powers of two.
+
+    __slots__ = ('counts', 'count', 'total', 'minimum', 'maximum')
+
+    counts: typing.List[int]
+    count: int
+    total: float
+    minimum: float
+    maximum: float
+
+    def __init__(self):
+        self.counts = [0] * _NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, duration: float) -> None:
+        duration = max(0.0, duration)
+        units = duration / _BUCKET_UNIT
+        index = 0 if units < 1 else min(math.frexp(units)[1], _NUM_BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += duration
+        self.minimum = duration if self.minimum is None else min(self.minimum, duration)
+        self.maximum = duration if self.maximum is None else max(self.maximum, duration)
+
+    def percentile(self, fraction: float) -> float:
+        # upper bound of the bucket holding the percentile, capped by the largest duration.
+        if self.count == 0:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min(self.maximum, math.ldexp(_BUCKET_UNIT, index))
+        return self.maximum
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': None if self.count == 0 else self.total / self.count,
+            'min': self.minimum,
+            'max': self.maximum,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            # upper bound in seconds of each bucket that is not empty, with its count.
+            'buckets': [[math.ldexp(_BUCKET_UNIT, index), count] for index, count in enumerate(self.counts) if count > 0]
+        }
+
+
+class _StateProfile():
+
+    __slots__ = ('name', 'type', 'activations', 'statuses', 'start_latency', 'execution', 'wait', 'interrupt_latency')
+
+    name: str
+    type: str
+    activations: int
+    statuses: typing.Dict[str, int]  # number of executions ending with each status
+    start_latency: _Histogram  # from the start of the state to its execute method running
+    execution: _Histogram  # from the execute method running to the state finishing
+    wait: _Histogram  # time others blocked in wait or interrupt for the state
+    interrupt_latency: _Histogram  # from the interrupt signal to the state finishing
+
+    def __init__(self, name: str, type_name: str):
+        self.name = name
+        self.type = type_name
+        self.activations = 0
+        self.statuses = {}
+        self.start_latency = _Histogram()
+        self.execution = _Histogram()
+        self.wait = _Histogram()
+        self.interrupt_latency = _Histogram()
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            'name': self.name,
+            'type': self.type,
+            'activations': self.activations,
+            'statuses': dict(self.statuses),
+            'start_latency': self.start_latency.to_dict(),
+            'execution': self.execution.to_dict(),
+            'wait': self.wait.to_dict(),
+            'interrupt_latency': self.interrupt_latency.to_dict()
+        }
+
+
+class Profiler(StateMonitor):
+    """Monitor aggregating the executions of states by name and type: how many times they ran and how they ended,
+    and histograms of the time from their start to their execute method running, of the execution itself, of the
+    time spent waiting for them and of their interrupt latency. Each event costs a few dictionary lookups under
+    a lock, so it can stay attached in production. Attach it to a machine before running it, and `dump` the
+    statistics to JSON afterwards.
+    """
+
+    _lock: threading.Lock
+    _profiles: typing.Dict[typing.Tuple[str, str], _StateProfile]
+    _start_times: typing.Dict[int, float]  # time each running state started, by id
+    _execute_times: typing.Dict[int, float]  # time the execute method of each running state started, by id
+
+    def __init__(self):
+        """Constructor for Profiler
+        """
+        self._lock = threading.Lock()
+        self._profiles = {}
+        self._start_times = {}
+        self._execute_times = {}
+
+    def _get_profile(self, state: State) -> _StateProfile:
+        # the lock should be held.
+        key = (state._name, type(state).__name__)
+        profile = self._profiles.get(key)
+        if profile is None:
+            profile = self._profiles[key] = _StateProfile(*key)
+        return profile
+
+    def on_status(self, state: State, status: StateStatus, time: float) -> None:
+        with self._lock:
+            if status == StateStatus.RUNNING:
+                # a machine sets its status before starting its tick loop, which sets it again.
+                if id(state) not in self._start_times:
+                    self._get_profile(state).activations += 1
+                    self._start_times[id(state)] = time
+                    self._execute_times.pop(id(state), None)
+                return
+            if status is None:
+                # execute returned nothing, the status is replaced by NOT_SPECIFIED right after.
+                return
+            start_time = self._start_times.pop(id(state), None)
+            if start_time is None:
+                # the execution already ended, e.g. the status of a finished state was set again.
+                return
+            profile = self._get_profile(state)
+            profile.statuses[status.name] = profile.statuses.get(status.name, 0) + 1
+            execute_time = self._execute_times.pop(id(state), None)
+            if execute_time is not None:
+                profile.execution.add(time - execute_time)
+            if state._interrupt_latency is not None:
+                profile.interrupt_latency.add(state._interrupt_latency)
+
+    def on_execute(self, state: State, time: float) -> None:
+        with self._lock:
+            start_time = self._start_times.get(id(state))
+            if start_time is None:
+                return
+            self._execute_times[id(state)] = time
+            self._get_profile(state).start_latency.add(time - start_time)
+
+    def on_wait(self, state: State, start_time: float, end_time: float) -> None:
+        with self._lock:
+            self._get_profile(state).wait.add(end_time - start_time)
+
+    def reset(self) -> None:
+        """Forget the executions recorded so far. States currently running are still counted when they finish.
+        """
+        with self._lock:
+            self._profiles = {}
+
+    def get_statistics(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Statistics of each state, by name and type, sorted by the total time spent in their execute method.
+
+        Returns
+        -------
+        typing.List[typing.Dict[str, typing.Any]]
+            For each state, its name and type, the number of activations, the number of executions that ended
+            with each status, and the histograms 'start_latency', 'execution', 'wait' and 'interrupt_latency'.
+            Each histogram has its count, total, mean, min, max, approximate percentiles p50, p90 and p99, and
+            its non-empty buckets as pairs of upper bound and count, the durations are in seconds.
+        """
+        with self._lock:
+            statistics = [profile.to_dict() for profile in self._profiles.values()]
+        statistics.sort(key=lambda item: item['execution']['total'], reverse=True)
+        return statistics
+
+    def to_json(self, indent: int = None) -> str:
+        """The statistics encoded in JSON, see `get_statistics`.
+
+        Parameters
+        ----------
+        indent : int, optional
+            Indentation of the JSON, by default None for a single line
+
+        Returns
+        -------
+        str
+            JSON object with the statistics under 'states'.
+        """
+        return json.dumps({'states': self.get_statistics()}, indent=indent)
+
+    def dump(self, file_path: str, indent: int = 2) -> None:
+        """Write the statistics to a JSON file, see `to_json`.
+
+        Parameters
+        ----------
+        file_path : str
+            Path of the file, it is overwritten.
+        indent : int, optional
+            Indentation of the JSON, by default 2
+        """
+        with open(file_path, 'w') as f:
+            f.write(self.to_json(indent))
@@ -0,0 +1,406 @@
+import contextlib
+import copy
+import hashlib
+import os
+import pickle
+import struct
+import threading
+import time
+import typing
+import uuid
+
+from .board import Board, _Entry, _is_array
+from .clock import get_clock
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # multiprocessing.shared_memory requires python 3.8
+    shared_memory = None
+
+# header of the segment of a key: sequence number, odd while the value is written, and generation of the data
+# segment holding the value.
+_META = struct.Struct('<QQ')
+# header of a data segment: kind of value, length of the kind specific header and of the payload.
+_DATA_HEADER = struct.Struct('<BIQ')
+_KIND_PICKLE = 0
+_KIND_ARRAY = 1
+_KIND_RECORD = 2
+# value written by `delete`, the key then reads as missing and its version keeps increasing.
+_KIND_DELETED = 3
+_MIN_DATA_SIZE = 64
+# key under which the list of keys is stored.
+_DIRECTORY_KEY = '\0keys'
+
+
+def _open_segment(name: str, create: bool = False, size: int = 0) -> 'shared_memory.SharedMemory':
+    try:
+        return shared_memory.SharedMemory(name, create, size, track=False)
+    except TypeError:
+        # python < 3.13 always tracks the segment, and unlinks it when the process exits.
+        segment = shared_memory.SharedMemory(name, create, size)
+        if os.name == 'posix':
+            # the segments live as long as the board, not the process that opened them, see `unlink`.
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+def _unlink_segment(name: str) -> None:
+    try:
+        # opened with tracking, which unlink ends.
+        segment = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    segment.unlink()
+    segment.close()
+
+
+def _close_segment(segment: 'shared_memory.SharedMemory') -> None:
+    try:
+        segment.close()
+    except BufferError:
+        # an array returned without a copy still uses the memory, it is unmapped once the array is gone.
+        pass
+
+
+class SharedMemoryBoard(Board):
+    """Board whose values live in `multiprocessing.shared_memory` segments, so boards with the same name in
+    other processes share them, e.g. a `ProcessState` or a machine running in another process. The board can be
+    pickled, the copy attaches to the same segments.
+
+    Each key has its own segments. numpy arrays are stored as raw memory, keys with a record format given in
+    `records` are stored as fixed size `struct` records, and other values are pickled. Reads never lock, they
+    retry when a writer changed the value meanwhile, like a seqlock. Writers of this process lock the stripes
+    of their keys, writers of different processes only exclude each other when they share a `lock`.
+
+    Subscriptions, listeners and histories only see the changes made through this board object. `wait_for` checks
+    the value regularly to also see the changes of other processes. The segments stay until `unlink` is called.
+    Values cannot expire, since the processes might not share a clock, so setting a value with a ttl raises
+    ValueError.
+    """
+
+    _name: str
+    _records: typing.Dict[str, struct.Struct]
+    _process_lock: typing.Any
+    _segments: typing.Dict[str, 'shared_memory.SharedMemory']  # meta segment of each key, by key
+    _data_segments: typing.Dict[str, typing.Tuple[int, 'shared_memory.SharedMemory']]  # data segment of each key
+    # data segments replaced by a larger one, other threads might still read them until the board is closed.
+    _retired_segments: typing.List['shared_memory.SharedMemory']
+    _segments_lock: threading.Lock
+    _directory_lock: threading.Lock
+
+    def __init__(self, name: str = None, records: typing.Mapping[str, str] = None, lock: typing.Any = None,
+                 poll_interval: float = 0.001, num_stripes: int = 16):
+        """Constructor for SharedMemoryBoard
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of the board, the boards of all processes with the same name share their values. By default
+            None, which generates a new name, see `get_name`.
+        records : typing.Mapping[str, str], optional
+            `struct` format of the keys holding fixed size records, their values are tuples, by default None
+        lock : typing.Any, optional
+            Lock shared by the processes writing to the board, e.g. a `multiprocessing.Lock` given to the processes
+            when they start, by default None. Without it, a key should only be written by one process at a time,
+            and keys should be created by a single process.
+        poll_interval : float, optional
+            Time in seconds between two checks of `wait_for`, by default 0.001
+        num_stripes : int, optional
+            Number of locks shared by the keys for the writers of this process, by default 16
+        """
+        if shared_memory is None:
+            raise RuntimeError("SharedMemoryBoard requires multiprocessing.shared_memory (python 3.8 or later)")
+        super().__init__(num_stripes=num_stripes)
+        self._name = name if name is not None else f"bm{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._records = {key: struct.Struct(fmt) for key, fmt in (records or {}).items()}
+        self._process_lock = lock
+        self._poll_interval = poll_interval
+        self._segments = {}
+        self._data_segments = {}
+        self._retired_segments = []
+        self._segments_lock = threading.Lock()
+        self._directory_lock = threading.Lock()
+
+    def __getstate__(self) -> typing.Dict[str, typing.Any]:
+        return {'name': self._name, 'records': {key: record.format for key, record in self._records.items()},
+                'lock': self._process_lock, 'poll_interval': self._poll_interval, 'num_stripes': len(self._stripes)}
+
+    def __setstate__(self, state: typing.Dict[str, typing.Any]) -> None:
+        self.__init__(**state)
+
+    def get_name(self) -> str:
+        """Name of the board, to attach to it from another process.
+        """
+        return self._name
+
+    def get(self, key: str, deep_copy: bool = True) -> typing.Any:
+        """Get the value of the key. Values are always copied out of the shared memory, except numpy arrays with
+        `deep_copy` False, which are then read-only views of the shared memory that change with later sets.
+        """
+        entry = self._read(key, deep_copy)
+        return None if entry is None else entry.value
+
+    def set(self, key: str, value: typing.Any, deep_copy: bool = True, ttl: float = None) -> None:
+        """Save the value with the given key in the shared memory. The value is always copied.
+
+        Raises
+        ------
+        ValueError
+            If a ttl is given, values of a shared board do not expire.
+        """
+        self.set_many({key: value}, ttl=ttl)
+
+    def set_many(self, items: typing.Mapping[str, typing.Any], deep_copy: bool = True, ttl: float = None) -> None:
+        if ttl is not None:
+            raise ValueError("values of a shared memory board do not expire")
+        encoded = [(key, *self._encode(key, value)) for key, value in items.items()]
+        if len(encoded) == 0:
+            return
+        locks = self._acquire([key for key, _, _, _ in encoded])
+        try:
+            with self._lock_processes():
+                for key, kind, header, payload in encoded:
+                    self._append_history(key, items[key])
+                    self._write(key, kind, header, payload)
+        finally:
+            self._release(locks)
+        for key, _, _, _ in encoded:
+            for subscriber in self._subscribers.get(key, ()):
+                subscriber(key)
+        self.notify()
+
+    def exist(self, key: str) -> bool:
+        return self._read(key, False, decode=False) is not None
+
+    def get_version(self, key: str) -> int:
+        entry = self._read(key, False, decode=False)
+        return 0 if entry is None else entry.version
+
+    def keys(self) -> typing.List[str]:
+        """Keys set in the board by any process.
+        """
+        return [key for key in self._all_keys() if self.exist(key)]
+
+    def _all_keys(self) -> typing.List[str]:
+        # every key that was ever set, including the deleted ones whose segments remain.
+        entry = self._read(_DIRECTORY_KEY, True)
+        return [] if entry is None else list(entry.value)
+
+    def close(self) -> None:
+        """Detach this board from the shared memory. The values stay for the other processes.
+        """
+        with self._segments_lock:
+            for segment in self._segments.values():
+                _close_segment(segment)
+            for _, segment in self._data_segments.values():
+                _close_segment(segment)
+            for segment in self._retired_segments:
+                _close_segment(segment)
+            self._segments = {}
+            self._data_segments = {}
+            self._retired_segments = []
+
+    def unlink(self) -> None:
+        """Free the shared memory of every key, once no process uses the board anymore.
+        """
+        for key in self._all_keys() + [_DIRECTORY_KEY]:
+            segment = self._attach(key)
+            if segment is None:
+                continue
+            generation = _META.unpack_from(segment.buf, 0)[1]
+            _unlink_segment(self._data_name(key, generation))
+            _unlink_segment(self._meta_name(key))
+        self.close()
+
+    def _find_entry(self, key: str) -> _Entry:
+        return self._read(key, True)
+
+    def delete(self, key: str) -> None:
+        # the segments of the key stay, other processes might be reading them, and the deletion is written like a
+        # value so the version of the key still increases.
+        locks = self._acquire((key,))
+        try:
+            with self._lock_processes():
+                removed = self.exist(key)
+                if removed:
+                    self._write(key, _KIND_DELETED, b'', b'')
+        finally:
+            self._release(locks)
+        if removed:
+            self.notify()
+
+    def _publish(self, key: str, stored: typing.Any, shared: bool, expires: float = None, size: int = None) -> None:
+        # used by the scopes promoting their values, the stripe of the key is locked.
+        with self._lock_processes():
+            self._append_history(key, stored)
+            self._write(key, *self._encode(key, stored))
+
+    def _append_history(self, key: str, value: typing.Any) -> None:
+        # histories are kept by this process only, the stripe of the key should be locked.
+        history = self._histories.get(key, None)
+        if history is not None:
+            history.append(value if history.numeric else _Entry(copy.deepcopy(value), False, 0), get_clock().time())
+
+    def _snapshot_entries(self, keys: typing.List[str]) -> typing.Dict[str, _Entry]:
+        if keys is None:
+            keys = self.keys()
+        locks = self._lock_stripes(range(0, len(self._stripes)))[0]
+        try:
+            # without a lock shared by the processes, only the writers of this process are excluded.
+            with self._lock_processes():
+                return {key: self._read(key, True) for key in keys}
+        finally:
+            self._release(locks)
+
+    def _lock_processes(self) -> typing.ContextManager:
+        return self._process_lock if self._process_lock is not None else contextlib.nullcontext()
+
+    def _meta_name(self, key: str) -> str:
+        return f"{self._name}_{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+    def _data_name(self, key: str, generation: int) -> str:
+        return f"{self._meta_name(key)}_{generation}"
+
+    def _attach(self, key: str, create: bool = False) -> 'shared_memory.SharedMemory':
+        # the meta segment of the key, None if it does not exist and should not be created.
+        segment = self._segments.get(key)
+        if segment is not None:
+            return segment
+        created = False
+        while segment is None:
+            try:
+                segment = _open_segment(self._meta_name(key))
+            except FileNotFoundError:
+                if not create:
+                    return None
+                try:
+                    segment = _open_segment(self._meta_name(key), True, _META.size)
+                    _META.pack_into(segment.buf, 0, 0, 0)
+                    created = True
+                except FileExistsError:
+                    continue
+            except ValueError:
+                # another process created the segment but did not give it its size yet, the key has no value yet.
+                if not create:
+                    return None
+                time.sleep(0)
+        with self._segments_lock:
+            if key in self._segments:
+                _close_segment(segment)
+                return self._segments[key]
+            self._segments[key] = segment
+        if created and key != _DIRECTORY_KEY:
+            self._add_key(key)
+        return segment
+
+    def _attach_data(self, key: str, generation: int) -> 'shared_memory.SharedMemory':
+        cached = self._data_segments.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        segment = _open_segment(self._data_name(key, generation))
+        with self._segments_lock:
+            previous = self._data_segments.get(key)
+            self._data_segments[key] = (generation, segment)
+            if previous is not None:
+                self._retired_segments.append(previous[1])
+        return segment
+
+    def _add_key(self, key: str) -> None:
+        # called by the writer creating the key.
+        with self._directory_lock:
+            directory = self._all_keys()
+            if key not in directory:
+                self._write(_DIRECTORY_KEY, *self._encode(_DIRECTORY_KEY, tuple(directory + [key])))
+
+    def _encode(self, key: str, value: typing.Any) -> typing.Tuple[int, bytes, typing.Any]:
+        record = self._records.get(key)
+        if record is not None:
+            # the format is kept with the value, so readers do not need to know it.
+            return _KIND_RECORD, record.format.encode(), record.pack(*value)
+        if _is_array(value) and not value.dtype.hasobject:
+            array = value if value.flags.c_contiguous else value.copy(order='C')
+            header = pickle.dumps((array.dtype, array.shape), protocol=pickle.HIGHEST_PROTOCOL)
+            return _KIND_ARRAY, header, memoryview(array.reshape(-1).view('uint8'))
+        return _KIND_PICKLE, b'', pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _write(self, key: str, kind: int, header: bytes, payload: typing.Any) -> None:
+        # write a value, the locks of the key should be held.
+        meta = self._attach(key, create=True)
+        sequence, generation = _META.unpack_from(meta.buf, 0)
+        size = _DATA_HEADER.size + len(header) + len(payload)
+        data = self._attach_data(key, generation) if generation > 0 else None
+        if data is None or data.size < size:
+            # the value does not fit, it goes to a new, larger segment. Readers still using the old one see
+            # that the sequence number changed and read again.
+            new_data = _open_segment(self._data_name(key, generation + 1), True,
+                                     max(size, _MIN_DATA_SIZE, 0 if data is None else 2 * data.size))
+            self._write_data(new_data, kind, header, payload)
+            struct.pack_into('<Q', meta.buf, 0, sequence + 1)
+            struct.pack_into('<Q', meta.buf, 8, generation + 1)
+            struct.pack_into('<Q', meta.buf, 0, sequence + 2)
+            with self._segments_lock:
+                self._data_segments[key] = (generation + 1, new_data)
+                if data is not None:
+                    self._retired_segments.append(data)
+            if data is not None:
+                _unlink_segment(self._data_name(key, generation))
+            return
+        struct.pack_into('<Q', meta.buf, 0, sequence + 1)
+        self._write_data(data, kind, header, payload)
+        struct.pack_into('<Q', meta.buf, 0, sequence + 2)
+
+    def _write_data(self, data: 'shared_memory.SharedMemory', kind: int, header: bytes, payload: typing.Any) -> None:
+        _DATA_HEADER.pack_into(data.buf, 0, kind, len(header), len(payload))
+        offset = _DATA_HEADER.size
+        data.buf[offset:offset + len(header)] = header
+        offset += len(header)
+        data.buf[offset:offset + len(payload)] = payload
+
+    def _read(self, key: str, copy: bool, decode: bool = True) -> _Entry:
+        # the entry of the key, None if it was never set or deleted. Without decode, the entry has no value.
+        meta = self._attach(key)
+        if meta is None:
+            return None
+        while True:
+            sequence, generation = _META.unpack_from(meta.buf, 0)
+            if sequence == 0:
+                return None
+            if sequence % 2 == 1:
+                # a writer is changing the value.
+                time.sleep(0)
+                continue
+            try:
+                data = self._attach_data(key, generation)
+            except FileNotFoundError:
+                # the value moved to a new segment meanwhile.
+                continue
+            kind, header_size, payload_size = _DATA_HEADER.unpack_from(data.buf, 0)
+            offset = _DATA_HEADER.size
+            header = bytes(data.buf[offset:offset + header_size])
+            offset += header_size
+            if decode and (copy or kind != _KIND_ARRAY):
+                payload = bytearray(data.buf[offset:offset + payload_size])
+            else:
+                payload = None
+            if _META.unpack_from(meta.buf, 0)[0] != sequence:
+                continue
+            if kind == _KIND_DELETED:
+                return None
+            # the value is only decoded once it is known to be complete. Each set moves the sequence number by two.
+            value = self._decode(kind, header, payload, data, offset) if decode else None
+            return _Entry(value, True, sequence // 2)
+
+    def _decode(self, kind: int, header: bytes, payload: bytearray, data: 'shared_memory.SharedMemory',
+                offset: int) -> typing.Any:
+        if kind == _KIND_RECORD:
+            return struct.unpack(header.decode(), payload)
+        if kind == _KIND_ARRAY:
+            import numpy
+            dtype, shape = pickle.loads(header)
+            if payload is not None:
+                return numpy.frombuffer(payload, dtype=dtype).reshape(shape)
+            array = numpy.ndarray(shape, dtype=dtype, buffer=data.buf, offset=offset)
+            array.setflags(write=False)
+            return array
+        return pickle.loads(payload)
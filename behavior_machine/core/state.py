@@ -1,11 +1,15 @@
-import time
 import typing
 import traceback
-import threading
 import warnings
 
 from .state_status import StateStatus
 from .board import Board
+from .clock import ClockEvent, get_clock
+from .executor import Executor, ExecutionHandle, get_default_executor
+
+if typing.TYPE_CHECKING:
+    # the monitors import the states.
+    from .state_monitor import StateMonitor
 
 
 class State():
@@ -14,13 +18,31 @@ class State():
     _name: str
     _transitions: typing.Sequence[typing.Tuple[typing.Callable[[
         'State', Board], bool], 'State']]          # Store the transitions of the state
-    # Hold the thread executing the action
-    _run_thread: threading.Thread
-    # Status of this state
-    _status: StateStatus
+    # Built-in transitions indexed by the status they wait for, as (position in _transitions, whether the execute
+    # method should have returned, next state).
+    _status_transitions: typing.Dict[StateStatus, typing.List[typing.Tuple[int, bool, 'State']]]
+    # Transitions with arbitrary conditions, as (position in _transitions, condition, next state, board keys the
+    # condition depends on or None).
+    _custom_transitions: typing.List[typing.Tuple[int, typing.Callable[['State', Board], bool], 'State',
+                                                  typing.Optional[typing.Tuple[str, ...]]]]
+    # Versions of the board keys when a transition with keys was last found false, by position in _transitions.
+    _transition_versions: typing.Dict[int, typing.Tuple[int, ...]]
+    # Hold the handle of the execution running the action
+    _run_thread: ExecutionHandle
+    # Backend that runs the action, None means the default executor.
+    _executor: Executor
+    # Status of this state, see the `_status` property
+    _status_value: StateStatus
+    # Functions called with the state after each change of its status, e.g. by a parent counting its children.
+    _status_listeners: typing.List[typing.Callable[['State'], None]]
     _internal_exception: Exception
     # Event acting as a flag for interruptions
-    _interupted_event: threading.Event
+    _interupted_event: ClockEvent
+    # Time the interrupt signal reached the running state, and how long it took from there for execute to return.
+    _interrupt_signal_time: float
+    _interrupt_latency: float
+    # Monitors observing the execution, see `StateMonitor`. Replaced instead of modified, like the listeners.
+    _monitors: typing.Tuple['StateMonitor', ...] = ()
 
     # use two variables to pass information between same-level states
     flow_in: typing.Any
@@ -32,16 +54,75 @@ class State():
 
     def __init__(self, name: str = ""):
         self._name = name if name != "" else self.__class__.__name__
+        self._status_listeners = []
         self._transitions = []
+        self._status_transitions = {}
+        self._custom_transitions = []
+        self._transition_versions = {}
         self._run_thread = None
-        self._interupted_event = threading.Event()
+        self._executor = None
+        self._interupted_event = ClockEvent()
         self._internal_exception = None
+        self._interrupt_signal_time = None
+        self._interrupt_latency = None
         self._status = StateStatus.UNKNOWN
         self.flow_in = None
         self.flow_out = None
         self._state_last_end_time = -1
         self._state_last_start_time = -1
 
+    @property
+    def _status(self) -> StateStatus:
+        return self._status_value
+
+    @_status.setter
+    def _status(self, status: StateStatus) -> None:
+        if status == StateStatus.RUNNING:
+            self._interrupt_signal_time = None
+            self._interrupt_latency = None
+            if len(self._transition_versions) > 0:
+                self._transition_versions.clear()
+        elif self._interrupt_signal_time is not None and self._interrupt_latency is None:
+            # the state was interrupted and its execution is now over.
+            self._interrupt_latency = get_clock().time() - self._interrupt_signal_time
+        self._status_value = status
+        # monitors see the change before the listeners wake up the states reacting to it.
+        if len(self._monitors) > 0:
+            now = get_clock().time()
+            for monitor in self._monitors:
+                monitor.on_status(self, status, now)
+        for listener in self._status_listeners:
+            listener(self)
+
+    def _add_status_listener(self, listener: typing.Callable[['State'], None]) -> None:
+        # the list is replaced instead of modified, so the setter can iterate it without a lock.
+        self._status_listeners = self._status_listeners + [listener]
+
+    def _remove_status_listener(self, listener: typing.Callable[['State'], None]) -> None:
+        self._status_listeners = [x for x in self._status_listeners if x != listener]
+
+    def add_monitor(self, monitor: 'StateMonitor') -> None:
+        """Add a monitor observing the execution of this state only, see `StateMonitor.attach` to observe a whole
+        machine. Nothing happens if it was already added.
+
+        Parameters
+        ----------
+        monitor : StateMonitor
+            Monitor to add.
+        """
+        if monitor not in self._monitors:
+            self._monitors = self._monitors + (monitor,)
+
+    def remove_monitor(self, monitor: 'StateMonitor') -> None:
+        """Remove a monitor added with `add_monitor`. Nothing happens if it was never added.
+
+        Parameters
+        ----------
+        monitor : StateMonitor
+            Monitor to remove.
+        """
+        self._monitors = tuple(x for x in self._monitors if x is not monitor)
+
     def check_name(self, compare: str) -> bool:
         """Check if this state has the same name as the given state
 
@@ -90,7 +171,8 @@ class State():
         """
         return self._status
 
-    def add_transition(self, cond: typing.Callable[['State', Board], bool], next_state: 'State') -> None:
+    def add_transition(self, cond: typing.Callable[['State', Board], bool], next_state: 'State',
+                       keys: typing.Iterable[str] = None) -> None:
         """Add transition to the state. Provide a checking method (cond) that when returns true, will
         signal this state to transition to the state associated. Note, the transition is test in a list. If multiple
         transition function returns true, the state transition to the first added state.
@@ -101,7 +183,22 @@ class State():
             Function to determine if this transition should be taken
         next_state : State
             The next state to go to.
+        keys : typing.Iterable[str], optional
+            Board keys the condition depends on, by default None. Once the condition is false, it is only checked
+            again after one of the keys is set, so it should not depend on anything else. None checks the
+            condition on every tick.
         """
+        self._custom_transitions.append((len(self._transitions), cond, next_state,
+                                         None if keys is None else tuple(keys)))
+        self._transitions.append((cond, next_state))
+
+    def _add_status_transition(self, cond: typing.Callable[['State', Board], bool], next_state: 'State',
+                               statuses: typing.Iterable[StateStatus], require_exit: bool = False) -> None:
+        # same as add_transition, but looked up by status in tick instead of calling the condition.
+        # The condition is kept in _transitions for the code that inspects the transitions, e.g. visualization.
+        index = len(self._transitions)
+        for status in statuses:
+            self._status_transitions.setdefault(status, []).append((index, require_exit, next_state))
         self._transitions.append((cond, next_state))
 
     def add_transition_after_elapsed(self, next_state: 'State', duration: float) -> None:
@@ -117,8 +214,8 @@ class State():
         """
 
         def timepassed(s: 'State', b: 'Board'):
-            if s._state_last_start_time > 0 and duration >= 0:
-                curr_time = time.time()
+            if s._state_last_start_time >= 0 and duration >= 0:
+                curr_time = get_clock().time()
                 if (curr_time - s._state_last_start_time) > duration:
                     return True
             return False
@@ -135,8 +232,10 @@ class State():
         ignore_exeception: bool
             Whether to also ignore exceptions
         """
-        self.add_transition(lambda x, y: not x._run_thread.is_alive()
-                            and (ignore_exeception or not x.check_status(StateStatus.EXCEPTION)), next_state)
+        statuses = [status for status in StateStatus if ignore_exeception or status != StateStatus.EXCEPTION]
+        self._add_status_transition(lambda x, y: not x.is_executing()
+                                    and (ignore_exeception or not x.check_status(StateStatus.EXCEPTION)),
+                                    next_state, statuses, require_exit=True)
 
     def add_transition_on_success(self, next_state: 'State') -> None:
         """Add transition to this state where when it is succesfully, move to the given state.
@@ -146,7 +245,7 @@ class State():
         next_state : State
             State to transition to.
         """
-        self.add_transition(lambda x, y: x._status == StateStatus.SUCCESS, next_state)
+        self._add_status_transition(lambda x, y: x._status == StateStatus.SUCCESS, next_state, [StateStatus.SUCCESS])
 
     def add_transition_on_failed(self, next_state: 'State') -> None:
         """Add transition to this state where when the state fails, move to the given state.
@@ -156,7 +255,7 @@ class State():
         next_state : State
             State to transition to
         """
-        self.add_transition(lambda x, y: x._status == StateStatus.FAILED, next_state)
+        self._add_status_transition(lambda x, y: x._status == StateStatus.FAILED, next_state, [StateStatus.FAILED])
 
     def execute(self, board: Board) -> StateStatus:
         """All derived class should overwrite this method. It is run in a seperate thread when
@@ -192,8 +291,34 @@ class State():
         self.flow_in = flow_in
         self.flow_out = None
         self._interupted_event.clear()
-        self._run_thread = threading.Thread(target=self._execute, args=(board,), name=self._name)
-        self._run_thread.start()
+        self._run_thread = ExecutionHandle(self._name)
+        if board is not None:
+            # wake up anything waiting on the board, e.g. an event driven machine.
+            self._run_thread.add_done_callback(board.notify)
+        self._get_executor().submit(self._run_thread, self._execute, (board,))
+
+    def _get_executor(self) -> Executor:
+        return self._executor if self._executor is not None else get_default_executor()
+
+    def set_executor(self, executor: Executor) -> None:
+        """Set the executor that runs this state's execute method. Takes effect the next time the state starts.
+
+        Parameters
+        ----------
+        executor : Executor
+            Executor to use, None to use the default executor.
+        """
+        self._executor = executor
+
+    def is_executing(self) -> bool:
+        """Check whether the execute method of the state is still running.
+
+        Returns
+        -------
+        bool
+            True if the state was started and execute has not returned yet.
+        """
+        return self._run_thread is not None and self._run_thread.is_alive()
 
     def wait(self, timeout: float = None) -> bool:
         """Wait for the current state to complete. You can also specify a timeout to prevent infinite loop
@@ -208,12 +333,26 @@ class State():
         bool
             Whether the current state finished, if false, it means timedout.
         """
-        if self._run_thread is not None and self._run_thread.is_alive():
-            self._run_thread.join(timeout)
+        if self.is_executing():
+            self._join(timeout)
             return not self._run_thread.is_alive()
         return True
 
+    def _join(self, timeout: float) -> None:
+        # wait for the execution, telling the monitors how long it blocked.
+        if len(self._monitors) == 0:
+            self._run_thread.join(timeout)
+            return
+        clock = get_clock()
+        start_time = clock.time()
+        self._run_thread.join(timeout)
+        end_time = clock.time()
+        for monitor in self._monitors:
+            monitor.on_wait(self, start_time, end_time)
+
     def signal_interrupt(self):
+        if self._interrupt_signal_time is None and self._status_value == StateStatus.RUNNING:
+            self._interrupt_signal_time = get_clock().time()
         self._interupted_event.set()
 
     def interrupt(self, timeout: float = None) -> bool:
@@ -235,12 +374,29 @@ class State():
         self.signal_interrupt()
         if self._run_thread is not None:
             if self._run_thread.is_alive():
-                self._run_thread.join(timeout)
+                self._join(timeout)
             # TODO check if this creates a race condition, is_alive() might still be true immediately after run() ends.
             return not self._run_thread.is_alive()
         else:
             return True
 
+    def get_interrupt_statistics(self) -> typing.Dict[str, typing.Any]:
+        """How long the last interrupt took to stop this state, and its children for nested states.
+
+        Returns
+        -------
+        typing.Dict[str, typing.Any]
+            Dictionary with the name and type of the state and the latency, the time in seconds between the
+            interrupt signal reaching the state and its execute method returning. The latency is None if the
+            state was not interrupted while running in its last execution. Nested states add the statistics of
+            their children under 'children'.
+        """
+        return {
+            'name': self._name,
+            'type': type(self).__name__,
+            'latency': self._interrupt_latency
+        }
+
     def is_interrupted(self) -> bool:
         """Method to check whether the state itself is being interrupted
         Returns
@@ -264,14 +420,55 @@ class State():
             The next state if should go, self is returned if no transition should be taken.
         """
         # check all the transitions
-        for transition in self._transitions:
-            if transition[0](self, board):
-                self.interrupt(timeout=None)
-                # start the next state
-                transition[1].start(board, self.flow_out)
-                return transition[1]  # return the state to the execution
+        next_state = self._find_transition(board)
+        if next_state is not None:
+            self._notify_transition(next_state)
+            self.interrupt(timeout=None)
+            # start the next state
+            next_state.start(board, self.flow_out)
+            return next_state  # return the state to the execution
         return self
 
+    def _notify_transition(self, next_state: 'State') -> None:
+        # tell the monitors a transition is taken, before this state is interrupted.
+        if len(self._monitors) > 0:
+            now = get_clock().time()
+            for monitor in self._monitors:
+                monitor.on_transition(self, next_state, now)
+
+    def _find_transition(self, board: Board) -> 'State':
+        # the first transition, in the order they were added, that should be taken. None if there is none.
+        # Built-in transitions are found by the current status, only custom conditions are called.
+        status_transitions = self._status_transitions.get(self._status, ())
+        custom_transitions = self._custom_transitions
+        custom_index = 0
+        for index, require_exit, next_state in status_transitions:
+            # custom transitions added before this one take precedence.
+            while custom_index < len(custom_transitions) and custom_transitions[custom_index][0] < index:
+                position, cond, custom_state, keys = custom_transitions[custom_index]
+                if self._check_condition(position, cond, keys, board):
+                    return custom_state
+                custom_index += 1
+            if not require_exit or not self.is_executing():
+                return next_state
+        for index, cond, custom_state, keys in custom_transitions[custom_index:]:
+            if self._check_condition(index, cond, keys, board):
+                return custom_state
+        return None
+
+    def _check_condition(self, index: int, cond: typing.Callable[['State', Board], bool],
+                         keys: typing.Tuple[str, ...], board: Board) -> bool:
+        if keys is None or board is None:
+            return cond(self, board)
+        versions = tuple(board.get_version(key) for key in keys)
+        if self._transition_versions.get(index) == versions:
+            # none of the keys changed since the condition was false.
+            return False
+        if cond(self, board):
+            return True
+        self._transition_versions[index] = versions
+        return False
+
     def print_debugging_info(self) -> None:
         """Print Debug Information such as name and status of state.
         """
@@ -297,8 +494,10 @@ class State():
         return f"{self._name}({self.__class__.__name__})"
 
     def pre_execute(self):
-        self._state_last_start_time = time.time()
+        self._state_last_start_time = get_clock().time()
+        for monitor in self._monitors:
+            monitor.on_execute(self, self._state_last_start_time)
 
     def post_execute(self):
-        self._state_last_end_time = time.time()
+        self._state_last_end_time = get_clock().time()
         pass
@@ -0,0 +1,116 @@
+import typing
+
+from .machine import Machine, _reachable_states
+from .state import State
+from .state_status import StateStatus
+
+
+class StateMonitor():
+    """Base class of the objects observing the execution of states, e.g. `Profiler`. A monitor is attached to
+    states with `attach`, which then call its methods from the thread where the change happened, so they should
+    be fast and thread-safe. The times are read from the current clock, see `get_clock`.
+    """
+
+    def attach(self, state: State) -> None:
+        """Observe the state and every state reachable from it: the children of nested states, the states of
+        machines and the targets of transitions. States added to the tree afterwards are not observed.
+
+        Parameters
+        ----------
+        state : State
+            State to observe, usually a machine.
+        """
+        for reachable, _ in _reachable_states(state):
+            reachable.add_monitor(self)
+
+    def detach(self, state: State) -> None:
+        """Stop observing the states attached with `attach`.
+
+        Parameters
+        ----------
+        state : State
+            State given to `attach`.
+        """
+        for reachable, _ in _reachable_states(state):
+            reachable.remove_monitor(self)
+
+    def on_status(self, state: State, status: StateStatus, time: float) -> None:
+        """Called after the status of the state changed, to RUNNING when it starts.
+
+        Parameters
+        ----------
+        state : State
+            State whose status changed.
+        status : StateStatus
+            New status, None for an instant when execute returned nothing, before it becomes NOT_SPECIFIED.
+        time : float
+            Time of the change.
+        """
+        pass
+
+    def on_execute(self, state: State, time: float) -> None:
+        """Called when the execute method of the state is about to run, from the thread running it.
+
+        Parameters
+        ----------
+        state : State
+            State being executed.
+        time : float
+            Time execute started.
+        """
+        pass
+
+    def on_wait(self, state: State, start_time: float, end_time: float) -> None:
+        """Called after `wait` or `interrupt` blocked on the state until it finished or timed out.
+
+        Parameters
+        ----------
+        state : State
+            State waited for.
+        start_time : float
+            Time the wait started.
+        end_time : float
+            Time the wait ended.
+        """
+        pass
+
+    def on_transition(self, state: State, next_state: State, time: float) -> None:
+        """Called when a transition of the state is taken, before the state is interrupted and the next one
+        started.
+
+        Parameters
+        ----------
+        state : State
+            State the transition leaves.
+        next_state : State
+            State the transition goes to.
+        time : float
+            Time the transition was found.
+        """
+        pass
+
+    def on_tick(self, machine: Machine, start_time: float, end_time: float) -> None:
+        """Called after each tick of a machine, from the thread ticking it.
+
+        Parameters
+        ----------
+        machine : Machine
+            Machine that ticked.
+        start_time : float
+            Time the tick started.
+        end_time : float
+            Time the tick ended.
+        """
+        pass
+
+
+def _state_paths(root: State) -> typing.List[typing.Tuple[State, str]]:
+    # the states of the tree with their path, the path of the nested state they belong to followed by their name.
+    paths = {}
+    states = []
+    for state, parent in _reachable_states(root):
+        # a nested state is always found before its children.
+        path = state._name if parent is None else f"{paths[id(parent)]}/{state._name}"
+        paths[id(state)] = path
+        states.append((state, path))
+    return states
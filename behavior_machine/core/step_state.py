@@ -0,0 +1,170 @@
+import threading
+import types
+import typing
+
+from .board import Board
+from .clock import get_clock
+from .executor import ExecutionHandle
+from .state import State
+from .state_status import StateStatus
+
+
+class StepState(State):
+    """State whose execute method is a generator that yields between steps. It does not use a thread,
+    the first step runs when the state starts and each following step runs when the state is ticked by its
+    parent, e.g. a `Machine`, `SequentialState` or `ParallelState`. Use it for tiny states where starting
+    a thread costs more than the work itself.
+    """
+
+    # how long wait blocks before advancing the state itself when no parent ticks it.
+    _WAIT_STEP_INTERVAL = 0.05
+
+    _generator: typing.Generator
+    _step_lock: threading.RLock
+    _last_step_time: float
+    _ticked: bool  # whether a parent ticks the state, then wait leaves the steps to it
+
+    def __init__(self, name: str = ""):
+        super().__init__(name)
+        self._generator = None
+        self._step_lock = threading.RLock()
+        self._last_step_time = -1
+        self._ticked = False
+
+    def execute(self, board: Board) -> typing.Generator[None, None, StateStatus]:
+        """All derived class should overwrite this method. It should be a generator that yields whenever it
+        waits for the next tick and returns the status once completed. A normal method that directly returns
+        the status also works, and completes when the state starts.
+
+        Parameters
+        ----------
+        board : Board
+            Board object that is being passed between multiple states.
+
+        Returns
+        -------
+        StateStatus (Optional)
+            When the state completes, whether it is successful or not.
+        """
+        raise NotImplementedError("Default execute method is not overwritten")
+
+    def start(self, board: Board, flow_in: typing.Any = None) -> None:
+        with self._step_lock:
+            self._status = StateStatus.RUNNING
+            self.flow_in = flow_in
+            self.flow_out = None
+            self._interupted_event.clear()
+            self._generator = None
+            self._run_thread = ExecutionHandle(self._name)
+            if board is not None:
+                # wake up anything waiting on the board, e.g. an event driven machine.
+                self._run_thread.add_done_callback(board.notify)
+            try:
+                self.pre_execute()
+                result = self.execute(board)
+            except Exception as e:
+                self._internal_exception = e
+                self._finish(StateStatus.EXCEPTION)
+                return
+            if isinstance(result, types.GeneratorType):
+                self._generator = result
+                self._step()
+            else:
+                self._finish(result)
+
+    def _step(self) -> None:
+        with self._step_lock:
+            if self._generator is None:
+                return
+            self._last_step_time = get_clock().time()
+            try:
+                next(self._generator)
+            except StopIteration as e:
+                self._finish(e.value)
+                return
+            except Exception as e:
+                self._internal_exception = e
+                self._finish(StateStatus.EXCEPTION)
+                return
+            # the step might have interrupted itself.
+            if self.is_interrupted():
+                self._close()
+
+    def _finish(self, status: StateStatus) -> None:
+        self._generator = None
+        self._status = status
+        if status != StateStatus.EXCEPTION:
+            self.post_execute()
+        if self._status is None:
+            self._status = StateStatus.NOT_SPECIFIED
+        self._run_thread._set_done()
+
+    def _close(self) -> None:
+        try:
+            self._generator.close()
+        except Exception as e:
+            self._internal_exception = e
+            self._finish(StateStatus.EXCEPTION)
+            return
+        self._finish(StateStatus.INTERRUPTED)
+
+    def tick(self, board: Board) -> State:
+        self._ticked = True
+        # advance the state before checking the transitions, so they see the result of this step.
+        self._step()
+        return super().tick(board)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for the current state to complete. The state is advanced by its parent's ticks, but if it is
+        neither in a machine nor ever ticked, e.g. when started on its own, wait advances it instead.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Timeout in seconds, None will mean wait forever, by default None
+
+        Returns
+        -------
+        bool
+            Whether the current state finished, if false, it means timedout.
+        """
+        clock = get_clock()
+        if self._ticked:
+            return clock.wait(self._run_thread._done_event, timeout)
+        end_time = None if timeout is None else clock.time() + timeout
+        while self.is_executing():
+            interval = self._WAIT_STEP_INTERVAL
+            if end_time is not None:
+                interval = min(interval, end_time - clock.time())
+                if interval <= 0:
+                    return False
+            if clock.wait(self._run_thread._done_event, interval):
+                return True
+            # a parent might have started ticking it meanwhile.
+            if not self._ticked and clock.time() - self._last_step_time >= self._WAIT_STEP_INTERVAL:
+                self._step()
+        return True
+
+    def interrupt(self, timeout: float = None) -> bool:
+        """Interrupts the current execution of the state. The generator is closed, so its finally blocks run.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            timeout in seconds, by default None
+
+        Returns
+        -------
+        bool
+            True if the state is no longer running or interrupted. False if timeout.
+        """
+        self.signal_interrupt()
+        if not self._step_lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        try:
+            # if the generator interrupted itself, the step closes it once it yields.
+            if self._generator is not None and not self._generator.gi_running:
+                self._close()
+        finally:
+            self._step_lock.release()
+        return True
@@ -0,0 +1,152 @@
+import collections
+import threading
+import typing
+
+from .clock import get_clock
+
+
+class TickScheduler():
+    """Schedules the ticks of a machine on absolute deadlines of the current clock, `time.monotonic` by
+    default. Each deadline is one period after the previous one, instead of one period after the previous
+    tick ended, so the ticks do not drift and are not affected by changes of the wall clock. It also keeps
+    statistics about how close the ticks are to their deadlines.
+    """
+
+    _period: float
+    _busy_wait: float
+    _next_deadline: float
+    _tick_start_time: float
+    _start_time: float
+    _num_ticks: int
+    _num_early_ticks: int
+    _num_overruns: int
+    _num_skipped: int
+    _total_tick_duration: float
+    _max_tick_duration: float
+    _lateness: typing.Deque[float]
+
+    def __init__(self, period: float, busy_wait: float = 0.0, history: int = 1000):
+        """Constructor for TickScheduler
+
+        Parameters
+        ----------
+        period : float
+            Time in seconds between two ticks.
+        busy_wait : float, optional
+            Time in seconds before each deadline spent busy waiting instead of sleeping. This gives sub-millisecond
+            precision at the cost of CPU time, by default 0.0
+        history : int, optional
+            Number of recent ticks used for the jitter percentiles, by default 1000
+        """
+        self._period = period
+        self._busy_wait = busy_wait
+        self._lateness = collections.deque(maxlen=history)
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear the statistics and schedule the next tick immediately.
+        """
+        now = get_clock().time()
+        self._next_deadline = now
+        self._tick_start_time = now
+        self._start_time = now
+        self._num_ticks = 0
+        self._num_early_ticks = 0
+        self._num_overruns = 0
+        self._num_skipped = 0
+        self._total_tick_duration = 0.0
+        self._max_tick_duration = 0.0
+        self._lateness.clear()
+
+    def begin_tick(self) -> None:
+        """Mark the start of a tick. Ticks before the deadline, e.g. woken up by an event, do not move the deadline.
+        """
+        now = get_clock().time()
+        self._tick_start_time = now
+        if now < self._next_deadline:
+            self._num_early_ticks += 1
+            return
+        self._num_ticks += 1
+        lateness = now - self._next_deadline
+        self._lateness.append(lateness)
+        # deadlines that already passed are skipped instead of ticking repeatedly to catch up.
+        missed = int(lateness / self._period)
+        self._num_skipped += missed
+        self._next_deadline += (missed + 1) * self._period
+
+    def end_tick(self) -> float:
+        """Mark the end of a tick.
+
+        Returns
+        -------
+        float
+            Duration of the tick in seconds.
+        """
+        duration = get_clock().time() - self._tick_start_time
+        self._total_tick_duration += duration
+        self._max_tick_duration = max(self._max_tick_duration, duration)
+        if duration > self._period:
+            self._num_overruns += 1
+        return duration
+
+    def set_period(self, period: float) -> None:
+        """Change the time in seconds between two ticks.
+        """
+        self._period = period
+
+    def get_next_deadline(self) -> float:
+        """Time of the next deadline on the current clock.
+        """
+        return self._next_deadline
+
+    def time_until_next_tick(self) -> float:
+        """Time in seconds until the next deadline, 0 if it already passed.
+        """
+        return max(0.0, self._next_deadline - get_clock().time())
+
+    def sleep(self, wake_event: threading.Event = None) -> None:
+        """Block until the next deadline.
+
+        Parameters
+        ----------
+        wake_event : threading.Event, optional
+            Event that ends the wait before the deadline once set, should be a `ClockEvent`, by default None
+        """
+        clock = get_clock()
+        if self._next_deadline - self._busy_wait > clock.time():
+            if clock.wait_until(wake_event, self._next_deadline - self._busy_wait):
+                return
+        clock.spin_until(self._next_deadline, wake_event)
+
+    def get_statistics(self) -> typing.Dict[str, float]:
+        """Statistics of the ticks since the last reset. Jitter is how late a tick started compared to its deadline.
+
+        Returns
+        -------
+        typing.Dict[str, float]
+            Dictionary with the target and actual rate in Hz, number of ticks, early ticks, overruns and skipped
+            ticks, mean and max tick duration, and the 50th, 90th, 99th percentile and max jitter in seconds.
+        """
+        elapsed = get_clock().time() - self._start_time
+        all_ticks = self._num_ticks + self._num_early_ticks
+        lateness = sorted(self._lateness)
+
+        def percentile(p: float) -> float:
+            if len(lateness) == 0:
+                return 0.0
+            return lateness[min(len(lateness) - 1, int(p * len(lateness)))]
+
+        return {
+            'target_rate': 1.0 / self._period,
+            'actual_rate': self._num_ticks / elapsed if elapsed > 0 else 0.0,
+            'ticks': self._num_ticks,
+            'early_ticks': self._num_early_ticks,
+            'overruns': self._num_overruns,
+            'skipped_ticks': self._num_skipped,
+            'mean_tick_duration': self._total_tick_duration / all_ticks if all_ticks > 0 else 0.0,
+            'max_tick_duration': self._max_tick_duration,
+            'jitter_p50': percentile(0.5),
+            'jitter_p90': percentile(0.9),
+            'jitter_p99': percentile(0.99),
+            'jitter_max': lateness[-1] if len(lateness) > 0 else 0.0,
+        }
@@ -0,0 +1,161 @@
+import collections
+import json
+import threading
+import typing
+
+from .machine import Machine
+from .state import State
+from .state_monitor import StateMonitor, _state_paths
+from .state_status import StateStatus
+
+# process ids of the two groups of tracks in the trace.
+_THREADS_PID = 1
+_STATES_PID = 2
+
+
+class Tracer(StateMonitor):
+    """Monitor recording the timeline of machines as Chrome trace events, which open in Perfetto or
+    chrome://tracing without any server. The trace has two groups of tracks:
+
+    - threads: one track per thread, with the ticks of the machines and the execute method of the states it ran.
+    - states: one track per state, named by its path in the tree, with a span from each start of the state to
+      its completion, and the transitions it took as instant events.
+
+    Each thread records its events in its own buffer, a deque appended to without lock, so tracing does not
+    slow down the ticks much. The events are only converted to JSON by `to_json` or `dump`.
+    """
+
+    _max_events: int
+    _local: threading.local
+    _buffers: typing.List[typing.Deque[tuple]]
+    _thread_names: typing.Dict[int, str]
+    _buffers_lock: threading.Lock  # taken once per thread, to register its buffer
+    _paths: typing.Dict[int, str]  # path of each attached state in the tree, by id
+    _tracks: typing.Dict[int, int]  # track of each state in the states group, by id
+    _start_times: typing.Dict[int, float]  # time each running state started, by id
+    _execute_starts: typing.Dict[int, typing.Tuple[float, int]]  # time and thread each execute method started
+
+    def __init__(self, max_events: int = 100000):
+        """Constructor for Tracer
+
+        Parameters
+        ----------
+        max_events : int, optional
+            Number of events kept for each thread, the oldest ones are dropped first, by default 100000
+        """
+        self._max_events = max_events
+        self._local = threading.local()
+        self._buffers = []
+        self._thread_names = {}
+        self._buffers_lock = threading.Lock()
+        self._paths = {}
+        self._tracks = {}
+        self._start_times = {}
+        self._execute_starts = {}
+
+    def attach(self, state: State) -> None:
+        for reachable, path in _state_paths(state):
+            self._paths.setdefault(id(reachable), path)
+            self._tracks.setdefault(id(reachable), len(self._tracks) + 1)
+        super().attach(state)
+
+    def _record(self, event: tuple) -> None:
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = collections.deque(maxlen=self._max_events)
+            thread = threading.current_thread()
+            with self._buffers_lock:
+                self._buffers.append(buffer)
+                self._thread_names[thread.ident] = thread.name
+        # appending to a deque is atomic, the buffer is only read when exporting.
+        buffer.append(event)
+
+    def on_status(self, state: State, status: StateStatus, time: float) -> None:
+        if status == StateStatus.RUNNING:
+            # a machine sets its status before starting its tick loop, which sets it again.
+            self._start_times.setdefault(id(state), time)
+            return
+        if status is None:
+            return
+        start_time = self._start_times.pop(id(state), None)
+        if start_time is None:
+            return
+        # (phase, name, pid, tid, start time, end time, arguments)
+        self._record(('X', state._name, _STATES_PID, self._tracks.get(id(state), 0), start_time, time,
+                      {'type': type(state).__name__, 'status': status.name}))
+        execute_start = self._execute_starts.pop(id(state), None)
+        if execute_start is not None:
+            execute_time, thread_id = execute_start
+            self._record(('X', f"execute {state._name}", _THREADS_PID, thread_id, execute_time, time,
+                          {'type': type(state).__name__, 'status': status.name}))
+
+    def on_execute(self, state: State, time: float) -> None:
+        self._execute_starts[id(state)] = (time, threading.get_ident())
+
+    def on_transition(self, state: State, next_state: State, time: float) -> None:
+        self._record(('i', f"{state._name} -> {next_state._name}", _STATES_PID, self._tracks.get(id(state), 0),
+                      time, time, {'to': self._paths.get(id(next_state), next_state._name)}))
+
+    def on_tick(self, machine: Machine, start_time: float, end_time: float) -> None:
+        self._record(('X', f"tick {machine._name}", _THREADS_PID, threading.get_ident(), start_time, end_time,
+                      {'state': machine._curr_state._name}))
+
+    def clear(self) -> None:
+        """Drop the events recorded so far.
+        """
+        with self._buffers_lock:
+            for buffer in self._buffers:
+                buffer.clear()
+
+    def get_events(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """The recorded events in the Chrome trace event format, sorted by time, after the metadata events naming
+        the groups and tracks. Timestamps and durations are in microseconds of the current clock.
+
+        Returns
+        -------
+        typing.List[typing.Dict[str, typing.Any]]
+            The trace events.
+        """
+        with self._buffers_lock:
+            recorded = [event for buffer in self._buffers for event in list(buffer)]
+            thread_names = dict(self._thread_names)
+        recorded.sort(key=lambda event: event[4])
+        events = [{'ph': 'M', 'name': 'process_name', 'pid': _THREADS_PID, 'tid': 0, 'args': {'name': 'threads'}},
+                  {'ph': 'M', 'name': 'process_name', 'pid': _STATES_PID, 'tid': 0, 'args': {'name': 'states'}}]
+        events += [{'ph': 'M', 'name': 'thread_name', 'pid': _THREADS_PID, 'tid': thread_id, 'args': {'name': name}}
+                   for thread_id, name in thread_names.items()]
+        for state_id, track in self._tracks.items():
+            events.append({'ph': 'M', 'name': 'thread_name', 'pid': _STATES_PID, 'tid': track,
+                           'args': {'name': self._paths[state_id]}})
+            # keep the tracks in the order of the tree.
+            events.append({'ph': 'M', 'name': 'thread_sort_index', 'pid': _STATES_PID, 'tid': track,
+                           'args': {'sort_index': track}})
+        for phase, name, pid, tid, start_time, end_time, args in recorded:
+            event = {'ph': phase, 'name': name, 'pid': pid, 'tid': tid, 'ts': start_time * 1e6, 'args': args}
+            if phase == 'X':
+                event['dur'] = (end_time - start_time) * 1e6
+            else:
+                event['s'] = 't'
+            events.append(event)
+        return events
+
+    def to_json(self) -> str:
+        """The trace encoded in the Chrome trace JSON format, see `get_events`.
+
+        Returns
+        -------
+        str
+            JSON object with the events under 'traceEvents'.
+        """
+        return json.dumps({'traceEvents': self.get_events(), 'displayTimeUnit': 'ms'})
+
+    def dump(self, file_path: str) -> None:
+        """Write the trace to a JSON file that can be opened in Perfetto or chrome://tracing.
+
+        Parameters
+        ----------
+        file_path : str
+            Path of the file, it is overwritten.
+        """
+        with open(file_path, 'w') as f:
+            f.write(self.to_json())
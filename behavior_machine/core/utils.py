@@ -1,3 +1,4 @@
+import collections.abc
 import typing
 
 
@@ -11,3 +12,40 @@ def parse_debug_info(info: typing.Dict[str, typing.Any], spacing: int = 0, margi
             str_list += parse_debug_info(child,
                                          spacing + margin, margin, "-> ")
     return str_list
+
+
+class DebugInfoLines(collections.abc.Sequence):
+    """Lines of `parse_debug_info`, formatted the first time they are read. Converting it to a string joins
+    the lines, so it can be passed to a logger that only formats the messages it outputs.
+    """
+
+    _info: typing.Dict[str, typing.Any]
+    _prefix: str
+    _lines: typing.List[str]
+
+    def __init__(self, info: typing.Dict[str, typing.Any], prefix: str = ""):
+        self._info = info
+        self._prefix = prefix
+        self._lines = None
+
+    def _get_lines(self) -> typing.List[str]:
+        if self._lines is None:
+            self._lines = parse_debug_info(self._info, prefix=self._prefix)
+        return self._lines
+
+    def __getitem__(self, index):
+        return self._get_lines()[index]
+
+    def __len__(self) -> int:
+        return len(self._get_lines())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, collections.abc.Sequence) or isinstance(other, str):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __str__(self) -> str:
+        return '\n'.join(self._get_lines())
+
+    def __repr__(self) -> str:
+        return repr(self._get_lines())
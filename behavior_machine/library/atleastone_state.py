@@ -8,10 +8,9 @@ class AtLeastOneState(ParallelState):
     """
 
     def _statestatus_criteria(self) -> StateStatus:
-        # check the state of all the children & return success if at least one child succeed.
-        for child in self._children:
-            if child.check_status(StateStatus.SUCCESS):
-                return StateStatus.SUCCESS
+        # return success if at least one child succeed.
+        if self._count_children(StateStatus.SUCCESS) > 0:
+            return StateStatus.SUCCESS
         return StateStatus.FAILED
 
     def _tick_child_complete_function(self, child_state: State) -> bool:
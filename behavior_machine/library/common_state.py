@@ -1,6 +1,6 @@
 from typing import Any
 import typing
-from ..core import StateStatus, State, Board
+from ..core import StateStatus, State, Board, get_clock
 import copy
 
 
@@ -45,7 +45,7 @@ class WaitState(State):
     def execute(self, board):
 
         # sleep by using interrupt's timeout
-        if self._interupted_event.wait(self._duration):
+        if get_clock().wait(self._interupted_event, self._duration):
             # this means an event was fired
             return StateStatus.INTERRUPTED
         else:
@@ -59,21 +59,24 @@ class SaveFlowState(State):
     """
 
     _key: str
+    _ttl: float
 
-    def __init__(self, name: str, key: str):
+    def __init__(self, name: str, key: str, ttl: float = None):
         """Constructor for SaveFlowState
 
         Args:
             name (str): Name of the state.
             key (str): key to store the flow_in value.
+            ttl (float, optional): Seconds after which the value is removed from the board. Defaults to None.
         """
         self._key = key
+        self._ttl = ttl
         super().__init__(name)
 
     def execute(self, board: Board) -> StateStatus:
         if self.flow_in is None:
             return StateStatus.FAILED
-        board.set(self._key, self.flow_in)
+        board.set(self._key, self.flow_in, ttl=self._ttl)
         return StateStatus.SUCCESS
 
 
@@ -133,21 +136,23 @@ class SetBoardState(State):
 
     _val: typing.Any
     _key: str
+    _ttl: float
 
-    def __init__(self, name: str, key: str, val: Any = None):
+    def __init__(self, name: str, key: str, val: Any = None, ttl: float = None):
         super().__init__(name)
         self._val = val
         self._key = key
+        self._ttl = ttl
 
     def execute(self, board: Board):
         if self._val is not None:
             # special case if the value is a lambda
             if callable(self._val):
-                board.set(self._key, self._val())
+                board.set(self._key, self._val(), ttl=self._ttl)
             else:
-                board.set(self._key, self._val)
+                board.set(self._key, self._val, ttl=self._ttl)
         elif self.flow_in is not None:
-            board.set(self._key, self.flow_in)
+            board.set(self._key, self.flow_in, ttl=self._ttl)
         else:
             return StateStatus.FAILED
         return StateStatus.SUCCESS
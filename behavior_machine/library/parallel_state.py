@@ -1,5 +1,6 @@
+from ..core import StateStatus, State, NestedState, Board, ClockEvent, get_clock
+import collections
 import threading
-from ..core import StateStatus, State, NestedState, Board
 import typing
 import sys
 
@@ -8,37 +9,115 @@ class ParallelState(NestedState):
 
     _children: typing.List[State]
     _thread_list: list
-    _state_complete_event: threading.Event
+    _state_complete_event: ClockEvent
+    _admission_event: ClockEvent  # wakes up execute to start queued children
+    _max_concurrency: int
+    _queue_wait_times: typing.Dict[str, float]
+    _stop_admission: bool  # whether a finished child already decided the outcome
     _child_exception: bool
-
-    def __init__(self, name, children: list = None):
-        super(ParallelState, self).__init__(name)
+    # the children report their status changes, so ticks do not have to check every child.
+    _status_lock: threading.Lock
+    _child_status: typing.Dict[int, StateStatus]  # last status reported by each child
+    _status_counts: typing.Counter[StateStatus]  # number of children in each status
+    _changed_children: typing.Deque[State]  # children whose status changed since the last tick
+    _ticked_children: typing.List[State]  # children that do something when ticked
+
+    def __init__(self, name, children: list = None, max_concurrency: int = None, scoped: bool = False):
+        """Constructor for ParallelState
+
+        Parameters
+        ----------
+        name : str
+            Name of the state.
+        children : list, optional
+            States to run in parallel, by default None
+        max_concurrency : int, optional
+            Maximum number of children running at the same time. The others wait in order and start as running
+            children finish, by default None which starts all children at once
+        scoped : bool, optional
+            Whether each child gets its own scope of the board, see `Board.scope`. Values they set and do not
+            promote are dropped once this state finishes, by default False
+        """
+        super(ParallelState, self).__init__(name, scoped)
         self._children = [] if children is None else list(filter(None, children))
-        self._state_complete_event = threading.Event()
+        self._state_complete_event = ClockEvent()
+        self._admission_event = ClockEvent()
+        self._max_concurrency = max_concurrency
+        self._queue_wait_times = {}
+        self._stop_admission = False
         self._child_exception = False
+        self._status_lock = threading.Lock()
+        self._child_status = {}
+        self._status_counts = collections.Counter()
+        self._changed_children = collections.deque()
+        self._ticked_children = []
+        for child in self._children:
+            child._add_status_listener(self._on_child_status)
 
     def add_children(self, state: State):
         self._children.append(state)
+        state._add_status_listener(self._on_child_status)
+
+    def _on_child_status(self, child: State) -> None:
+        # called from the thread that changed the status of the child.
+        with self._status_lock:
+            # read the status again, the order of concurrent changes is only known here.
+            status = child._status
+            previous = self._child_status.get(id(child))
+            if previous == status:
+                return
+            if previous is not None:
+                self._status_counts[previous] -= 1
+            self._child_status[id(child)] = status
+            self._status_counts[status] += 1
+        self._changed_children.append(child)
+        if previous == StateStatus.RUNNING:
+            # the tick ends the state later, but queued children should not start in the meantime.
+            if self._max_concurrency is not None:
+                if self._tick_child_complete_function(child) or status == StateStatus.EXCEPTION:
+                    self._stop_admission = True
+            # a slot for a queued child is free.
+            self._admission_event.set()
+
+    def _count_children(self, status: StateStatus) -> int:
+        with self._status_lock:
+            return self._status_counts[status]
 
     def pre_execute(self):
+        with self._status_lock:
+            self._child_status.clear()
+            self._status_counts.clear()
+        self._changed_children.clear()
         # make sure all children states have the correct states
         child: State
         for child in self._children:
             child._status = StateStatus.NOT_RUNNING
+        # leaf states without transitions do nothing when ticked, so they are skipped.
+        self._ticked_children = [child for child in self._children
+                                 if type(child).tick is not State.tick or len(child._transitions) > 0]
         # clear the event flag before starting
         self._state_complete_event.clear()
+        self._queue_wait_times = {}
+        self._stop_admission = False
         self._child_exception = False
         return super().pre_execute()
 
+    def _get_children(self) -> typing.List[State]:
+        return list(self._children)
+
+    def _get_active_children(self) -> typing.List[State]:
+        return [child for child in self._children if child.check_status(StateStatus.RUNNING)]
+
     def _interrupt_running_children(self, timeout=None) -> bool:
         # we send the interrupt signal to all children that are running
-        for child in self._children:
-            if child.check_status(StateStatus.RUNNING):
-                child.signal_interrupt()
-        # now we wait for each children
+        for child in self._get_active_children():
+            child.signal_interrupt()
+        # now we wait for each children, they are all stopping at the same time so they share the timeout.
+        clock = get_clock()
+        deadline = clock.deadline(timeout)
         failed = False
         for child in self._children:
-            if not child.interrupt(timeout):
+            if not child.interrupt(clock.remaining(deadline)):
                 print(f"ERROR {self.get_debug_name()} unable to complete Interrupt Action \
                     for child {child.get_debug_name()} Zombie threads likely", file=sys.stderr)
                 failed = True
@@ -54,20 +133,36 @@ class ParallelState(NestedState):
                 return False
         return True
 
-    def interrupt(self, timeout=None):
-        # set our own flag to be true
-        self._interupted_event.set()
+    def _set_complete(self) -> None:
         # set that the state should be finishing
         self._state_complete_event.set()
-        # we wait for the main thread to stop
+        # stop starting queued children.
+        self._admission_event.set()
+
+    def get_queue_wait_times(self) -> typing.Dict[str, float]:
+        """Time in seconds each child waited for a free slot before it started, in the last execution.
+        Children that never started are not included.
+
+        Returns
+        -------
+        typing.Dict[str, float]
+            Wait time of each child, by name.
+        """
+        return dict(self._queue_wait_times)
+
+    def signal_interrupt(self):
+        super().signal_interrupt()
+        # set that the state should be finishing
+        self._set_complete()
+
+    def interrupt(self, timeout=None):
+        # we wait for the main thread to stop, it interrupts the running children.
         return super().interrupt(timeout=timeout)
 
     def _statestatus_criteria(self) -> StateStatus:
-        # check the state of all the children & return success if and only if all are successful
-        all_success = True
-        for child in self._children:
-            if not child.check_status(StateStatus.SUCCESS):
-                all_success = False
+        # return success if and only if all the children are successful
+        with self._status_lock:
+            all_success = self._status_counts[StateStatus.SUCCESS] == len(self._child_status)
         return StateStatus.SUCCESS if all_success else StateStatus.FAILED
 
     def _tick_child_complete_function(self, child_state: State) -> bool:
@@ -75,13 +170,26 @@ class ParallelState(NestedState):
 
     def execute(self, board: Board) -> StateStatus:
 
-        # start each child.
-        for child in self._children:
-            # because each child starts their own thread, no extra management required.
-            child.start(board)
+        clock = get_clock()
+        queued_time = clock.time()
+        pending = collections.deque(self._children)
+        while len(pending) > 0:
+            # cleared before checking, so children finishing meanwhile wake up the wait.
+            self._admission_event.clear()
+            if self._state_complete_event.is_set() or self._stop_admission:
+                break
+            # start children while there are free slots.
+            while len(pending) > 0 and not self._stop_admission and (
+                    self._max_concurrency is None or self._count_children(StateStatus.RUNNING) < self._max_concurrency):
+                child = pending.popleft()
+                self._queue_wait_times[child._name] = clock.time() - queued_time
+                # because each child starts their own thread, no extra management required.
+                child.start(self._get_scope(board, child))
+            if len(pending) > 0:
+                clock.wait(self._admission_event)
 
         # we wait for when this state should be completed
-        self._state_complete_event.wait()
+        clock.wait(self._state_complete_event)
         # we now interrupt and stop all remaining running state
         self._interrupt_running_children()
         # if we were interrupted
@@ -102,26 +210,28 @@ class ParallelState(NestedState):
             # If we are currently trying to resolve interrupt, return self.
             if self.is_interrupted():
                 return self
-            # we are staying in this state, tick each of the children.
-            at_least_one_running = False
-            for child in self._children:
-                # if the child is running, tick it
+            # we are staying in this state, tick the running children that need it.
+            for child in self._ticked_children:
+                if child.check_status(StateStatus.RUNNING):
+                    child.tick(self._find_scope(board, child))
+            # only the children whose status changed since the last tick are checked.
+            while len(self._changed_children) > 0:
+                child = self._changed_children.popleft()
                 if child.check_status(StateStatus.RUNNING):
-                    at_least_one_running = True
-                    child.tick(board)
+                    continue
                 elif self._tick_child_complete_function(child):
                     # one state failed, this state is now over.
-                    self._state_complete_event.set()
+                    self._set_complete()
                 elif child.check_status(StateStatus.EXCEPTION):
                     self.propergate_exception_information(child)
                     self._child_exception = True
-                    self._state_complete_event.set()
-                elif child.check_status(StateStatus.NOT_RUNNING):
-                    # This is likely an edge case where the child hasn't start being check yet.
-                    at_least_one_running = True
+                    self._set_complete()
             # if all child already done, we need to let the main process knows
-            if not at_least_one_running:
-                self._state_complete_event.set()
+            # NOT_RUNNING is likely an edge case where the child hasn't start being check yet.
+            with self._status_lock:
+                num_running = self._status_counts[StateStatus.RUNNING] + self._status_counts[StateStatus.NOT_RUNNING]
+            if num_running == 0:
+                self._set_complete()
             # return itself since nothing transitioned
             return self
         else:
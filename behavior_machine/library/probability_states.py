@@ -1,5 +1,5 @@
 import threading
-from ..core import StateStatus, State, NestedState, Board
+from ..core import StateStatus, State, NestedState, Board, get_clock
 import typing
 import random
 import threading
@@ -31,10 +31,29 @@ class RandomPickState(NestedState):
             self._picked_state = None
         return result_status
 
+    def _get_children(self) -> typing.List[State]:
+        return list(self._children)
+
+    def _get_active_children(self) -> typing.List[State]:
+        picked_state = self._picked_state
+        return [] if picked_state is None else [picked_state]
+
     def interrupt(self, timeout: float = None) -> bool:
-        # we have a lock here just in case it suddenly become None when interrupting.
+        # the timeout covers the whole interrupt, the picked state only gets what is left of it.
+        clock = get_clock()
+        deadline = clock.deadline(timeout)
         self.signal_interrupt()
+        # we have a lock here just in case it suddenly become None when interrupting.
         with self._lock:
-            if self._picked_state is not None:
-                return self._picked_state.interrupt(timeout)
-        return True
+            if self._picked_state is not None and not self._picked_state.interrupt(clock.remaining(deadline)):
+                return False
+        # wait for our own execution outside of the lock, it takes the lock before returning.
+        return super().interrupt(clock.remaining(deadline))
+
+    def tick(self, board: Board) -> State:
+        next_state = super().tick(board)
+        if next_state == self:
+            with self._lock:
+                if self._picked_state is not None:
+                    self._picked_state.tick(board)
+        return next_state
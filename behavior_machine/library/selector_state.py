@@ -5,6 +5,7 @@ from .sequential_state import SequentialState
 class SelectorState(SequentialState):
 
     def execute(self, board: Board) -> StateStatus:
+        board = self._get_scope(board, self)
         flow_val = self.flow_in
         # execute each children one by one in order until one success.
         for child in self._children:
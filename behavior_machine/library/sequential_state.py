@@ -1,5 +1,5 @@
 import threading
-from ..core import StateStatus, State, NestedState, Board
+from ..core import StateStatus, State, NestedState, Board, get_clock
 import typing
 
 
@@ -9,8 +9,20 @@ class SequentialState(NestedState):
     _curr_child: State
     _lock: threading.RLock
 
-    def __init__(self, name, children: typing.List[State] = None):
-        super(SequentialState, self).__init__(name)
+    def __init__(self, name, children: typing.List[State] = None, scoped: bool = False):
+        """Constructor for SequentialState
+
+        Parameters
+        ----------
+        name : str
+            Name of the state.
+        children : typing.List[State], optional
+            States to run one after another, by default None
+        scoped : bool, optional
+            Whether the children share a scope of the board, see `Board.scope`. Values they set and do not promote
+            are dropped once this state finishes, by default False
+        """
+        super(SequentialState, self).__init__(name, scoped)
         self._children = [] if children is None else children
         self._curr_child = None
         self._lock = threading.RLock()
@@ -26,6 +38,7 @@ class SequentialState(NestedState):
         return super().pre_execute()
 
     def execute(self, board: Board) -> StateStatus:
+        board = self._get_scope(board, self)
         flow_val = self.flow_in
         # execute each children one by one in order
         for child in self._children:
@@ -50,17 +63,27 @@ class SequentialState(NestedState):
             self.flow_out = flow_val
         return StateStatus.SUCCESS
 
+    def _get_children(self) -> typing.List[State]:
+        return list(self._children)
+
+    def _get_active_children(self) -> typing.List[State]:
+        curr_child = self._curr_child
+        return [] if curr_child is None else [curr_child]
+
     def interrupt(self, timeout=None):
-        self._interupted_event.set()
+        # the timeout covers the whole interrupt, the child only gets what is left of it.
+        clock = get_clock()
+        deadline = clock.deadline(timeout)
+        self.signal_interrupt()
         with self._lock:
             try:
-                self._curr_child.interrupt(timeout=timeout)
+                self._curr_child.interrupt(timeout=clock.remaining(deadline))
             except (AttributeError):
                 # Attribution error happens if child node is empty
                 # Possible race condition at the beginning where interupt gets call before we start initializing
                 pass
         # now we call the parent function to clear the running thread
-        return super().interrupt(timeout)
+        return super().interrupt(clock.remaining(deadline))
 
     def tick(self, board):
         next_state = super().tick(board)
@@ -69,7 +92,7 @@ class SequentialState(NestedState):
                 # TODO: Reexamine if this will be a problem.
                 # There might be a race condition where sequential state is tick() before the actual execution.
                 if self._curr_child is not None:
-                    self._curr_child.tick(board)
+                    self._curr_child.tick(self._find_scope(board, self))
         return next_state
 
     def get_debug_info(self) -> typing.Dict[str, typing.Any]:
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+
+from behavior_machine.core import AsyncState, AsyncMachine, Machine, State, StateStatus, Board
+from behavior_machine.library import SequentialState, ParallelState, IdleState
+
+
+class AsyncSleepState(AsyncState):
+
+    def __init__(self, name, duration):
+        super().__init__(name)
+        self._duration = duration
+
+    async def execute(self, board):
+        await asyncio.sleep(self._duration)
+        self.flow_out = self._duration
+        return StateStatus.SUCCESS
+
+
+def test_async_state_start_wait():
+    s = AsyncSleepState("s", 0.1)
+    s.start(None)
+    assert s.check_status(StateStatus.RUNNING)
+    assert s.is_executing()
+    assert s.wait(1)
+    assert s.check_status(StateStatus.SUCCESS)
+    assert s.flow_out == 0.1
+
+
+def test_async_state_interrupt_cancel():
+    s = AsyncSleepState("s", 10)
+    start_time = time.time()
+    s.start(None)
+    assert s.interrupt(timeout=1)
+    assert time.time() - start_time < 0.5
+    assert s.check_status(StateStatus.INTERRUPTED)
+    assert s.is_interrupted()
+
+
+def test_async_state_interrupt_waits_for_cleanup():
+
+    class CleanupState(AsyncState):
+        cleaned = False
+
+        async def execute(self, board):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                await asyncio.sleep(0.2)
+                self.cleaned = True
+
+    s = CleanupState("s")
+    s.start(None)
+    time.sleep(0.05)
+    # the interrupt only returns once the coroutine is done with its cleanup.
+    assert s.interrupt(timeout=1)
+    assert s.cleaned
+    assert not s.is_executing()
+    assert s.check_status(StateStatus.INTERRUPTED)
+
+
+def test_async_state_exception():
+
+    class RaiseState(AsyncState):
+        async def execute(self, board):
+            raise IndexError("error text")
+
+    s = RaiseState("s")
+    s.start(None)
+    s.wait()
+    assert s.check_status(StateStatus.EXCEPTION)
+    assert str(s._internal_exception) == "error text"
+
+
+def test_async_state_in_sequential():
+    s1 = AsyncSleepState("s1", 0.1)
+    s2 = AsyncSleepState("s2", 0.2)
+    seq = SequentialState("seq", [s1, s2])
+    seq.start(None)
+    assert seq.wait(2)
+    assert seq.check_status(StateStatus.SUCCESS)
+    assert seq.flow_out == 0.2
+
+
+def test_async_states_in_parallel_no_threads():
+    children = [AsyncSleepState(f"s{i}", 0.5) for i in range(0, 1000)]
+    pp = ParallelState("pp", children)
+    es = IdleState("es")
+    pp.add_transition_on_success(es)
+    exe = Machine("exe", pp, end_state_ids=["es"], rate=20)
+    start_time = time.time()
+    exe.start(None)
+    time.sleep(0.25)
+    # the children are tasks on a single loop instead of a thread each.
+    assert threading.active_count() < 50
+    assert exe.wait(5)
+    assert time.time() - start_time < 2
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert all(c.check_status(StateStatus.SUCCESS) for c in children)
+
+
+def test_async_machine_run():
+    s1 = AsyncSleepState("s1", 0.05)
+    s2 = AsyncSleepState("s2", 0.05)
+    s1.add_transition_on_success(s2)
+    exe = AsyncMachine("exe", s1, end_state_ids=["s2"], rate=50)
+    exe.run()
+    assert exe.is_end()
+    assert exe.check_status(StateStatus.SUCCESS)
+
+
+def test_async_machine_with_thread_state():
+
+    class ThreadState(State):
+        def execute(self, board):
+            board.set("thread", threading.current_thread().name)
+            return StateStatus.SUCCESS
+
+    s1 = AsyncSleepState("s1", 0.05)
+    s2 = ThreadState("s2")
+    s1.add_transition_on_success(s2)
+    exe = AsyncMachine("exe", s1, end_state_ids=["s2"], rate=50)
+    b = Board()
+    exe.run(b)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert b.get("thread") == "s2"
+
+
+def test_async_machine_interrupt():
+    s1 = AsyncSleepState("s1", 10)
+    exe = AsyncMachine("exe", s1, rate=10)
+    exe.start(None)
+    time.sleep(0.2)
+    start_time = time.time()
+    assert exe.interrupt(timeout=1)
+    assert time.time() - start_time < 0.5
+    assert exe.check_status(StateStatus.INTERRUPTED)
+    assert s1.check_status(StateStatus.INTERRUPTED)
+
+
+def test_async_machine_run_async():
+    s1 = AsyncSleepState("s1", 0.05)
+    exe = AsyncMachine("exe", s1, end_state_ids=["s1"], rate=50)
+    loop = asyncio.new_event_loop()
+    try:
+        status = loop.run_until_complete(exe.run_async())
+    finally:
+        loop.close()
+    assert status == StateStatus.SUCCESS
+    assert exe.is_end()
+    assert not exe.is_executing()
+
+
+def test_async_machine_run_async_interrupt():
+    s1 = AsyncSleepState("s1", 10)
+    exe = AsyncMachine("exe", s1, end_state_ids=["s1"], rate=50)
+    timer = threading.Timer(0.1, exe.interrupt)
+    loop = asyncio.new_event_loop()
+    try:
+        timer.start()
+        status = loop.run_until_complete(exe.run_async())
+    finally:
+        timer.join()
+        loop.close()
+    # the status is final once the coroutine returns.
+    assert status == StateStatus.INTERRUPTED
+    assert exe.check_status(StateStatus.INTERRUPTED)
+    assert not exe.is_executing()
+
+
+def test_async_machine_scoped():
+
+    class ScratchState(AsyncState):
+        async def execute(self, board):
+            board.set('scratch', self._name)
+            return StateStatus.SUCCESS
+
+    board = Board()
+    s1 = ScratchState("s1")
+    exe = AsyncMachine("exe", s1, end_state_ids=["s1"], rate=50, scoped=True)
+    exe.run(board)
+    assert exe.check_status(StateStatus.SUCCESS)
+    # the scope of the machine was dropped with it.
+    assert not board.exist('scratch')
+    assert exe._scopes == {}
+
+
+def test_async_machine_event_driven():
+    s1 = AsyncSleepState("s1", 0.05)
+    s2 = AsyncSleepState("s2", 0.05)
+    s1.add_transition_on_success(s2)
+    exe = AsyncMachine("exe", s1, end_state_ids=["s2"], rate=1, event_driven=True)
+    start_time = time.time()
+    exe.run(Board())
+    assert time.time() - start_time < 0.5
+    assert exe.check_status(StateStatus.SUCCESS)
@@ -1,7 +1,11 @@
 from behavior_machine.library import WaitState, IdleState
+import threading
+import time
+import typing
+
 import pytest
 
-from behavior_machine.core import Board
+from behavior_machine.core import Board, SimulatedClock, set_clock
 from behavior_machine.core import State, StateStatus, Machine
 
 
@@ -197,3 +201,456 @@ def test_load_dictionary():
     b.load(check_dict_2)
     assert b.get('k2') == 1000
 
+
+def test_immutable_values_not_copied():
+    b = Board()
+    value = ((1.0, 2.0), (3.0, 4.0))
+    b.set('points', value)
+    # nothing in the value can change, so it is shared.
+    assert b.get('points') is value
+    nested = ((1.0, 2.0), [3.0, 4.0])
+    b.set('nested', nested)
+    assert b.get('nested') == nested
+    assert b.get('nested')[1] is not b.get('nested')[1]
+
+
+def test_copy_on_write_frozen_dataclass():
+    # dataclasses only exist from python 3.7.
+    dataclasses = pytest.importorskip("dataclasses")
+
+    @dataclasses.dataclass(frozen=True)
+    class FrozenPoints:
+        frame: str
+        points: typing.Tuple[typing.Tuple[float, float], ...]
+
+    @dataclasses.dataclass(frozen=True)
+    class FrozenHolder:
+        items: list
+
+    b = Board(copy_on_write=True)
+    value = FrozenPoints('map', ((1.0, 2.0), (3.0, 4.0)))
+    b.set('cloud', value)
+    assert b.get('cloud') is b.get('cloud')
+    assert b.get('cloud') == value
+    # frozen dataclasses holding mutable values are still copied.
+    b.set('holder', FrozenHolder([1, 2]))
+    b.get('holder').items.append(3)
+    assert b.get('holder').items == [1, 2]
+    # so are mutable values.
+    b.set('list', [1, 2])
+    b.get('list').append(3)
+    assert b.get('list') == [1, 2]
+    # replacing a shared value with a mutable one copies it again.
+    b.set('cloud', {'frame': 'map'})
+    b.get('cloud')['frame'] = 'odom'
+    assert b.get('cloud') == {'frame': 'map'}
+
+
+def test_copy_on_write_numpy_array():
+    np = pytest.importorskip("numpy")
+    b = Board(copy_on_write=True)
+    array = np.zeros((100, 3))
+    b.set('cloud', array)
+    # the caller's array is copied once and stays writeable.
+    array[0, 0] = 1
+    assert array.flags.writeable
+    shared = b.get('cloud')
+    assert shared is b.get('cloud')
+    assert shared[0, 0] == 0
+    assert not shared.flags.writeable
+    with pytest.raises(ValueError):
+        shared[0, 0] = 1
+    # to change it, a state copies the array and sets it again.
+    changed = shared.copy()
+    changed[0, 0] = 2
+    b.set('cloud', changed)
+    assert b.get('cloud')[0, 0] == 2
+    # without copy on write, arrays are copied on every get.
+    b = Board()
+    b.set('cloud', array)
+    assert b.get('cloud') is not b.get('cloud')
+    assert b.get('cloud').flags.writeable
+
+
+def test_lock_statistics():
+    b = Board(num_stripes=1)
+    b.set('x', 1)
+    b.set('y', 2)
+    stats = b.get_lock_statistics()
+    assert stats['x'] == {'acquisitions': 1, 'contentions': 0, 'wait_time': 0.0}
+    # hold the only stripe, so the next writer has to wait for it.
+    b._stripes[0].acquire()
+    writer = threading.Thread(target=b.set, args=('y', 3))
+    writer.start()
+    time.sleep(0.1)
+    # reads do not wait for the writers.
+    assert b.get('y') == 2
+    b._stripes[0].release()
+    writer.join()
+    assert b.get('y') == 3
+    stats = b.get_lock_statistics()
+    assert stats['y']['acquisitions'] == 2
+    assert stats['y']['contentions'] == 1
+    assert stats['y']['wait_time'] >= 0.05
+    assert stats['x']['contentions'] == 0
+
+
+def test_concurrent_get_set():
+    b = Board()
+    b.set('config', {'values': list(range(0, 10))})
+    errors = []
+
+    def write():
+        for i in range(0, 200):
+            b.set('config', {'values': list(range(i, i + 10))})
+
+    def read():
+        for _ in range(0, 200):
+            values = b.get('config')['values']
+            # a reader always sees a complete value, and its own copy.
+            if values != list(range(values[0], values[0] + 10)):
+                errors.append(values)
+            values.append(-1)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(0, 4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert b.get('config')['values'] == list(range(199, 209))
+
+
+def test_versions_and_subscribe():
+    b = Board()
+    changes = []
+    assert b.get_version('x') == 0
+    b.subscribe('x', changes.append)
+    b.set('x', 1)
+    b.set('y', 1)
+    b.set('x', 2)
+    assert b.get_version('x') == 2
+    assert b.get_version('y') == 1
+    assert changes == ['x', 'x']
+    b.unsubscribe('x', changes.append)
+    b.set('x', 3)
+    assert changes == ['x', 'x']
+    assert b.get_version('x') == 3
+
+
+def test_wait_for():
+    b = Board()
+    b.set('count', 0)
+
+    def count_up():
+        for i in range(1, 6):
+            time.sleep(0.02)
+            b.set('count', i)
+
+    writer = threading.Thread(target=count_up)
+    writer.start()
+    assert b.wait_for('count', lambda x: x >= 3, timeout=5)
+    assert b.get('count') >= 3
+    writer.join()
+    # the value already matches.
+    assert b.wait_for('count', lambda x: x == 5, timeout=0)
+    assert not b.wait_for('count', lambda x: x > 5, timeout=0.05)
+    assert not b.wait_for('missing', timeout=0.05)
+    # all the subscriptions made by wait_for were removed.
+    assert b._subscribers == {}
+
+
+def test_get_set_many():
+    b = Board()
+    shared = [1, 2]
+    b.set_many({'a': shared, 'b': {'inner': shared}, 'c': 3})
+    shared.append(3)
+    assert b.get_version('a') == 1
+    values = b.get_many(['a', 'b', 'c', 'missing'])
+    assert values == {'a': [1, 2], 'b': {'inner': [1, 2]}, 'c': 3, 'missing': None}
+    # objects shared between the values stay shared, in the board and in the copies.
+    assert values['a'] is values['b']['inner']
+    assert b.get('a', deep_copy=False) is b.get('b', deep_copy=False)['inner']
+    values['a'].append(4)
+    assert b.get('a') == [1, 2]
+    # load copies in a single pass as well.
+    b.load({'x': shared, 'y': [shared]})
+    assert b.get('x', deep_copy=False) is b.get('y', deep_copy=False)[0]
+
+
+def test_snapshot():
+    b = Board()
+    b.set_many({'x': 0, 'y': 0})
+    errors = []
+
+    def write():
+        for i in range(1, 300):
+            b.set_many({'x': i, 'y': i})
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while writer.is_alive():
+        values = b.snapshot(['x', 'y'])
+        # both keys are always from the same set_many.
+        if values['x'] != values['y']:
+            errors.append(values)
+    writer.join()
+    assert errors == []
+    assert b.snapshot() == {'x': 299, 'y': 299}
+    assert b.snapshot(['x', 'z']) == {'x': 299, 'z': None}
+
+
+def test_scope():
+    b = Board()
+    b.set('config', 1)
+    b.set('shared', 'parent')
+    scope = b.scope('child')
+    assert scope.get_parent() is b
+    assert scope.get_scope_name() == 'child'
+    assert scope.scope('inner').get_scope_name() == 'child.inner'
+    # reads fall through to the parent, writes stay in the scope.
+    assert scope.get('config') == 1
+    assert scope.exist('config')
+    scope.set('shared', 'child')
+    scope.set('result', 42)
+    assert scope.get('shared') == 'child'
+    assert b.get('shared') == 'parent'
+    assert not b.exist('result')
+    assert scope.get_many(['config', 'result']) == {'config': 1, 'result': 42}
+    assert scope.snapshot() == {'config': 1, 'shared': 'child', 'result': 42}
+    # the version of a scope changes when either the scope or the parent sets the key.
+    version = scope.get_version('config')
+    b.set('config', 2)
+    assert scope.get_version('config') > version
+    assert scope.get('config') == 2
+    # promoted values move to the parent.
+    scope.promote(['result'])
+    assert b.get('result') == 42
+    b.set('result', 0)
+    assert scope.get('result') == 0
+    # the values that were not promoted are dropped with the scope.
+    scope.release()
+    assert scope.get('shared') == 'parent'
+    assert scope.snapshot() == b.snapshot()
+    with pytest.raises(ValueError):
+        b.promote()
+
+
+def test_scope_release_versions():
+    b = Board()
+    scope = b.scope('child')
+    scope.set('key', 1)
+    scope.set('key', 2)
+    version = scope.get_version('key')
+    scope.release()
+    # setting a released key again gives it a version it never had, so watchers of the key see the change.
+    scope.set('key', 3)
+    assert scope.get_version('key') > version
+
+
+def test_scope_listeners_and_wait_for():
+    b = Board()
+    calls = []
+    scope = b.scope('child')
+    scope.add_listener(lambda: calls.append(1))
+    # listeners are shared with the parent board.
+    b.set('x', 1)
+    scope.set('y', 1)
+    assert len(calls) == 2
+
+    def set_later():
+        time.sleep(0.05)
+        b.set('ready', True)
+
+    writer = threading.Thread(target=set_later)
+    writer.start()
+    # a scope sees the changes of its parent.
+    assert scope.wait_for('ready', timeout=5)
+    writer.join()
+
+
+def test_history():
+    clock = SimulatedClock()
+    set_clock(clock)
+    try:
+        b = Board()
+        b.enable_history('reading', 3)
+        with pytest.raises(KeyError):
+            b.get_history('other')
+        assert b.get_history('reading') == []
+        for i in range(0, 5):
+            b.set('reading', {'value': i})
+            clock.advance(1)
+        # only the last values are kept, oldest first.
+        assert b.get_history('reading') == [{'value': 2}, {'value': 3}, {'value': 4}]
+        assert b.get_history('reading', 2) == [{'value': 3}, {'value': 4}]
+        assert b.get_history('reading', 0) == []
+        assert b.get_since('reading', 3, with_times=True) == ([3, 4], [{'value': 3}, {'value': 4}])
+        assert b.get('reading') == {'value': 4}
+        # the values are copied unless asked otherwise.
+        b.get_history('reading')[-1]['value'] = -1
+        assert b.get_history('reading', 1, deep_copy=False)[0]['value'] == 4
+        # a scope reads the history of its parent, which is emptied on release.
+        scope = b.scope('child')
+        assert scope.get_history('reading', 1) == [{'value': 4}]
+        b.release()
+        assert scope.get_history('reading') == []
+        b.disable_history('reading')
+        with pytest.raises(KeyError):
+            b.get_history('reading')
+        with pytest.raises(ValueError):
+            b.enable_history('reading', 0)
+    finally:
+        set_clock(None)
+
+
+def test_numeric_history():
+    np = pytest.importorskip("numpy")
+    b = Board()
+    b.enable_history('pose', 4, dtype=np.float64, shape=(2,))
+    for i in range(0, 6):
+        b.set('pose', (i, -i))
+    window = b.get_history('pose', 3)
+    assert window.shape == (3, 2)
+    assert (window[:, 0] == [3, 4, 5]).all()
+    assert not window.flags.writeable
+    # the window is a view of the buffer, it is not copied.
+    assert not window.flags.owndata
+    times, values = b.get_since('pose', 0.0, with_times=True)
+    assert len(times) == len(values) == 4
+    assert (np.diff(times) >= 0).all()
+    # a value that does not fit the history is not set.
+    with pytest.raises(ValueError):
+        b.set('pose', (1, 2, 3))
+    assert b.get('pose') == (5, -5)
+
+
+def test_ttl_and_delete():
+    clock = SimulatedClock()
+    set_clock(clock)
+    try:
+        b = Board()
+        b.set('short', 1, ttl=1)
+        b.set_many({'long': 2, 'other': 3}, ttl=10)
+        b.set('forever', 4)
+        clock.advance(0.5)
+        assert b.get('short') == 1
+        clock.advance(0.5)
+        # expired values are removed when they are read.
+        assert not b.exist('short')
+        assert b.get('short') is None
+        assert b.snapshot() == {'long': 2, 'other': 3, 'forever': 4}
+        clock.advance(10)
+        assert b.snapshot(['long', 'forever']) == {'long': None, 'forever': 4}
+        assert b.sweep() == 2
+        assert b.get_eviction_statistics()['expired'] == 3
+        assert sorted(b.get_lock_statistics()) == ['forever']
+        # setting again without a ttl keeps the value.
+        b.set('short', 5, ttl=1)
+        b.set('short', 6)
+        clock.advance(2)
+        assert b.sweep() == 0
+        assert b.get('short') == 6
+        # the version of a deleted key never goes back to a value it had.
+        version = b.get_version('short')
+        b.delete('short')
+        assert b.get_version('short') == 0
+        b.set('short', 7)
+        assert b.get_version('short') > version
+        b.delete('missing')
+    finally:
+        set_clock(None)
+
+
+def test_sweeper():
+    b = Board(sweep_interval=0.01)
+    b.set('x', 1, ttl=0.01)
+    start_time = time.monotonic()
+    while b.get_eviction_statistics()['entries'] > 0 and time.monotonic() - start_time < 5:
+        time.sleep(0.01)
+    # removed by the sweeper without being read.
+    assert b.get_eviction_statistics()['expired'] == 1
+
+
+def test_max_entries_lru():
+    b = Board(max_entries=3)
+    for key in ['a', 'b', 'c']:
+        b.set(key, key)
+    b.get('a')
+    b.set('d', 'd')
+    # b is the least recently used.
+    assert not b.exist('b')
+    assert all(b.exist(key) for key in ['a', 'c', 'd'])
+    statistics = b.get_eviction_statistics()
+    assert statistics['entries'] == 3
+    assert statistics['evicted'] == 1
+    # the lock statistics of evicted keys are dropped as well.
+    for i in range(0, 1000):
+        b.set(f'key{i}', i)
+    assert b.get_eviction_statistics()['entries'] == 3
+    assert len(b.get_lock_statistics()) == 3
+    with pytest.raises(ValueError):
+        Board(eviction='random')
+
+
+def test_max_entries_lfu():
+    b = Board(max_entries=3, eviction='lfu')
+    for key in ['a', 'b', 'c']:
+        b.set(key, key)
+    for _ in range(0, 3):
+        b.get('a')
+        b.get('c')
+    b.get('b')
+    b.set('d', 'd')
+    assert not b.exist('b')
+    assert b.get_eviction_statistics()['evicted'] == 1
+
+
+def test_max_bytes():
+    b = Board(max_bytes=20000)
+    for i in range(0, 20):
+        b.set(f'iteration_{i}', list(range(0, 100)))
+    statistics = b.get_eviction_statistics()
+    assert 0 < statistics['bytes'] <= 20000
+    assert statistics['evicted'] > 0
+    assert statistics['evicted_bytes'] > 0
+    assert statistics['entries'] + statistics['evicted'] == 20
+    # the oldest iterations were evicted.
+    assert b.exist('iteration_19')
+    assert not b.exist('iteration_0')
+
+
+def test_key_statistics():
+    b = Board(instrumented=True)
+    b.set('large', list(range(0, 1000)))
+    b.set('small', [1])
+    b.set('scalar', 1)
+    for _ in range(0, 3):
+        b.get('large')
+    b.get('scalar')
+    b.get_many(['small', 'missing'])
+    report = b.get_key_statistics()
+    assert [item['key'] for item in report] == ['large', 'small', 'scalar']
+    large = report[0]
+    assert large['size'] > 1000 * 8
+    assert large['reads'] == 3
+    assert large['writes'] == 1
+    assert large['copy_out_time'] > 0
+    assert large['copy_time'] == large['copy_in_time'] + large['copy_out_time']
+    # immutable values are not copied.
+    assert report[2]['copy_out_time'] == 0
+    assert b.get_key_statistics('reads')[0]['key'] == 'large'
+    assert b.get_eviction_statistics()['bytes'] == sum(item['size'] for item in report)
+    b.delete('large')
+    assert b.get_key_statistics()[-1] == dict(large, size=0)
+    with pytest.raises(ValueError):
+        b.get_key_statistics('name')
+    assert Board().get_key_statistics() == []
+
+
+def test_key_statistics_numpy():
+    np = pytest.importorskip("numpy")
+    b = Board(instrumented=True)
+    b.set('cloud', np.zeros((1000, 3)))
+    # the size of arrays is their number of bytes.
+    assert b.get_key_statistics()[0]['size'] >= 1000 * 3 * 8
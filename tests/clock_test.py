@@ -0,0 +1,160 @@
+import time
+
+import pytest
+
+from behavior_machine.core import Machine, MachineGroup, State, StateStatus, Board
+from behavior_machine.core import SimulatedClock, RealClock, get_clock, set_clock
+from behavior_machine.library import WaitState, IdleState, SequentialState, ParallelState
+
+
+class DummyState(State):
+    def execute(self, board):
+        return StateStatus.SUCCESS
+
+
+def test_default_clock_is_real():
+    assert isinstance(get_clock(), RealClock)
+
+
+def test_wait_state_simulated(clock):
+    w = WaitState("w", 60)
+    e = IdleState("e")
+    w.add_transition_on_success(e)
+    exe = Machine("m", w, end_state_ids=["e"], rate=1)
+    start_time = time.perf_counter()
+    exe.run()
+    assert time.perf_counter() - start_time < 1
+    assert exe.check_status(StateStatus.SUCCESS)
+    # the wait state finishes at 60s and the machine moves on in the tick at the same time.
+    assert clock.time() == 60
+    assert exe.get_tick_statistics()['ticks'] == 61
+
+
+def test_nested_states_simulated(clock):
+    seq = SequentialState("seq", [WaitState("w1", 30), WaitState("w2", 300)])
+    par = ParallelState("par", [WaitState("w3", 20), WaitState("w4", 600)])
+    e = IdleState("e")
+    seq.add_transition_on_success(par)
+    par.add_transition_on_success(e)
+    exe = Machine("m", seq, end_state_ids=["e"], rate=10)
+    start_time = time.perf_counter()
+    exe.run()
+    assert time.perf_counter() - start_time < 5
+    assert exe.check_status(StateStatus.SUCCESS)
+    # the parallel state finishes in the tick at 930s, the machine sees it on the next one.
+    assert clock.time() == pytest.approx(930.1)
+
+
+def test_transition_after_elapsed_simulated(clock):
+    s1 = IdleState("s1")
+    s2 = DummyState("s2")
+    s1.add_transition_after_elapsed(s2, 5)
+    exe = Machine("m", s1, end_state_ids=["s2"], rate=2)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    # the transition is taken on the first tick after 5s.
+    assert clock.time() == 5.5
+    assert s1._state_last_start_time == 0
+
+
+def test_simulated_run_is_repeatable():
+
+    def run_once():
+        clock = SimulatedClock()
+        set_clock(clock)
+        trace = []
+        try:
+            seq = SequentialState("seq", [WaitState("w1", 2.5), WaitState("w2", 1)])
+            e = IdleState("e")
+            seq.add_transition_on_success(e)
+            exe = Machine("m", seq, end_state_ids=["e"], rate=4, debug=True,
+                          debug_cb=lambda info, parsed: trace.append((clock.time(), tuple(parsed))))
+            exe.run()
+        finally:
+            set_clock(None)
+        return trace
+
+    first = run_once()
+    assert first[-1][0] == 3.5
+    for _ in range(0, 5):
+        assert run_once() == first
+
+
+def test_sleep_from_outside(clock):
+    w = WaitState("w", 10)
+    e = IdleState("e")
+    w.add_transition_on_success(e)
+    exe = Machine("m", w, end_state_ids=["e"], rate=1)
+    with clock.drive():
+        exe.start(Board())
+        clock.sleep(4.5)
+        # nothing runs while this thread does not wait on the clock.
+        assert clock.time() == 4.5
+        assert w.is_executing()
+        assert exe.wait(60)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert clock.time() == 10
+
+
+def test_interrupt_simulated(clock):
+    w = WaitState("w", 1000)
+    exe = Machine("m", w, rate=1)
+    with clock.drive():
+        exe.start(Board())
+        clock.sleep(3)
+        assert exe.interrupt()
+    assert exe.check_status(StateStatus.INTERRUPTED)
+    assert w.check_status(StateStatus.INTERRUPTED)
+    assert clock.time() == 3
+
+
+def test_machine_group_simulated(clock):
+    group = MachineGroup(num_threads=2)
+    slow = Machine("slow", IdleState("s"), rate=1)
+    fast = Machine("fast", IdleState("s"), rate=8)
+    with clock.drive():
+        group.start()
+        group.add(slow)
+        group.add(fast)
+        clock.sleep(10)
+        assert group.stop()
+    # this thread wakes up first at 10s, so the machines ticked from 0s until just before 10s.
+    assert slow.get_tick_statistics()['ticks'] == 10
+    assert fast.get_tick_statistics()['ticks'] == 80
+
+
+class SlowStopState(State):
+    # takes one second to stop once interrupted.
+    def execute(self, board):
+        clock = get_clock()
+        clock.wait(self._interupted_event)
+        clock.sleep(1)
+        return StateStatus.INTERRUPTED
+
+
+def test_interrupt_shares_timeout(clock):
+    inner = SequentialState("inner", [SlowStopState("c")])
+    par = ParallelState("par", [SlowStopState("a"), SlowStopState("b"), inner])
+    seq = SequentialState("seq", [par])
+    exe = Machine("m", seq, rate=1)
+    with clock.drive():
+        exe.start(Board())
+        clock.sleep(5)
+        # every level waits on the same deadline, instead of the timeout at each level.
+        assert not exe.interrupt(0.2)
+        assert clock.time() == pytest.approx(5.2)
+        assert exe.interrupt()
+    # the whole tree was signalled at once, so it stopped one second after the first interrupt.
+    assert clock.time() == 6
+    assert exe.check_status(StateStatus.INTERRUPTED)
+    stats = exe.get_interrupt_statistics()
+    assert stats['name'] == 'm'
+    # the tick loop of the machine stops right away, the sequential state waits for its child.
+    assert stats['latency'] == 0
+    seq_stats = stats['children'][0]
+    assert seq_stats['name'] == 'seq'
+    assert seq_stats['latency'] == 1
+    par_stats = seq_stats['children'][0]
+    assert [child['name'] for child in par_stats['children']] == ['a', 'b', 'inner']
+    assert [child['latency'] for child in par_stats['children']] == [1, 1, 1]
+    assert par_stats['children'][2]['children'] == [{'name': 'c', 'type': 'SlowStopState', 'latency': 1}]
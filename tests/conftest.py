@@ -0,0 +1,12 @@
+import pytest
+
+from behavior_machine.core import SimulatedClock, set_clock
+
+
+@pytest.fixture
+def clock():
+    # a simulated clock for the duration of the test.
+    clock = SimulatedClock()
+    set_clock(clock)
+    yield clock
+    set_clock(None)
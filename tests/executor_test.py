@@ -0,0 +1,103 @@
+import threading
+import time
+
+from behavior_machine.core import Board, State, StateStatus, Machine
+from behavior_machine.core import PooledExecutor, ThreadExecutor, get_default_executor, set_default_executor
+
+
+class DummyState(State):
+    def execute(self, board):
+        return StateStatus.SUCCESS
+
+
+def test_default_executor_is_pooled():
+    assert isinstance(get_default_executor(), PooledExecutor)
+
+
+def test_pooled_executor_reuse_worker():
+    executor = PooledExecutor()
+    s = DummyState("s")
+    s.set_executor(executor)
+    for _ in range(0, 20):
+        s.start(None)
+        assert s.wait(1)
+        assert s.check_status(StateStatus.SUCCESS)
+        assert not s.is_executing()
+    assert executor.num_created() == 1
+
+
+def test_pooled_executor_never_queue():
+    # nested states block on their children, so every submission must start immediately.
+    executor = PooledExecutor(max_idle=1)
+    barrier = threading.Barrier(5)
+
+    class BarrierState(State):
+        def execute(self, board):
+            barrier.wait(1)
+            return StateStatus.SUCCESS
+
+    states = [BarrierState(f"b{i}") for i in range(0, 5)]
+    for s in states:
+        s.set_executor(executor)
+        s.start(None)
+    for s in states:
+        assert s.wait(2)
+        assert s.check_status(StateStatus.SUCCESS)
+    # only one idle worker should be kept.
+    time.sleep(0.1)
+    assert executor.num_workers() == 1
+
+
+def test_pooled_executor_idle_timeout():
+    executor = PooledExecutor(idle_timeout=0.2)
+    s = DummyState("s")
+    s.set_executor(executor)
+    s.start(None)
+    s.wait()
+    time.sleep(0.5)
+    assert executor.num_workers() == 0
+    # starting again creates a new worker
+    s.start(None)
+    assert s.wait(1)
+    assert executor.num_created() == 2
+
+
+def test_thread_name_during_execution():
+
+    class NameState(State):
+        def execute(self, board):
+            self.flow_out = threading.current_thread().name
+            return StateStatus.SUCCESS
+
+    s = NameState("named")
+    s.start(None)
+    s.wait()
+    assert s.flow_out == "named"
+
+
+def test_join_from_inside_raise():
+
+    class JoinSelfState(State):
+        def execute(self, board):
+            self._run_thread.join()
+
+    s = JoinSelfState("s")
+    s.start(None)
+    assert s.wait(1)
+    assert s.check_status(StateStatus.EXCEPTION)
+    assert isinstance(s._internal_exception, RuntimeError)
+
+
+def test_machine_with_thread_executor():
+    previous = get_default_executor()
+    set_default_executor(ThreadExecutor())
+    try:
+        s1 = DummyState("s1")
+        s2 = DummyState("s2")
+        s1.add_transition_on_complete(s2)
+        exe = Machine("xe", s1, end_state_ids=["s2"], rate=100)
+        exe.run()
+        assert exe.is_end()
+        assert exe.check_status(StateStatus.SUCCESS)
+    finally:
+        set_default_executor(previous)
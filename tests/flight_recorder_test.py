@@ -0,0 +1,144 @@
+import time
+
+import pytest
+
+from behavior_machine.core import Machine, State, StateStatus, FlightRecorder, load_flight_record
+from behavior_machine.library import WaitState, IdleState, SequentialState
+
+
+def test_flight_recorder_timeline(tmp_path):
+    seq = SequentialState("seq", [WaitState("w1", 0.02), WaitState("w2", 0.02)])
+    end = IdleState("end")
+    seq.add_transition_on_success(end)
+    exe = Machine("m", seq, end_state_ids=["end"], rate=100)
+    recorder = FlightRecorder()
+    recorder.attach(exe)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    timeline = recorder.get_timeline()
+    assert [event['sequence'] for event in timeline] == list(range(len(timeline)))
+    assert all(a['time'] <= b['time'] for a, b in zip(timeline, timeline[1:]))
+    statuses = [(event['state'], event['status']) for event in timeline if event['kind'] == 'status']
+    assert statuses.index(('m/seq/w1', 'SUCCESS')) < statuses.index(('m/seq/w2', 'RUNNING'))
+    assert ('m/seq', 'SUCCESS') in statuses
+    assert statuses[-1] == ('m', 'SUCCESS')
+    transitions = [event for event in timeline if event['kind'] == 'transition']
+    assert [(event['state'], event['to']) for event in transitions] == [('m/seq', 'm/end')]
+    assert transitions[0]['type'] == 'SequentialState'
+    # the dump decodes to the same timeline.
+    file_path = tmp_path / "flight.bin"
+    recorder.dump(str(file_path))
+    assert load_flight_record(str(file_path)) == timeline
+
+
+def test_flight_recorder_wrap_around():
+    state = IdleState("s")
+    recorder = FlightRecorder(capacity=8)
+    recorder.attach(state)
+    for _ in range(10):
+        state._status = StateStatus.RUNNING
+        state._status = StateStatus.SUCCESS
+    timeline = recorder.get_timeline()
+    # only the last events are kept.
+    assert [event['sequence'] for event in timeline] == list(range(12, 20))
+    assert [event['status'] for event in timeline] == ['RUNNING', 'SUCCESS'] * 4
+
+
+def test_flight_recorder_dump_on_exception(tmp_path):
+    class RaiseState(State):
+        def execute(self, board):
+            raise ValueError("failed")
+
+    class CountingRecorder(FlightRecorder):
+        dumps = 0
+
+        def dump(self, file_path):
+            self.dumps += 1
+            super().dump(file_path)
+
+    file_path = tmp_path / "crash.bin"
+    raise_state = RaiseState("r")
+    exe = Machine("m", SequentialState("seq", [WaitState("w1", 0.01), raise_state]), rate=100)
+    recorder = CountingRecorder(dump_path=str(file_path))
+    recorder.attach(exe)
+    exe.run()
+    # the machine can finish before the thread of the failing state is done dumping.
+    assert raise_state.wait(1)
+    assert exe.check_status(StateStatus.EXCEPTION)
+    # the exception reaches the sequence and the machine as well, the failure is only dumped once.
+    assert recorder.dumps == 1
+    timeline = load_flight_record(str(file_path))
+    statuses = [(event['state'], event['status']) for event in timeline]
+    # the dump happens as soon as the failing state ends.
+    assert ('m/seq/w1', 'SUCCESS') in statuses
+    assert ('m/seq/r', 'EXCEPTION') in statuses
+
+
+def test_flight_recorder_dump_error(tmp_path, caplog):
+    class RaiseState(State):
+        def execute(self, board):
+            raise ValueError("failed")
+
+    raise_state = RaiseState("r")
+    exe = Machine("m", raise_state, rate=100)
+    recorder = FlightRecorder(dump_path=str(tmp_path / "missing" / "crash.bin"))
+    recorder.attach(exe)
+    exe.run()
+    assert raise_state.wait(1)
+    # the error of the dump is logged, the machine still reports the original exception.
+    assert exe.check_status(StateStatus.EXCEPTION)
+    assert isinstance(exe._internal_exception, ValueError)
+    assert any("could not be written" in record.getMessage() for record in caplog.records)
+
+
+def test_flight_recorder_invalid_file(tmp_path):
+    file_path = tmp_path / "invalid.bin"
+    file_path.write_bytes(b"not a flight record at all, just some bytes")
+    with pytest.raises(ValueError):
+        load_flight_record(str(file_path))
+
+
+def test_flight_recorder_overhead():
+    state = IdleState("s")
+    recorder = FlightRecorder(capacity=1024)
+    start = time.perf_counter()
+    for _ in range(10000):
+        recorder.on_status(state, StateStatus.RUNNING, 0.0)
+    elapsed = (time.perf_counter() - start) / 10000
+    # generous bound, recording is a handful of array writes.
+    assert elapsed < 50e-6
+
+
+class _RewritingColumn():
+    # column of a recorder that records another event while it is being copied, as another thread could.
+
+    def __init__(self, recorder, column, time):
+        self._recorder = recorder
+        self._column = column
+        self._time = time
+        self.typecode = column.typecode
+
+    def __setitem__(self, index, value):
+        self._column[index] = value
+
+    def __iter__(self):
+        if self._time is not None:
+            time, self._time = self._time, None
+            self._recorder._record(time, 0, 0, StateStatus.FAILED.value)
+        return iter(self._column)
+
+
+def test_flight_recorder_copy_while_recording(tmp_path):
+    recorder = FlightRecorder(capacity=2)
+    recorder._intern(IdleState("s"))
+    recorder._record(1.0, 0, 0, StateStatus.RUNNING.value)
+    recorder._record(2.0, 0, 0, StateStatus.SUCCESS.value)
+    # the event at 3.0 overwrites the first slot after its sequence number was copied.
+    recorder._times = _RewritingColumn(recorder, recorder._times, 3.0)
+    timeline = recorder.get_timeline()
+    # the slot is left out instead of mixing the two events.
+    assert [(event['sequence'], event['time'], event['status']) for event in timeline] == [(1, 2.0, 'SUCCESS')]
+    file_path = tmp_path / "flight.bin"
+    recorder._times = _RewritingColumn(recorder, recorder._times._column, 4.0)
+    recorder.dump(str(file_path))
+    assert [(event['sequence'], event['time']) for event in load_flight_record(str(file_path))] == [(2, 3.0)]
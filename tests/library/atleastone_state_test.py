@@ -105,3 +105,19 @@ def test_checking_too_fast():
     exe.run(None)
 
     assert one._status == StateStatus.SUCCESS
+
+
+def test_atleastone_max_concurrency():
+    ws1 = WaitState("ws1", 0.1)
+    ws2 = WaitState("ws2", 0.1)
+    ws3 = WaitState("ws3", 0.1)
+    one = AtLeastOneState("one", [ws1, ws2, ws3], max_concurrency=1)
+    es = IdleState("es")
+    one.add_transition_on_success(es)
+    exe = Machine("exe", one, ["es"], rate=50)
+    exe.run()
+    assert one.check_status(StateStatus.SUCCESS)
+    assert ws1.check_status(StateStatus.SUCCESS)
+    # the first success ends the state before the queued children start.
+    assert ws2.check_status(StateStatus.NOT_RUNNING)
+    assert ws3.check_status(StateStatus.NOT_RUNNING)
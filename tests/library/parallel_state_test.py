@@ -1,6 +1,6 @@
 import time
 
-from behavior_machine.core import State, Machine, StateStatus
+from behavior_machine.core import State, Machine, StateStatus, Board
 from behavior_machine.library import WaitState, ParallelState, IdleState
 
 
@@ -237,3 +237,88 @@ def test_parallel_debug_info():
     assert info['children'][1]['name'] == 'w2'
     assert info['children'][1]['status'] == StateStatus.RUNNING
     pm.interrupt()
+
+
+def test_parallel_max_concurrency():
+    import threading
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    class CountState(State):
+        def execute(self, board):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(0.2)
+            with lock:
+                running -= 1
+            return StateStatus.SUCCESS
+
+    children = [CountState(f"c{i}") for i in range(0, 6)]
+    pm = ParallelState("pm", children, max_concurrency=2)
+    es = IdleState("es")
+    pm.add_transition_on_success(es)
+    exe = Machine("exe", pm, ["es"], rate=50)
+    start_time = time.time()
+    exe.run()
+    assert time.time() - start_time >= 0.6
+    assert pm.check_status(StateStatus.SUCCESS)
+    assert max_running == 2
+    for child in children:
+        assert child.check_status(StateStatus.SUCCESS)
+    wait_times = pm.get_queue_wait_times()
+    assert len(wait_times) == 6
+    assert wait_times["c0"] < 0.05
+    assert wait_times["c1"] < 0.05
+    assert 0.15 < wait_times["c2"] < 0.4
+    assert 0.35 < wait_times["c5"] < 0.6
+
+
+def test_parallel_max_concurrency_failed(capsys):
+    ws1 = WaitState("ws1", 0.1)
+    fs = FailAfterSecState(0.1)
+    ws2 = WaitState("ws2", 0.1)
+    pm = ParallelState("pm", [ws1, fs, ws2], max_concurrency=1)
+    es = IdleState("es")
+    pm.add_transition_on_failed(es)
+    exe = Machine("exe", pm, ["es"], rate=50)
+    exe.run()
+    assert pm.check_status(StateStatus.FAILED)
+    assert ws1.check_status(StateStatus.SUCCESS)
+    assert fs.check_status(StateStatus.FAILED)
+    # the last child was still queued when the state failed.
+    assert ws2.check_status(StateStatus.NOT_RUNNING)
+    assert "ws2" not in pm.get_queue_wait_times()
+
+
+def test_parallel_scoped():
+
+    class ScratchState(State):
+        def execute(self, board):
+            # every child uses the same key without prefixing it.
+            board.set('scratch', self._name)
+            time.sleep(0.05)
+            if board.get('scratch') != self._name:
+                return StateStatus.FAILED
+            board.set(f'result_{self._name}', board.get('config'))
+            board.promote([f'result_{self._name}'])
+            return StateStatus.SUCCESS
+
+    board = Board()
+    board.set('config', 'value')
+    pm = ParallelState("pm", [ScratchState("a"), ScratchState("b"), ScratchState("c")], scoped=True)
+    end = IdleState("end")
+    pm.add_transition_on_success(end)
+    exe = Machine("m", pm, end_state_ids=["end"], rate=20, scoped=True)
+    exe.run(board)
+    assert exe.check_status(StateStatus.SUCCESS)
+    # the results were promoted to the scope of the machine, which was dropped with it.
+    assert board.snapshot() == {'config': 'value'}
+
+    exe = Machine("m", pm, end_state_ids=["end"], rate=20)
+    exe.run(board)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert board.get('result_a') == 'value'
+    assert not board.exist('scratch')
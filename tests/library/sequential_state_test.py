@@ -244,3 +244,28 @@ def test_sequence_state_flow():
     selector.start(None)
     selector.wait()
     assert selector.flow_out == "secondState"
+
+
+def test_scoped_sequential_state():
+
+    class WriteState(State):
+        def execute(self, board):
+            board.set('scratch', board.get('input') + 1)
+            return StateStatus.SUCCESS
+
+    class ReadState(State):
+        def execute(self, board):
+            board.set('result', board.get('scratch') * 2)
+            board.promote(['result'])
+            return StateStatus.SUCCESS
+
+    board = Board()
+    board.set('input', 1)
+    seq = SequentialState("seq", [WriteState("w"), ReadState("r")], scoped=True)
+    seq.start(board)
+    seq.wait()
+    assert seq.check_status(StateStatus.SUCCESS)
+    # only the promoted value is left in the board.
+    assert board.get('result') == 4
+    assert not board.exist('scratch')
+    assert seq._scopes == {}
@@ -1,4 +1,4 @@
-from behavior_machine.core import Board
+from behavior_machine.core import Board, SimulatedClock, set_clock
 from behavior_machine.library import GetBoardState, SetBoardState
 
 def test_set_board_state():
@@ -11,6 +11,22 @@ def test_set_board_state():
     assert b.get("test_key") == "hello"
     assert b.get("test_key")
 
+def test_set_board_state_ttl():
+
+    clock = SimulatedClock()
+    set_clock(clock)
+    try:
+        b = Board()
+        set_board = SetBoardState("set", "test_key", "hello", ttl=5)
+        set_board.start(b)
+        set_board.wait()
+        assert b.get("test_key") == "hello"
+        clock.advance(5)
+        assert b.get("test_key") is None
+    finally:
+        set_clock(None)
+
+
 def test_get_board_state():
 
     b = Board()
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from behavior_machine.core import MachineGroup, Machine, State, StateStatus, Board
+from behavior_machine.library import IdleState, WaitState
+
+
+class DummyState(State):
+    def execute(self, board):
+        return StateStatus.SUCCESS
+
+
+def test_group_runs_machines_to_end():
+    group = MachineGroup(num_threads=2)
+    machines = []
+    for i in range(0, 10):
+        s1 = DummyState("s1")
+        s2 = DummyState("s2")
+        s1.add_transition_on_success(s2)
+        machine = Machine(f"m{i}", s1, end_state_ids=["s2"], rate=50)
+        group.add(machine)
+        machines.append(machine)
+    group.start()
+    assert group.wait(2)
+    for machine in machines:
+        assert machine.check_status(StateStatus.SUCCESS)
+        assert machine.is_end()
+        assert not machine.is_executing()
+    assert group.get_statistics()['machines'] == 0
+    group.stop()
+
+
+def test_group_stop_before_start():
+    group = MachineGroup(num_threads=2)
+    # stopping an empty group that never started does nothing.
+    assert group.stop(1)
+    machine = Machine("m", IdleState("idle"), rate=50)
+    group.add(machine)
+    assert group.stop(1)
+    assert machine.check_status(StateStatus.INTERRUPTED)
+    assert not machine.is_executing()
+    assert group.get_statistics()['machines'] == 0
+
+
+def test_group_per_machine_rate():
+    group = MachineGroup()
+    slow = Machine("slow", IdleState("i1"), rate=10)
+    fast = Machine("fast", IdleState("i2"), rate=100)
+    group.add(slow)
+    group.add(fast)
+    group.start()
+    time.sleep(1)
+    assert group.stop()
+    assert slow.get_tick_statistics()['ticks'] == pytest.approx(10, abs=2)
+    assert fast.get_tick_statistics()['ticks'] == pytest.approx(100, abs=5)
+    assert slow.check_status(StateStatus.INTERRUPTED)
+    assert fast.check_status(StateStatus.INTERRUPTED)
+
+
+def test_group_rate_override():
+    group = MachineGroup()
+    machine = Machine("m", IdleState("i1"), rate=1)
+    group.add(machine, rate=100)
+    group.start()
+    time.sleep(0.5)
+    group.stop()
+    assert machine.get_tick_statistics()['ticks'] >= 40
+
+
+def test_group_interrupt_machine():
+    group = MachineGroup()
+    ws = WaitState("ws", 10)
+    machine = Machine("m", ws, rate=50)
+    group.add(machine)
+    group.start()
+    time.sleep(0.1)
+    assert machine.interrupt(timeout=1)
+    assert machine.check_status(StateStatus.INTERRUPTED)
+    assert ws.check_status(StateStatus.INTERRUPTED)
+    group.stop()
+
+
+def test_group_interrupt_slow_machine():
+    group = MachineGroup()
+    ws = WaitState("ws", 10)
+    # the next tick is two seconds away, the interrupt should not wait for it.
+    machine = Machine("m", ws, rate=0.5)
+    group.add(machine)
+    group.start()
+    time.sleep(0.1)
+    start_time = time.time()
+    assert machine.interrupt(timeout=1)
+    assert time.time() - start_time < 0.5
+    assert machine.check_status(StateStatus.INTERRUPTED)
+    group.stop()
+
+
+def test_group_exception():
+
+    class RaiseState(State):
+        def execute(self, board):
+            raise IndexError("error text")
+
+    group = MachineGroup()
+    machine = Machine("m", RaiseState("r"), rate=50)
+    group.add(machine)
+    group.start()
+    assert machine.wait(1)
+    assert machine.check_status(StateStatus.EXCEPTION)
+    assert str(machine._internal_exception) == "error text"
+    group.stop()
+
+
+def test_group_many_machines_few_threads():
+    group = MachineGroup(num_threads=4)
+    for i in range(0, 2000):
+        group.add(Machine(f"m{i}", IdleState("idle"), rate=10))
+    before = threading.active_count()
+    group.start()
+    time.sleep(1)
+    stats = group.get_statistics()
+    assert threading.active_count() - before <= 4
+    assert stats['machines'] == 2000
+    assert len(stats['shards']) == 4
+    assert all(s['machines'] == 500 for s in stats['shards'])
+    # every machine should tick about 10 times per second.
+    assert stats['tick_rate'] >= 2000 * 10 * 0.8
+    assert group.stop()
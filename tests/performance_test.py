@@ -1,7 +1,11 @@
 from behavior_machine.library.parallel_state import ParallelState
 import time
+import typing
+
+import pytest
 
 from behavior_machine.core import Board, StateStatus, State, Machine, machine
+from behavior_machine.core import PooledExecutor, ThreadExecutor
 from behavior_machine.library import IdleState
 
 
@@ -27,8 +31,45 @@ def test_repeat_node_in_machine_fast():
     time.sleep(2)
     exe.interrupt()
     # the performance of the computer might change this.
+    # ticks are on drift-free deadlines, so the ticks at both 0s and 2s can happen, plus the initial start.
     assert counter >= (60 * 2) - 2
-    assert counter <= (60 * 2) + 1
+    assert counter <= (60 * 2) + 2
+
+def _mean_hop_latency(event_driven: bool, hops=20):
+
+    timestamps = []
+
+    class TimestampState(State):
+        def execute(self, board: Board) -> StateStatus:
+            timestamps.append(time.time())
+            # finish at a random point within the tick period.
+            time.sleep(0.013 * (len(timestamps) % 7))
+            timestamps.append(time.time())
+            return StateStatus.SUCCESS
+
+    ds1 = TimestampState("ds1")
+    ds2 = TimestampState("ds2")
+    ds1.add_transition_on_success(ds2)
+    ds2.add_transition_on_success(ds1)
+
+    exe = Machine('exe', ds1, rate=10, event_driven=event_driven)
+    exe.start(Board())
+    while len(timestamps) < hops * 2:
+        time.sleep(0.01)
+    exe.interrupt()
+    # time between a state finishing and the next state starting.
+    latencies = [timestamps[i + 1] - timestamps[i] for i in range(1, hops * 2 - 1, 2)]
+    return sum(latencies) / len(latencies)
+
+
+def test_hop_latency_event_driven():
+
+    polling_latency = _mean_hop_latency(False)
+    event_latency = _mean_hop_latency(True)
+    print(f"per-hop latency at rate=10 polling: {polling_latency * 1e3:.2f}ms event driven: {event_latency * 1e3:.2f}ms")
+    assert event_latency < 0.01
+    assert event_latency < polling_latency
+
 
 def test_validate_transition_immediate():
 
@@ -52,8 +93,9 @@ def test_validate_transition_immediate():
     time.sleep(2)
     exe.interrupt()
     # the performance of the computer might change this.
+    # ticks are on drift-free deadlines, so the ticks at both 0s and 2s can happen, plus the initial start.
     assert counter >= (60 * 2) - 2
-    assert counter <= (60 * 2) + 1
+    assert counter <= (60 * 2) + 2
 
 
 def test_multiple_parallel_states():
@@ -75,3 +117,136 @@ def test_multiple_parallel_states():
     elapsed_time = time.time() - start_time
     assert elapsed_time < (1/10)
 
+
+def test_wide_parallel_tick_cost():
+
+    class CompleteState(State):
+        def execute(self, board: Board) -> StateStatus:
+            return StateStatus.SUCCESS
+
+    num_children = 5000
+    pp = ParallelState("parallel", [CompleteState(f"I{i}") for i in range(0, num_children)])
+    pp.pre_execute()
+    # pretend all children are running, without starting them.
+    for child in pp._children:
+        child._status = StateStatus.RUNNING
+    pp.tick(None)
+    # nothing changes between these ticks, so they should not depend on the number of children.
+    start_time = time.perf_counter()
+    for _ in range(0, 1000):
+        pp.tick(None)
+    elapsed_time = time.perf_counter() - start_time
+    assert elapsed_time < 0.1
+    assert not pp._state_complete_event.is_set()
+    # children finishing are picked up by the counters.
+    for child in pp._children:
+        child._status = StateStatus.SUCCESS
+    pp.tick(None)
+    assert pp._state_complete_event.is_set()
+    assert pp._statestatus_criteria() == StateStatus.SUCCESS
+
+
+def _mean_start_latency(executor, repeat=500):
+
+    start_time = 0
+    latencies = []
+
+    class LatencyState(State):
+        def execute(self, board: Board) -> StateStatus:
+            latencies.append(time.perf_counter() - start_time)
+            return StateStatus.SUCCESS
+
+    s = LatencyState("latency")
+    s.set_executor(executor)
+    for _ in range(0, repeat):
+        start_time = time.perf_counter()
+        s.start(None)
+        s.wait()
+    return sum(latencies) / len(latencies)
+
+
+def test_pooled_executor_start_latency():
+
+    # warm up the pool so the measurement reuses workers.
+    pooled = PooledExecutor()
+    _mean_start_latency(pooled, 10)
+    pooled_latency = _mean_start_latency(pooled)
+    thread_latency = _mean_start_latency(ThreadExecutor())
+    print(f"start latency pooled: {pooled_latency * 1e6:.1f}us thread: {thread_latency * 1e6:.1f}us")
+    # reusing workers should never create more than a single worker for sequential starts.
+    assert pooled.num_created() == 1
+    assert pooled_latency < thread_latency * 1.5
+
+
+def test_tick_rate_200hz_busy_wait():
+
+    exe = Machine('exe', IdleState("idle"), rate=200, busy_wait=0.002)
+    exe.start(None)
+    time.sleep(2)
+    exe.interrupt()
+    stats = exe.get_tick_statistics()
+    print(f"200Hz actual rate: {stats['actual_rate']:.1f}Hz jitter p50: {stats['jitter_p50'] * 1e6:.0f}us "
+          f"p99: {stats['jitter_p99'] * 1e6:.0f}us overruns: {stats['overruns']} skipped: {stats['skipped_ticks']}")
+    assert stats['actual_rate'] == pytest.approx(200, rel=0.02)
+    assert stats['jitter_p50'] < 0.001
+
+
+def test_board_copy_on_write_get():
+    # dataclasses only exist from python 3.7.
+    dataclasses = pytest.importorskip("dataclasses")
+
+    @dataclasses.dataclass(frozen=True)
+    class _PointCloud:
+        frame: str
+        points: typing.Tuple[typing.Tuple[float, float, float], ...]
+
+    cloud = _PointCloud('map', tuple((float(i), float(i) + 0.5, float(i) + 1.0) for i in range(0, 20000)))
+    cow_board = Board(copy_on_write=True)
+    cow_board.set('cloud', cloud)
+    deep_copy_board = Board()
+    deep_copy_board.set('cloud', cloud)
+    repeat = 20
+
+    start_time = time.perf_counter()
+    for _ in range(0, repeat):
+        assert deep_copy_board.get('cloud') is not cloud
+    deep_copy_time = (time.perf_counter() - start_time) / repeat
+
+    start_time = time.perf_counter()
+    for _ in range(0, repeat):
+        cow_board.get('cloud')
+    cow_time = (time.perf_counter() - start_time) / repeat
+    print(f"board get deepcopy: {deep_copy_time * 1e6:.1f}us copy on write: {cow_time * 1e6:.1f}us")
+    assert cow_board.get('cloud') == cloud
+    assert cow_time * 100 < deep_copy_time
+
+
+def test_board_bulk_load():
+
+    config = {f'param_{i}': {'value': i, 'limits': [0, i], 'name': f'param {i}'} for i in range(0, 5000)}
+
+    def load_per_key():
+        board = Board()
+        for key, value in config.items():
+            board.set(key, value)
+        return board
+
+    def load_bulk():
+        board = Board()
+        board.load(config)
+        return board
+
+    def best_time(load):
+        # the best of a few runs, so other processes do not decide the comparison.
+        times = []
+        for _ in range(0, 3):
+            start_time = time.perf_counter()
+            load()
+            times.append(time.perf_counter() - start_time)
+        return min(times)
+
+    per_key_time = best_time(load_per_key)
+    bulk_time = best_time(load_bulk)
+    print(f"loading 5000 keys one by one: {per_key_time * 1e3:.1f}ms bulk: {bulk_time * 1e3:.1f}ms")
+    assert load_bulk().snapshot() == load_per_key().snapshot()
+    assert bulk_time < per_key_time
@@ -0,0 +1,120 @@
+import os
+import time
+
+import pytest
+
+from behavior_machine.core import ProcessState, ProcessPool, StateStatus, Board, Machine, State
+from behavior_machine.library import SequentialState, ParallelState, IdleState
+
+
+class SumState(ProcessState):
+    def execute(self, board):
+        board.set('total', sum(board.get('numbers')) + (self.flow_in or 0))
+        self.flow_out = os.getpid()
+        return StateStatus.SUCCESS
+
+
+class ErrorState(ProcessState):
+    def execute(self, board):
+        raise ValueError("error in worker")
+
+
+class LoopState(ProcessState):
+    def execute(self, board):
+        while not self.is_interrupted():
+            time.sleep(0.01)
+        return StateStatus.INTERRUPTED
+
+
+class SpinState(ProcessState):
+    def execute(self, board):
+        count = 0
+        while not self.is_interrupted() and count < 2000000:
+            count += 1
+        return StateStatus.SUCCESS
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ProcessPool(max_workers=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_process_state_board_and_flow(pool):
+    board = Board()
+    board.set('numbers', [1, 2, 3])
+    board.set('unrelated', 'value')
+    s = SumState("sum", board_keys=['numbers'], pool=pool)
+    s.start(board, 10)
+    assert s.wait(10)
+    assert s.check_status(StateStatus.SUCCESS)
+    assert board.get('total') == 16
+    assert board.get('unrelated') == 'value'
+    # the flow out is the id of the worker process.
+    assert s.flow_out != os.getpid()
+
+
+def test_process_state_exception(pool):
+    s = ErrorState("error", pool=pool)
+    s.start(Board())
+    assert s.wait(10)
+    assert s.check_status(StateStatus.EXCEPTION)
+    assert isinstance(s._internal_exception, ValueError)
+    assert str(s._internal_exception) == "error in worker"
+
+
+def test_process_state_interrupt(pool):
+    s = LoopState("loop", pool=pool)
+    s.start(Board())
+    time.sleep(0.5)
+    assert s.is_executing()
+    assert s.interrupt(10)
+    assert s.check_status(StateStatus.INTERRUPTED)
+
+
+def test_process_state_interrupt_queued():
+    single = ProcessPool(max_workers=1)
+    try:
+        first = LoopState("first", pool=single)
+        second = LoopState("second", pool=single)
+        first.start(Board())
+        second.start(Board())
+        time.sleep(0.5)
+        # the second state is still waiting for the only worker.
+        second.signal_interrupt()
+        assert first.is_executing()
+        assert first.interrupt(10)
+        assert second.wait(10)
+        assert first.check_status(StateStatus.INTERRUPTED)
+        assert second.check_status(StateStatus.INTERRUPTED)
+    finally:
+        first.signal_interrupt()
+        second.signal_interrupt()
+        single.shutdown()
+
+
+def test_process_state_in_machine(pool):
+    board = Board()
+    board.set('numbers', [4, 5])
+    s1 = SumState("sum", board_keys=['numbers'], pool=pool)
+    s2 = IdleState("end")
+    s1.add_transition_on_success(s2)
+    exe = Machine("m", s1, end_state_ids=["end"], rate=20)
+    exe.run(board, flow_in=1)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert board.get('total') == 10
+
+
+def test_process_state_nested(pool):
+    par = ParallelState("par", [SpinState("a", pool=pool), SpinState("b", pool=pool)])
+    seq = SequentialState("seq", [par, SumState("sum", board_keys=['numbers'], pool=pool)])
+    end = IdleState("end")
+    seq.add_transition_on_success(end)
+    exe = Machine("m", seq, end_state_ids=["end"], rate=20)
+    board = Board()
+    board.set('numbers', [1])
+    exe.start(board)
+    assert exe.wait(30)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert board.get('total') == 1
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from behavior_machine.core import Machine, Profiler, State, StateStatus
+from behavior_machine.library import WaitState, IdleState, SequentialState
+
+
+class NoneState(State):
+    def execute(self, board):
+        pass
+
+
+def test_profiler_machine(clock):
+    seq = SequentialState("seq", [WaitState("w", 2), WaitState("w", 3)])
+    long = WaitState("long", 100)
+    end = IdleState("end")
+    seq.add_transition_on_success(long)
+    long.add_transition_after_elapsed(end, 4)
+    exe = Machine("m", seq, end_state_ids=["end"], rate=1)
+    profiler = Profiler()
+    profiler.attach(exe)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    statistics = {item['name']: item for item in profiler.get_statistics()}
+    # sorted by the total execution time.
+    assert [item['name'] for item in profiler.get_statistics()][0] == 'm'
+    # the two wait states share their name and type.
+    wait = statistics['w']
+    assert wait['type'] == 'WaitState'
+    assert wait['activations'] == 2
+    assert wait['statuses'] == {'SUCCESS': 2}
+    assert wait['execution']['count'] == 2
+    assert wait['execution']['total'] == 5
+    assert wait['execution']['min'] == 2
+    assert wait['execution']['max'] == 3
+    assert wait['start_latency']['max'] == 0
+    # the long wait state was interrupted by its transition.
+    assert statistics['long']['interrupt_latency']['count'] == 1
+    assert statistics['long']['statuses'] == {'INTERRUPTED': 1}
+    assert statistics['long']['execution']['total'] == pytest.approx(4, abs=1)
+    assert statistics['m']['activations'] == 1
+    assert statistics['m']['wait']['count'] == 1
+    assert statistics['end']['activations'] == 1
+    # the report survives a round trip through JSON.
+    assert json.loads(profiler.to_json())['states'] == profiler.get_statistics()
+
+
+def test_profiler_detach_and_reset(clock, tmp_path):
+    s = WaitState("w", 1)
+    profiler = Profiler()
+    profiler.attach(s)
+    s.start(None)
+    s.wait()
+    assert profiler.get_statistics()[0]['activations'] == 1
+    file_path = tmp_path / "profile.json"
+    profiler.dump(str(file_path))
+    with open(file_path) as f:
+        assert json.load(f)['states'][0]['name'] == "w"
+    profiler.reset()
+    assert profiler.get_statistics() == []
+    profiler.detach(s)
+    s.start(None)
+    s.wait()
+    assert profiler.get_statistics() == []
+    # execute returning nothing is counted once, as NOT_SPECIFIED.
+    none = NoneState("none")
+    profiler.attach(none)
+    none.start(None)
+    none.wait()
+    assert profiler.get_statistics()[0]['statuses'] == {'NOT_SPECIFIED': 1}
+
+
+def test_histogram_percentiles():
+    profiler = Profiler()
+    s = IdleState("s")
+    for duration in [0.0000005] * 90 + [0.5] * 10:
+        profiler.on_wait(s, 0, duration)
+    wait = profiler.get_statistics()[0]['wait']
+    assert wait['count'] == 100
+    assert wait['p50'] == 0.000001
+    assert 0.5 <= wait['p99'] < 1
+    assert wait['buckets'] == [[0.000001, 90], [pytest.approx(0.524288), 10]]
@@ -0,0 +1,150 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from behavior_machine.core import SharedMemoryBoard, Machine, StateStatus
+from behavior_machine.library import SetBoardState, GetBoardState, SequentialState, IdleState
+
+# multiprocessing.shared_memory requires python 3.8.
+pytest.importorskip("multiprocessing.shared_memory")
+
+
+@pytest.fixture
+def board():
+    board = SharedMemoryBoard(records={'pose': 'ddd'})
+    yield board
+    board.unlink()
+
+
+def _writer_process(board, count):
+    # runs in another process with a copy of the board.
+    board.wait_for('start', timeout=10)
+    for i in range(1, count + 1):
+        board.set('count', i)
+    board.set('pose', (board.get('start'), 2.0, 3.0))
+    board.close()
+
+
+def test_get_set(board):
+    assert not board.exist('x')
+    assert board.get('x') is None
+    assert board.get_version('x') == 0
+    board.set('x', {'values': [1, 2]})
+    assert board.exist('x')
+    assert board.get('x') == {'values': [1, 2]}
+    assert board.get('x') is not board.get('x')
+    # larger values move to a larger segment.
+    board.set('x', list(range(0, 10000)))
+    assert board.get('x') == list(range(0, 10000))
+    assert board.get_version('x') == 2
+    board.load({'a': 1, 'b': 'two'})
+    assert board.get_many(['a', 'b', 'missing']) == {'a': 1, 'b': 'two', 'missing': None}
+    assert sorted(board.keys()) == ['a', 'b', 'x']
+    assert board.snapshot(['a', 'b']) == {'a': 1, 'b': 'two'}
+
+
+def test_local_history(board):
+    board.enable_history('a', 3)
+    for i in range(0, 5):
+        board.set('a', [i])
+    # only the values set through this board object are kept.
+    other = SharedMemoryBoard(board.get_name())
+    other.set('a', [10])
+    other.close()
+    assert board.get_history('a') == [[2], [3], [4]]
+    assert board.get('a') == [10]
+
+
+def test_delete(board):
+    board.set('a', [1])
+    version = board.get_version('a')
+    other = SharedMemoryBoard(board.get_name())
+    other.delete('a')
+    # the deletion is seen by every process.
+    assert not board.exist('a')
+    assert board.get('a') is None
+    assert board.get_version('a') == 0
+    assert board.keys() == []
+    # deleting a missing key does nothing.
+    board.delete('a')
+    board.delete('missing')
+    board.set('a', [2])
+    assert other.get('a') == [2]
+    assert board.get_version('a') > version
+    assert board.keys() == ['a']
+    other.close()
+    # values do not expire, the processes might not share a clock.
+    with pytest.raises(ValueError):
+        board.set('b', 1, ttl=1.0)
+    assert not board.exist('b')
+
+
+def test_records(board):
+    board.set('pose', (1.0, 2.0, 3.0))
+    assert board.get('pose') == (1.0, 2.0, 3.0)
+    # the format is stored with the value, so boards without it can read it.
+    other = SharedMemoryBoard(board.get_name())
+    assert other.get('pose') == (1.0, 2.0, 3.0)
+    other.close()
+    with pytest.raises(Exception):
+        board.set('pose', (1.0, 2.0))
+
+
+def test_attach_by_name_and_pickle(board):
+    board.set('x', 1)
+    other = pickle.loads(pickle.dumps(board))
+    assert other.get_name() == board.get_name()
+    assert other.get('x') == 1
+    other.set('x', 2)
+    assert board.get('x') == 2
+    assert board.get_version('x') == 2
+    other.close()
+
+
+def test_library_states(board):
+    seq = SequentialState("seq", [SetBoardState("set", "key", "value"), GetBoardState("get", "key")])
+    end = IdleState("end")
+    seq.add_transition_on_success(end)
+    exe = Machine("m", seq, end_state_ids=["end"], rate=20)
+    exe.run(board)
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert board.get("key") == "value"
+
+
+def test_scope_of_shared_board(board):
+    board.set('config', 1)
+    scope = board.scope('child')
+    scope.set('result', 2)
+    assert scope.get('config') == 1
+    assert not board.exist('result')
+    scope.promote()
+    assert board.get('result') == 2
+
+
+def test_other_process(board):
+    process = multiprocessing.Process(target=_writer_process, args=(board, 100))
+    process.start()
+    try:
+        board.set('start', 1.0)
+        assert board.wait_for('count', lambda count: count == 100, timeout=10)
+        assert board.wait_for('pose', timeout=10)
+        assert board.get('pose') == (1.0, 2.0, 3.0)
+    finally:
+        process.join(10)
+    assert process.exitcode == 0
+
+
+def test_numpy_array(board):
+    np = pytest.importorskip("numpy")
+    cloud = np.arange(0, 3000, dtype=np.float64).reshape(1000, 3)
+    board.set('cloud', cloud)
+    copied = board.get('cloud')
+    assert (copied == cloud).all()
+    copied[0, 0] = -1
+    # without a copy, the array is a read-only view of the shared memory.
+    view = board.get('cloud', deep_copy=False)
+    assert view[0, 0] == 0
+    assert not view.flags.writeable
+    board.set('cloud', cloud * 2)
+    assert view[1, 0] == 6
@@ -197,3 +197,122 @@ def test_call_interrupt_before_start():
     s = example('s')
     s.interrupt()
     
+
+def test_transition_order():
+    class example(State):
+        def execute(self, board: Board) -> StateStatus:
+            return StateStatus.SUCCESS
+
+    # the first transition added wins, whether it is built-in or custom.
+    s = example('s')
+    custom = example('custom')
+    success = example('success')
+    complete = example('complete')
+    s.add_transition_on_failed(example('failed'))
+    s.add_transition(lambda st, b: st.check_status(StateStatus.SUCCESS), custom)
+    s.add_transition_on_success(success)
+    s.add_transition_on_complete(complete)
+    assert len(s._transitions) == 4
+    s.start(None)
+    s.wait()
+    assert s.tick(None) is custom
+    custom.wait()
+
+    s = example('s')
+    s.add_transition_on_success(success)
+    s.add_transition(lambda st, b: True, custom)
+    s.start(None)
+    s.wait()
+    assert s.tick(None) is success
+    success.wait()
+
+
+def test_transition_status_lookup():
+    calls = []
+
+    class example(State):
+        def execute(self, board: Board) -> StateStatus:
+            return StateStatus.FAILED
+
+    s = example('s')
+    s.add_transition_on_success(example('success'))
+    s.add_transition_on_failed(example('failed'))
+    s.add_transition(lambda st, b: calls.append(st) or False, example('custom'))
+    s.start(None)
+    s.wait()
+    nxt = s.tick(None)
+    assert nxt.check_name('failed')
+    # custom conditions added after the matching transition are not evaluated.
+    assert len(calls) == 0
+    nxt.wait()
+
+
+def test_transition_on_complete_waits_for_exit():
+    class example(State):
+        def execute(self, board: Board) -> StateStatus:
+            self._status = StateStatus.SUCCESS
+            time.sleep(0.2)
+            return StateStatus.SUCCESS
+
+    s = example('s')
+    s.add_transition_on_complete(example('complete'))
+    s.add_transition_on_success(example('success'))
+    s.start(None)
+    time.sleep(0.1)
+    # the status is already success but execute did not return.
+    nxt = s.tick(None)
+    assert nxt.check_name('success')
+    nxt.wait()
+
+    s = example('s')
+    s.add_transition_on_complete(example('complete'))
+    s.start(None)
+    time.sleep(0.1)
+    assert s.tick(None) is s
+    s.wait()
+    nxt = s.tick(None)
+    assert nxt.check_name('complete')
+    nxt.wait()
+
+
+def test_transition_with_keys():
+    calls = []
+
+    class example(State):
+        def execute(self, board: Board) -> StateStatus:
+            self._interupted_event.wait()
+            return StateStatus.INTERRUPTED
+
+    class done(State):
+        def execute(self, board: Board) -> StateStatus:
+            return StateStatus.SUCCESS
+
+    def cond(st, b):
+        calls.append(b.get('ready'))
+        return b.get('ready') is True
+
+    board = Board()
+    s = example('s')
+    s.add_transition(cond, done('done'), keys=['ready'])
+    s.start(board)
+    for _ in range(0, 5):
+        assert s.tick(board) is s
+    # the condition is only checked again once the key changed.
+    assert calls == [None]
+    board.set('ready', False)
+    board.set('other', True)
+    assert s.tick(board) is s
+    assert s.tick(board) is s
+    assert calls == [None, False]
+    board.set('ready', True)
+    nxt = s.tick(board)
+    assert nxt.check_name('done')
+    assert calls == [None, False, True]
+    nxt.wait()
+    # a new execution checks the condition again.
+    board.set('ready', False)
+    s.start(board)
+    assert s.tick(board) is s
+    assert s.tick(board) is s
+    assert calls == [None, False, True, False]
+    s.interrupt()
@@ -1,4 +1,4 @@
-from behavior_machine.library import WaitState
+from behavior_machine.library import WaitState, IdleState
 import pytest
 import time
 
@@ -251,10 +251,54 @@ def test_debugging_machine(caplog):
     mac = Machine("mac", s1, ["s2"], debug=True, rate=1, logger=logger)
     mac.run()
     assert mac.is_end()
-    assert len(caplog.records) == 3
+    # nothing changed at t=1, so only t=0 and the end are logged.
+    assert len(caplog.records) == 2
     assert caplog.records[0].message == "[Base] mac(Machine) -- RUNNING\n  -> s1(WaitState) -- RUNNING" # This is at t=0
-    assert caplog.records[1].message == "[Base] mac(Machine) -- RUNNING\n  -> s1(WaitState) -- RUNNING" # This is at t=1 
-    assert caplog.records[2].message == "[Base] mac(Machine) -- RUNNING\n  -> s2(DummyState) -- SUCCESS" # At the end
+    assert caplog.records[1].message == "[Base] mac(Machine) -- RUNNING\n  -> s2(DummyState) -- SUCCESS" # At the end
+
+
+def test_debugging_machine_only_changes():
+    calls = []
+    s1 = WaitState('s1', 0.3)
+    s2 = WaitState('s2', 0.3)
+    s1.add_transition_on_success(s2)
+    mac = Machine("mac", s1, ["s2"], debug=True, rate=50,
+                  debug_cb=lambda info, parsed: calls.append((info, parsed)))
+    mac.run()
+    assert mac.is_end()
+    # s1 running, s2 running and s2 done, instead of once per tick.
+    assert len(calls) == 3
+    assert calls[0][0]['children'][0]['name'] == 's1'
+    assert calls[1][0]['children'][0]['name'] == 's2'
+    assert calls[2][0]['children'][0]['status'] == StateStatus.SUCCESS
+    assert calls[2][1] == ["[Base] mac(Machine) -- RUNNING", "  -> s2(WaitState) -- SUCCESS"]
+    assert str(calls[2][1]) == "[Base] mac(Machine) -- RUNNING\n  -> s2(WaitState) -- SUCCESS"
+    # comparing with something that is not a sequence of lines is never equal.
+    assert calls[2][1] != None  # noqa: E711
+    assert calls[2][1] != str(calls[2][1])
+
+
+def test_debugging_machine_ignores_other_machines():
+
+    class CountingMachine(Machine):
+        builds = 0
+
+        def get_debug_info(self):
+            self.builds += 1
+            return super().get_debug_info()
+
+    s1 = WaitState('s1', 0.3)
+    mac = CountingMachine("mac", s1, ["s1"], debug=True, rate=50)
+    other = Machine("other", DummyState('d1'), ["d1"], debug=True, rate=50)
+    mac.start(None)
+    # the states of another machine keep changing while mac runs.
+    end_time = time.time() + 0.2
+    while time.time() < end_time:
+        other.run()
+    mac.wait()
+    assert mac.is_end()
+    # s1 running and s1 done, not once per tick.
+    assert mac.builds <= 3
 
 
 def test_interrupt_machine(capsys):
@@ -307,9 +351,39 @@ def test_repeat_node_in_machine():
 
     exe = Machine('exe', ds1, rate=5)
     exe.start(None)
+    # ticks are on fixed deadlines, check in the middle of a period instead of on a tick.
+    time.sleep(0.9)
     for i in range(1, 6):
-        time.sleep(1)
         assert counter == i*5
         assert exe._curr_state == ds5
+        if i < 5:
+            time.sleep(1)
     exe.interrupt()
     assert counter == (5 * 5)
+
+
+def test_event_driven_board_change():
+
+    s1 = IdleState("s1")
+    s2 = IdleState("s2")
+    s1.add_transition(lambda s, b: b.get("go") is not None, s2)
+    exe = Machine("xe", s1, end_state_ids=["s2"], rate=1, event_driven=True)
+    b = Board()
+    exe.start(b)
+    time.sleep(0.1)
+    start_time = time.time()
+    b.set("go", True)
+    assert exe.wait(0.5)
+    assert time.time() - start_time < 0.1
+    assert exe.check_status(StateStatus.SUCCESS)
+
+
+def test_event_driven_interrupt():
+
+    exe = Machine("xe", IdleState("s1"), rate=1, event_driven=True)
+    exe.start(Board())
+    time.sleep(0.1)
+    start_time = time.time()
+    assert exe.interrupt()
+    assert time.time() - start_time < 0.1
+    assert exe.check_status(StateStatus.INTERRUPTED)
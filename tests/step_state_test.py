@@ -0,0 +1,143 @@
+import threading
+import time
+
+from behavior_machine.core import StepState, Machine, State, StateStatus, Board
+from behavior_machine.library import SequentialState, ParallelState, SelectorState, IdleState
+
+
+class CountStepState(StepState):
+
+    def __init__(self, name, steps, status=StateStatus.SUCCESS):
+        super().__init__(name)
+        self._steps = steps
+        self._result = status
+        self.threads = set()
+        self.steps = 0
+
+    def execute(self, board):
+        for i in range(0, self._steps):
+            self.threads.add(threading.current_thread().name)
+            self.steps += 1
+            yield
+        self.flow_out = self._steps
+        return self._result
+
+
+def test_step_state_tick():
+    s = CountStepState("s", 3)
+    s.start(None)
+    assert s.check_status(StateStatus.RUNNING)
+    assert s.tick(None) is s
+    assert s.check_status(StateStatus.RUNNING)
+    s.tick(None)
+    assert s.is_executing()
+    s.tick(None)
+    assert not s.is_executing()
+    assert s.check_status(StateStatus.SUCCESS)
+    assert s.flow_out == 3
+
+
+def test_step_state_without_generator():
+
+    class SetState(StepState):
+        def execute(self, board):
+            board.set("key", "value")
+            return StateStatus.SUCCESS
+
+    s = SetState("s")
+    b = Board()
+    s.start(b)
+    # completes inside start without any thread.
+    assert s.check_status(StateStatus.SUCCESS)
+    assert b.get("key") == "value"
+
+
+def test_step_state_exception():
+
+    class RaiseState(StepState):
+        def execute(self, board):
+            yield
+            raise IndexError("error text")
+
+    s = RaiseState("s")
+    s.start(None)
+    s.tick(None)
+    assert s.check_status(StateStatus.EXCEPTION)
+    assert str(s._internal_exception) == "error text"
+
+
+def test_step_state_interrupt():
+    closed = False
+
+    class ForeverState(StepState):
+        def execute(self, board):
+            nonlocal closed
+            try:
+                while True:
+                    yield
+            finally:
+                closed = True
+
+    s = ForeverState("s")
+    s.start(None)
+    s.tick(None)
+    assert s.interrupt()
+    assert closed
+    assert s.check_status(StateStatus.INTERRUPTED)
+    assert not s.is_executing()
+
+
+def test_step_state_wait_without_tick():
+    s = CountStepState("s", 2)
+    s.start(None)
+    assert s.wait(1)
+    assert s.check_status(StateStatus.SUCCESS)
+
+
+def test_step_state_in_machine():
+    s1 = CountStepState("s1", 2)
+    s2 = CountStepState("s2", 2, StateStatus.FAILED)
+    s3 = IdleState("s3")
+    s1.add_transition_on_success(s2)
+    s2.add_transition_on_failed(s3)
+    exe = Machine("xe", s1, end_state_ids=["s3"], rate=100)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert s2.check_status(StateStatus.FAILED)
+    # s2 is started by a transition, so all of its steps run on the machine's thread.
+    assert s2.threads == {"xe"}
+
+
+def test_step_state_in_nested_states():
+    seq = SequentialState("seq", [CountStepState("a", 2), CountStepState("b", 3)])
+    sel = SelectorState("sel", [CountStepState("c", 1, StateStatus.FAILED), CountStepState("d", 2)])
+    par = ParallelState("par", [seq, sel, CountStepState("e", 5)])
+    end = IdleState("end")
+    par.add_transition_on_success(end)
+    exe = Machine("xe", par, end_state_ids=["end"], rate=100)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    assert seq.check_status(StateStatus.SUCCESS)
+    assert seq.flow_out == 3
+    assert sel.check_status(StateStatus.SUCCESS)
+
+
+def test_step_state_on_complete_transition():
+    s1 = CountStepState("s1", 1, None)
+    s2 = CountStepState("s2", 1)
+    s1.add_transition_on_complete(s2)
+    exe = Machine("xe", s1, end_state_ids=["s2"], rate=100)
+    exe.run()
+    assert s1.check_status(StateStatus.NOT_SPECIFIED)
+    assert exe.is_end()
+
+
+def test_step_state_in_sequential_state_at_low_rate():
+    step = CountStepState("step", 100)
+    seq = SequentialState("seq", [step])
+    exe = Machine("xe", seq, rate=2)
+    exe.start(None)
+    time.sleep(1)
+    assert exe.interrupt()
+    # the steps follow the ticks of the machine, the sequential state waiting on the state does not add any.
+    assert 2 <= step.steps <= 4
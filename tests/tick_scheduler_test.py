@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from behavior_machine.core import TickScheduler, Machine, State, StateStatus
+from behavior_machine.library import IdleState
+
+
+def test_scheduler_no_drift():
+    scheduler = TickScheduler(0.01)
+    for _ in range(0, 50):
+        scheduler.begin_tick()
+        # work that takes part of the period
+        time.sleep(0.002)
+        scheduler.end_tick()
+        scheduler.sleep()
+    stats = scheduler.get_statistics()
+    assert stats['ticks'] == 50
+    assert stats['overruns'] == 0
+    # 50 ticks start at 0s and end at 0.49s, the sleep waits until 0.5s.
+    assert stats['actual_rate'] == pytest.approx(100, rel=0.05)
+
+
+def test_scheduler_skip_missed_deadlines():
+    scheduler = TickScheduler(0.01)
+    scheduler.begin_tick()
+    time.sleep(0.035)
+    scheduler.end_tick()
+    scheduler.begin_tick()
+    stats = scheduler.get_statistics()
+    assert stats['overruns'] == 1
+    assert stats['skipped_ticks'] == 2
+    assert stats['jitter_max'] >= 0.025
+    # the next deadline is in the future instead of catching up.
+    assert 0 < scheduler.time_until_next_tick() <= 0.01
+
+
+def test_scheduler_early_tick():
+    scheduler = TickScheduler(1)
+    scheduler.begin_tick()
+    scheduler.end_tick()
+    scheduler.begin_tick()
+    stats = scheduler.get_statistics()
+    assert stats['ticks'] == 1
+    assert stats['early_ticks'] == 1
+    assert scheduler.time_until_next_tick() > 0.9
+
+
+def test_machine_tick_statistics():
+
+    exe = Machine("xe", IdleState("s1"), rate=100)
+    exe.start(None)
+    time.sleep(1)
+    exe.interrupt()
+    stats = exe.get_tick_statistics()
+    assert stats['target_rate'] == 100
+    assert stats['ticks'] == pytest.approx(100, abs=3)
+    assert stats['skipped_ticks'] <= 2
+
+
+def test_machine_overrun_statistics():
+
+    class SlowTransitionState(State):
+        def execute(self, board):
+            return StateStatus.RUNNING
+
+    s1 = SlowTransitionState("s1")
+    s2 = IdleState("s2")
+    s1.add_transition(lambda s, b: time.sleep(0.05), s2)
+    exe = Machine("xe", s1, rate=100)
+    exe.start(None)
+    time.sleep(0.5)
+    exe.interrupt()
+    stats = exe.get_tick_statistics()
+    assert stats['overruns'] >= 5
+    assert stats['skipped_ticks'] >= 20
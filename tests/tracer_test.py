@@ -0,0 +1,56 @@
+import json
+import threading
+
+from behavior_machine.core import Machine, Tracer, StateStatus
+from behavior_machine.library import WaitState, IdleState, SequentialState, ParallelState
+
+
+def test_tracer_machine(tmp_path):
+    seq = SequentialState("seq", [WaitState("w1", 0.05), ParallelState("par", [WaitState("w2", 0.05)])])
+    end = IdleState("end")
+    seq.add_transition_on_success(end)
+    exe = Machine("m", seq, end_state_ids=["end"], rate=100)
+    tracer = Tracer()
+    tracer.attach(exe)
+    exe.run()
+    assert exe.check_status(StateStatus.SUCCESS)
+    events = tracer.get_events()
+    track_names = {event['tid']: event['args']['name'] for event in events
+                   if event['ph'] == 'M' and event['name'] == 'thread_name' and event['pid'] == 2}
+    # the tracks of the states follow the tree.
+    assert sorted(track_names.values()) == ['m', 'm/end', 'm/seq', 'm/seq/par', 'm/seq/par/w2', 'm/seq/w1']
+    spans = {track_names[event['tid']]: event for event in events if event['ph'] == 'X' and event['pid'] == 2}
+    assert spans['m/seq/w1']['dur'] >= 0.05 * 1e6
+    assert spans['m/seq/w1']['args'] == {'type': 'WaitState', 'status': 'SUCCESS'}
+    # the sequential state spans its children.
+    assert spans['m/seq']['ts'] <= spans['m/seq/w1']['ts']
+    assert spans['m/seq']['ts'] + spans['m/seq']['dur'] >= spans['m/seq/par/w2']['ts'] + spans['m/seq/par/w2']['dur']
+    transitions = [event for event in events if event['ph'] == 'i']
+    assert [event['name'] for event in transitions] == ['seq -> end']
+    assert transitions[0]['args'] == {'to': 'm/end'}
+    # the ticks and executions are on the tracks of the threads running them.
+    ticks = [event for event in events if event['name'] == 'tick m']
+    assert len(ticks) > 5
+    assert all(event['pid'] == 1 for event in ticks)
+    executions = [event for event in events if event['name'] == 'execute w1']
+    assert len(executions) == 1
+    assert executions[0]['tid'] != threading.get_ident()
+    file_path = tmp_path / "trace.json"
+    tracer.dump(str(file_path))
+    with open(file_path) as f:
+        assert len(json.load(f)['traceEvents']) == len(events)
+    tracer.clear()
+    assert all(event['ph'] == 'M' for event in tracer.get_events())
+
+
+def test_tracer_bounded_buffer():
+    tracer = Tracer(max_events=10)
+    w = WaitState("w", 0)
+    tracer.attach(w)
+    for _ in range(0, 20):
+        w.start(None)
+        w.wait()
+    spans = [event for event in tracer.get_events() if event['ph'] == 'X']
+    # spans and executions are recorded from the thread running the state, which keeps the last 10.
+    assert 0 < len(spans) <= 20
+    assert len([event for event in spans if event['pid'] == 2]) <= 10